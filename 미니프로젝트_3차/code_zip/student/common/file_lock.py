@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+프로세스 간 파일 잠금 / 임시 파일 이름
+- file_lock(path): path(잠금 전용 파일)에 배타 잠금 — Unix는 fcntl.flock, Windows는 msvcrt.locking
+    같은 프로세스 안에서도 열린 파일이 다르면 서로 막음 (스레드 간 보호는 호출 쪽 threading.Lock과 함께 사용)
+- tmp_path(path): 같은 디렉토리의 겹치지 않는 임시 파일 이름 (pid + 임의 접미사) → 쓰고 나서 os.replace
+"""
+
+from __future__ import annotations
+import os, uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl  # Unix
+    msvcrt = None
+except ImportError:  # pragma: no cover (Windows)
+    fcntl = None
+    import msvcrt  # type: ignore
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # 약 10초 대기 후 OSError → 다시 시도
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def tmp_path(path: str, suffix: str = "") -> str:
+    """path 옆의 임시 파일 이름 (여러 프로세스가 동시에 같은 파일을 만들어도 겹치지 않음)"""
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp{suffix}"
@@ -37,7 +37,13 @@ class Day2Plan:
     force_rag_only: bool = False
     return_draft_when_enough: bool = True
     max_context: int = 1200
-    embedding_model: str = "text-embedding-3-small"
+    embedding_model: str = "text-embedding-3-small"  # "local-hash[-D]" → 오프라인 로컬 임베딩
+    # 메타 필터 (FAISS 검색 안에서 적용, 비어 있으면 전체 검색)
+    path_prefix: Optional[str] = None                     # 예: "data/processed/1. 재직자"
+    file_types: List[str] = field(default_factory=list)   # 예: ["txt", "pdf"]
+    sources: List[str] = field(default_factory=list)      # 예: ["day1"], ["processed"]
+    date_from: Optional[str] = None                       # 수집일 "YYYY-MM-DD" 이상
+    date_to: Optional[str] = None                         # 수집일 "YYYY-MM-DD" 이하
 
 # (선택) RAG Context 아이템도 dataclass를 쓸 경우 예시
 @dataclass
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+추출 텍스트 캐시 (PDF / HWPX 등 바이너리 → 정제된 텍스트)
+- 키: sha256(파일 내용) → 파일 이름/위치/mtime이 바뀌어도 내용이 같으면 재사용
+- 저장: <cache_dir>/<parser>@<version>/<sha[:2]>/<sha>.txt.gz (gzip, 임시 파일 → rename)
+- 파서 버전(추출/정제 코드 또는 라이브러리 버전)이 바뀌면 다른 디렉토리 → 이전 결과는 자동 무효, 첫 기록 때 정리
+- TEXT_CACHE_DIR 환경변수로 위치 변경, 빈 문자열이면 캐시 끔
+"""
+
+from __future__ import annotations
+import os, gzip, shutil, hashlib, threading
+from typing import Callable, Optional
+
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", os.path.join("indices", "text_cache"))
+COMPRESS_LEVEL = 6
+
+
+def content_key(path: str, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class TextCache:
+    def __init__(self, parser: str, version: str, cache_dir: str = TEXT_CACHE_DIR):
+        self.root = cache_dir
+        self.prefix = f"{parser}@"
+        self.dir = os.path.join(cache_dir, f"{parser}@{version}")
+        self.hits = 0
+        self.misses = 0
+        self._pruned = False
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, key[:2], key + ".txt.gz")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8", newline="") as f:
+                text = f.read()
+        except (FileNotFoundError, OSError, EOFError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        p = self._path(key)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", newline="", compresslevel=COMPRESS_LEVEL) as f:
+            f.write(text)
+        os.replace(tmp, p)
+        self._prune_old_versions()
+
+    def _prune_old_versions(self):
+        """같은 파서의 다른 버전 디렉토리 삭제 (프로세스당 1회)"""
+        if self._pruned:
+            return
+        self._pruned = True
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(self.prefix) and path != self.dir and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def extract(self, path: str, fn: Callable[[str], str]) -> str:
+        """캐시에 있으면 그대로, 없으면 fn(path)로 추출 후 기록"""
+        key = content_key(path)
+        text = self.get(key)
+        if text is None:
+            text = fn(path)
+            self.put(key, text)
+        return text
+
+
+def cached_text(path: str, parser: str, version: str, fn: Callable[[str], str],
+                cache_dir: str = TEXT_CACHE_DIR) -> str:
+    """한 번 쓰고 버리는 호출용: TEXT_CACHE_DIR이 비어 있으면 fn(path) 그대로"""
+    if not cache_dir:
+        return fn(path)
+    return TextCache(parser, version, cache_dir).extract(path, fn)
@@ -6,7 +6,7 @@ Day2: RAG 도구 에이전트
 
 from __future__ import annotations
 from typing import Dict, Any
-import os
+import os, asyncio
 
 from google.genai import types
 from google.adk.agents import Agent
@@ -24,12 +24,7 @@ from student.common.fs_utils import save_markdown
 MODEL = LiteLlm(model="openai/gpt-4o-mini")
 
 
-def _handle(query: str) -> Dict[str, Any]:
-    """
-    1) plan = Day2Plan()  (필요 시 top_k 등 파라미터 명시)
-    2) agent = Day2Agent(index_dir=os.getenv("DAY2_INDEX_DIR","indices/day2"))
-    3) return agent.handle(query, plan)
-    """
+def _plan() -> Day2Plan:
     index_dir = os.getenv("DAY2_INDEX_DIR", "indices/day2")
     plan = Day2Plan(
         index_dir=index_dir,
@@ -40,20 +35,37 @@ def _handle(query: str) -> Dict[str, Any]:
         top_k=5,
         max_context=1200,
     )
-    agent = Day2Agent(index_dir=index_dir)
+    return plan
+
+
+def _handle(query: str) -> Dict[str, Any]:
+    """
+    1) plan = Day2Plan()  (필요 시 top_k 등 파라미터 명시)
+    2) agent = Day2Agent(index_dir=os.getenv("DAY2_INDEX_DIR","indices/day2"))
+    3) return agent.handle(query, plan)
+    """
+    plan = _plan()
+    agent = Day2Agent(index_dir=plan.index_dir)
     payload = agent.handle(query, plan)
     return payload
 
 
+async def _ahandle(query: str) -> Dict[str, Any]:
+    """_handle의 비동기 버전 (이벤트 루프 스레드를 막지 않음)"""
+    plan = _plan()
+    agent = Day2Agent(index_dir=plan.index_dir)
+    return await agent.ahandle(query, plan)
+
+
 
-def before_model_callback(
+async def before_model_callback(
     callback_context: CallbackContext,
     llm_request: LlmRequest,
     **kwargs,
 ) -> LlmResponse | None:
     """
     1) 사용자 메시지에서 query 텍스트 추출
-    2) payload = _handle(query)
+    2) payload = await _ahandle(query)  (ADK는 코루틴 콜백을 await 함)
     3) body_md = render_day2(query, payload)
     4) saved = save_markdown(query, 'day2', body_md)
     5) md = render_enveloped('day2', query, payload, saved)
@@ -63,10 +75,10 @@ def before_model_callback(
         last = llm_request.contents[-1]
         if last.role == "user":
             query = last.parts[0].text
-            payload = _handle(query)
+            payload = await _ahandle(query)
 
             body_md = render_day2(query, payload)
-            saved = save_markdown(query=query, route="day2", markdown=body_md)
+            saved = await asyncio.to_thread(save_markdown, query=query, route="day2", markdown=body_md)
             md = render_enveloped(kind="day2", query=query, payload=payload, saved_path=saved)
 
             return LlmResponse(
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+인덱스 빌드 벤치마크 (합성 코퍼스, 로컬 임베딩 → 네트워크/API 키 불필요)
+- 합성 코퍼스: 한국어/영어 문장으로 만든 txt 파일 (고정 시드 → 실행마다 같은 내용)
+    파일당 약 CHUNKS_PER_FILE 청크(chars 청커 기준), 크기별로 앞쪽 파일만 사용 (가장 큰 크기만큼 한 번 생성)
+- 크기 × 언어마다 새 프로세스(spawn)에서 실행 → 최대 RSS가 실행마다 따로 측정됨
+- 단계별 시간: load(파일 읽기/추출) · clean(정제) · chunk · embed · add(FaissStore add/stage + finish) · save
+    단계를 겹치지 않고 차례로 실행해 각 단계 시간을 분리 (문서 하나씩, 임베딩은 EMBED_WINDOW 창 단위)
+    (chunk에는 청커 안의 clean_text 재호출도 포함 — build_index와 같은 청커 함수를 그대로 씀)
+    --e2e: 같은 코퍼스로 실제 build_index(스트리밍, 단계 겹침)도 별도 프로세스에서 실행해 전체 시간 비교
+- 결과: JSON (환경/인자/실행별 단계 시간·처리량·최대 RSS·출력 파일 크기), --compare 이전 JSON과 비교 출력
+
+실행:
+  python -m student.day2.impl.bench --sizes 1000 10000 100000 --langs ko en
+  python -m student.day2.impl.bench --sizes 1000 --chunker tokens --e2e --compare indices/bench/<이전>.json
+"""
+import os, sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse, json, math, time, random, shutil, tempfile, platform, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+try:
+    import resource  # Unix
+except ImportError:  # pragma: no cover (Windows)
+    resource = None
+
+import numpy as np
+
+from student.day2.impl.ingest import (chunker_config, clean_text, file_meta, loader_for, make_chunker,
+                                      CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+from student.day2.impl.embeddings import Embeddings
+from student.day2.impl.store import FaissStore, INDEX_TYPES
+from student.day2.impl.pipeline import EMBED_WINDOW
+
+SIZES = (1_000, 10_000, 100_000)
+LANGS = ("ko", "en")
+CHUNKS_PER_FILE = 50
+SEED = 20251112
+STAGES = ("load", "clean", "chunk", "embed", "add", "save")
+BENCH_DIR = os.path.join("indices", "bench")
+
+_WORDS = {
+    "ko": ("교육", "과정", "사업", "공고", "지원", "기관", "대학", "인재", "양성", "디지털", "인공지능", "평가", "항목",
+           "신청", "자격", "제출", "서류", "예산", "운영", "계획", "성과", "관리", "참여", "기업", "재직자", "훈련",
+           "온라인", "강좌", "선정", "심사", "기준", "일정", "마감", "접수", "결과", "발표", "협약", "보고서", "산업",
+           "맞춤", "직무", "능력", "인증", "강의", "실습", "프로젝트", "학습", "목표", "데이터", "분석", "모델",
+           "검색", "문서", "요약", "질의", "응답", "시스템", "구축", "활용", "확대"),
+    "en": ("education", "program", "project", "notice", "support", "agency", "university", "talent", "training",
+           "digital", "artificial", "intelligence", "evaluation", "criteria", "application", "eligibility",
+           "submission", "document", "budget", "operation", "plan", "performance", "management", "participation",
+           "company", "employee", "online", "course", "selection", "review", "schedule", "deadline", "result",
+           "announcement", "agreement", "report", "industry", "skill", "certificate", "lecture", "practice",
+           "learning", "objective", "data", "analysis", "model", "retrieval", "summary", "query", "answer",
+           "system", "index", "vector", "embedding", "pipeline", "benchmark", "latency", "throughput"),
+}
+_ENDINGS = {"ko": ("합니다.", "입니다.", "됩니다.", "있습니다.", "바랍니다."), "en": (".", ".", ".", "!", "?")}
+
+
+# ---------- 합성 코퍼스 ----------
+def _sentence(rng: random.Random, lang: str) -> str:
+    words = rng.choices(_WORDS[lang], k=rng.randint(6, 14))
+    if lang == "en":
+        words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice(_ENDINGS[lang])
+    return " ".join(words) + " " + rng.choice(_ENDINGS[lang])
+
+
+def synth_text(lang: str, n_chars: int, seed: int) -> str:
+    """문단(문장 3~7개)을 빈 줄로 이어 n_chars 글자 이상 → n_chars에서 자름"""
+    rng = random.Random(seed)
+    paras, size = [], 0
+    while size < n_chars:
+        p = " ".join(_sentence(rng, lang) for _ in range(rng.randint(3, 7)))
+        paras.append(p)
+        size += len(p) + 2
+    return "\n\n".join(paras)[:n_chars].rstrip()
+
+
+def make_corpus(root: str, lang: str, chunks: int, per_file: int = CHUNKS_PER_FILE) -> List[str]:
+    """root/<lang>/doc_00000.txt ... (chars 청커로 파일당 약 per_file 청크, 이미 있는 파일은 재사용)"""
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    n_chars = step * (per_file - 1) + CHUNK_SIZE
+    d = os.path.join(root, lang)
+    os.makedirs(d, exist_ok=True)
+    files = []
+    for i in range(math.ceil(chunks / per_file)):
+        fp = os.path.join(d, f"doc_{i:05d}.txt")
+        if not os.path.exists(fp):
+            with open(fp, "w", encoding="utf-8") as f:
+                f.write(synth_text(lang, n_chars, SEED + i * 7919 + (0 if lang == "ko" else 1)))
+        files.append(fp)
+    return files
+
+
+# ---------- 측정 ----------
+def peak_rss_mb() -> float | None:
+    """현재 프로세스의 최대 RSS (MB) — Linux ru_maxrss는 KB, macOS는 바이트, Windows는 psutil이 있으면 사용"""
+    if resource is not None:
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(r / (1 << 20) if sys.platform == "darwin" else r / 1024, 1)
+    try:
+        import psutil  # type: ignore
+        mi = psutil.Process().memory_info()
+        return round(getattr(mi, "peak_wset", mi.rss) / (1 << 20), 1)
+    except Exception:
+        return None
+
+
+class StageTimer:
+    def __init__(self):
+        self.sec: Dict[str, float] = {s: 0.0 for s in STAGES}
+
+    @contextmanager
+    def __call__(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sec[stage] += time.perf_counter() - t0
+
+
+def output_sizes(index_dir: str) -> Dict[str, int]:
+    sizes = {}
+    for name in sorted(os.listdir(index_dir)) if os.path.isdir(index_dir) else []:
+        p = os.path.join(index_dir, name)
+        if os.path.isfile(p):
+            sizes[name] = os.path.getsize(p)
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+# ---------- 실행 (자식 프로세스) ----------
+def run_stages(files: List[str], out_dir: str, model: str, chunker: Dict[str, Any], index_type: str) -> Dict[str, Any]:
+    """단계를 차례로 실행하며 단계별 누적 시간 측정 (build_index와 같은 청크/스토어/저장 경로)"""
+    from student.day2.impl.build_index import save_index
+    base_rss = peak_rss_mb()
+    timer = StageTimer()
+    split = make_chunker(chunker)
+    emb = Embeddings(model=model, cache_dir=None)
+    store: FaissStore | None = None
+    deferred = index_type not in ("flat", "hnsw")
+    pending: List[Dict[str, Any]] = []
+    n_docs = n_chunks = n_bytes = 0
+
+    def flush(items: List[Dict[str, Any]]):
+        nonlocal store
+        with timer("embed"):
+            vecs = emb.encode([it["text"] for it in items])
+        with timer("add"):
+            if store is None:
+                store = FaissStore(dim=vecs.shape[1], index_path=os.path.join(out_dir, "faiss.index"),
+                                   docs_path=os.path.join(out_dir, "docs.jsonl"), index_type=index_type)
+            (store.stage if deferred else store.add)(vecs, items)
+
+    t0 = time.perf_counter()
+    for fp in files:
+        n_bytes += os.path.getsize(fp)
+        with timer("load"):
+            loader = loader_for(fp)
+            raw = loader.sep.join(loader.extract(fp))
+        with timer("clean"):
+            text = clean_text(raw)
+        with timer("chunk"):
+            fmeta = file_meta(fp)
+            chunks = split(text)
+        n_docs += 1
+        n_chunks += len(chunks)
+        pending.extend({"id": f"{fp}::chunk_{i:04d}", "text": ch, "meta": {"path": fp, "chunk": i, **fmeta}}
+                       for i, ch in enumerate(chunks))
+        while len(pending) >= EMBED_WINDOW:
+            flush(pending[:EMBED_WINDOW])
+            del pending[:EMBED_WINDOW]
+    if pending:
+        flush(pending)
+    if store is None:  # 입력 파일이 없거나 모두 빈 파일 → 인덱스 없이 0청크 실행으로 보고
+        print(f"[BENCH] 청크가 없어 인덱스를 만들지 않습니다 (files={len(files)})")
+    else:
+        with timer("add"):
+            store.finish()
+        with timer("save"):
+            os.makedirs(out_dir, exist_ok=True)
+            save_index(store, out_dir, emb.model, chunker, recall=False)
+    total = time.perf_counter() - t0
+    return {"mode": "stages", "docs": n_docs, "chunks": n_chunks, "input_bytes": n_bytes,
+            "stages": {k: round(v, 4) for k, v in timer.sec.items()}, "total_sec": round(total, 4),
+            "chunks_per_sec": round(n_chunks / total, 1) if total else None,
+            "base_rss_mb": base_rss, "peak_rss_mb": peak_rss_mb(),
+            "index": store.index_info() if store is not None else None, "output": output_sizes(out_dir)}
+
+
+def run_e2e(files: List[str], out_dir: str, model: str, chunker: Dict[str, Any], index_type: str) -> Dict[str, Any]:
+    """실제 build_index (파싱·청크 / 임베딩 / 추가가 겹쳐 도는 스트리밍 경로) 전체 시간"""
+    from student.day2.impl.build_index import build_index
+    if chunker["type"] == "tokens":
+        kind = dict(chunker="tokens", chunk_tokens=chunker["max_tokens"], chunk_overlap_tokens=chunker["overlap_tokens"])
+    else:
+        kind = dict(chunk_size=chunker["chunk_size"], chunk_overlap=chunker["chunk_overlap"])
+    base_rss = peak_rss_mb()
+    t0 = time.perf_counter()
+    build_index(files, out_dir, model=model, cache_dir=None, index_type=index_type, versioned=False, full=True, **kind)
+    total = time.perf_counter() - t0
+    return {"mode": "e2e", "total_sec": round(total, 4), "base_rss_mb": base_rss, "peak_rss_mb": peak_rss_mb(),
+            "output": output_sizes(out_dir)}
+
+
+def _in_child(fn, *args):
+    """새 프로세스에서 fn 실행 (최대 RSS를 실행마다 분리)"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as ex:
+        return ex.submit(fn, *args).result()
+
+
+# ---------- 비교 / 출력 ----------
+def _key(r: Dict[str, Any]) -> tuple:
+    return r["lang"], r["target_chunks"], r["mode"]
+
+
+def _mb(n: int | None) -> str:
+    return "-" if n is None else f"{n / 1e6:.1f}MB"
+
+
+def summarize(r: Dict[str, Any]) -> str:
+    head = f"[BENCH] {r['lang']} {r['target_chunks']:>7,} {r['mode']:<6}"
+    tail = f"total={r['total_sec']:.2f}s peak_rss={r['peak_rss_mb']}MB out={_mb(r['output']['total'])}"
+    if r["mode"] != "stages":
+        return f"{head} {tail}"
+    stages = " ".join(f"{k}={v:.2f}s" for k, v in r["stages"].items())
+    return f"{head} chunks={r['chunks']:,} {stages} {tail} ({r['chunks_per_sec']:,} chunks/s)"
+
+
+def compare(report: Dict[str, Any], previous_path: str):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    prev = {_key(r): r for r in previous.get("runs", [])}
+    changed = [k for k in ("model", "chunker", "index_type", "chunks_per_file")
+               if previous.get("args", {}).get(k) != report["args"].get(k)]
+    if changed:
+        print(f"[COMPARE] 설정이 다름: {', '.join(changed)} (시간 차이에 설정 변경 효과가 포함됨)")
+    results = report["runs"]
+    for r in results:
+        p = prev.get(_key(r))
+        if p is None:
+            continue
+        ratio = r["total_sec"] / p["total_sec"] if p["total_sec"] else float("nan")
+        rss = (r["peak_rss_mb"] or 0) - (p["peak_rss_mb"] or 0)
+        line = (f"[COMPARE] {r['lang']} {r['target_chunks']:>7,} {r['mode']:<6} total {p['total_sec']:.2f}s → "
+                f"{r['total_sec']:.2f}s (x{ratio:.2f}) peak_rss {rss:+.1f}MB "
+                f"out {_mb(p['output']['total'])} → {_mb(r['output']['total'])}")
+        if r["mode"] == "stages" and p.get("stages"):
+            line += " | " + " ".join(f"{k} x{r['stages'][k] / p['stages'][k]:.2f}" for k in STAGES
+                                     if p["stages"].get(k))
+        print(line)
+
+
+def environment() -> Dict[str, Any]:
+    import faiss
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "faiss": getattr(faiss, "__version__", "unknown")}
+
+
+def bench(sizes: List[int] = SIZES, langs: List[str] = LANGS, model: str = "local-hash",
+          chunker: Dict[str, Any] | None = None, index_type: str = "auto", e2e: bool = False,
+          work_dir: str | None = None, keep: bool = False, out: str | None = None,
+          previous: str | None = None) -> Dict[str, Any]:
+    chunker = chunker or chunker_config()
+    root = work_dir or tempfile.mkdtemp(prefix="day2_bench_")
+    report = {"version": 1, "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+              "args": {"sizes": list(sizes), "langs": list(langs), "model": model, "chunker": chunker,
+                       "index_type": index_type, "chunks_per_file": CHUNKS_PER_FILE, "seed": SEED},
+              "runs": []}
+    try:
+        for lang in langs:
+            t0 = time.perf_counter()
+            all_files = make_corpus(os.path.join(root, "corpus"), lang, max(sizes))
+            print(f"[BENCH] {lang} 합성 코퍼스: files={len(all_files):,} ({time.perf_counter() - t0:.1f}s)")
+            for n in sorted(sizes):
+                files = all_files[:math.ceil(n / CHUNKS_PER_FILE)]
+                for mode, fn in (("stages", run_stages), ("e2e", run_e2e)):
+                    if mode == "e2e" and not e2e:
+                        continue
+                    out_dir = os.path.join(root, "index", f"{lang}_{n}_{mode}")
+                    shutil.rmtree(out_dir, ignore_errors=True)
+                    r = {"lang": lang, "target_chunks": n, "files": len(files),
+                         **_in_child(fn, files, out_dir, model, chunker, index_type)}
+                    r["mode"] = mode
+                    report["runs"].append(r)
+                    print(summarize(r))
+                    if not keep:
+                        shutil.rmtree(out_dir, ignore_errors=True)
+    finally:
+        if not keep and work_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    out = out or os.path.join(BENCH_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] 결과 → {out}")
+    if previous:
+        compare(report, previous)
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="합성 코퍼스로 build_index 단계별 시간/최대 RSS/출력 크기 측정")
+    ap.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    ap.add_argument("--langs", nargs="+", default=list(LANGS), choices=list(LANGS))
+    ap.add_argument("--model", default="local-hash")
+    ap.add_argument("--chunker", default="chars", choices=["chars", "tokens"])
+    ap.add_argument("--chunk_size", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--chunk_overlap", type=int, default=CHUNK_OVERLAP)
+    ap.add_argument("--chunk_tokens", type=int, default=CHUNK_TOKENS)
+    ap.add_argument("--chunk_overlap_tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    ap.add_argument("--index_type", default="auto", choices=["auto", *INDEX_TYPES])
+    ap.add_argument("--e2e", action="store_true")
+    ap.add_argument("--work_dir", default=None)
+    ap.add_argument("--keep", action="store_true")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--compare", default=None)
+    args = ap.parse_args()
+    bench(args.sizes, args.langs, args.model,
+          chunker_config(args.chunk_size, args.chunk_overlap, args.chunker, args.chunk_tokens,
+                         args.chunk_overlap_tokens, args.model),
+          args.index_type, e2e=args.e2e, work_dir=args.work_dir, keep=args.keep, out=args.out,
+          previous=args.compare)
@@ -14,60 +14,353 @@ except Exception:
     pass
 
 
-import argparse, numpy as np
+import argparse, shutil, numpy as np
 from typing import List
 
-from student.day2.impl.ingest import build_corpus, save_docs_jsonl
+from student.day2.impl.ingest import (save_docs_jsonl, chunker_config, list_files, ChunkStats, tokenizer_name,
+                                      NearDuplicates,
+                                      CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+from student.day2.impl.manifest import diff_sources, read_manifest, read_sources, write_manifest, write_sources
 from student.day2.impl.embeddings import Embeddings
-from student.day2.impl.store import FaissStore  # 제공됨
+from student.day2.impl.scheduler import DEFAULT_MAX_BATCH_TOKENS
+from student.day2.impl.store import FaissStore, INDEX_TYPES, STORAGE_TYPES  # 제공됨
+from student.day2.impl.pipeline import MAX_INFLIGHT, embed_stream
+from student.day2.impl.dedup import alias_path
+from student.day2.impl.sharded import (SHARDS_NAME, SHARD_BY, assign_files, read_shards, write_shards,
+                                       shard_dir, shard_name, is_sharded)
+from student.day2.impl.versions import KEEP_VERSIONS, check_unversioned, new_version, publish, resolve, link_tree
 
 
-def build_index(paths: List[str], index_dir: str, model: str | None = None, batch_size: int = 128):
+DEFAULT_CACHE_DIR = os.path.join("indices", "embed_cache")
+
+
+def build_index(paths: List[str], index_dir: str, model: str | None = None, batch_size: int = 128,
+                cache_dir: str | None = DEFAULT_CACHE_DIR, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                rpm: float | None = None, tpm: float | None = None,
+                chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP, chunker: str = "chars",
+                chunk_tokens: int = CHUNK_TOKENS, chunk_overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                dedup: float | None = None,
+                index_type: str = "auto", index_params: dict | None = None, mmap: bool = False,
+                shards: int = 0, shard_by: str = "source", only_shards: List[str] | None = None,
+                versioned: bool = True, keep_versions: int = KEEP_VERSIONS, base_dir: str | None = None,
+                full: bool = False, max_inflight: int = MAX_INFLIGHT):
     """
-    절차:
-      1) corpus = build_corpus(paths)
-         - [{"id":..., "text":..., "meta":{...}}, ...]
-      2) texts = [item["text"] for item in corpus]
-      3) emb = Embeddings(model=model, batch_size=batch_size)
-         vecs = emb.encode(texts)  # (N, D) L2 정규화된 np.ndarray
+    versioned=True(기본): index_dir/versions/<새 버전>/ 에 빌드한 뒤 CURRENT를 원자적으로 교체 (versions.py)
+      - 서빙 중인 이전 버전 파일은 건드리지 않음, 이전 버전은 keep_versions개까지 보관
+      - versioned=False: index_dir에 바로 기록 (base_dir: 샤드 재사용 등에 참고할 이전 빌드 디렉토리)
+        index_dir에 CURRENT가 있으면 새 빌드가 서빙되지 않으므로 RuntimeError (versions.check_unversioned)
+    shards > 0 이면 build_sharded_index로 위임 (index_dir/shards/<name>/ 마다 아래 절차 수행)
+    증분 빌드(기본): 이전 빌드의 sources.json과 비교해 추가/변경/삭제 파일만 반영 (update_index)
+      - 이전 빌드가 없거나 모델/청커/인덱스 설정이 바뀌었으면 자동으로 전체 빌드, full=True면 항상 전체 빌드
+
+    절차 (1~3단계는 pipeline.embed_stream으로 겹쳐 실행, 메모리에 있는 청크는 최대 max_inflight개):
+      1) iter_corpus(paths, chunk_size, chunk_overlap, chunker=...): 파일 하나씩 읽어 청크 생성 (파싱/청크 스레드)
+         - {"id":..., "text":..., "meta":{...}}
+         - chunker="chars": chunk_size/chunk_overlap 글자 윈도우
+           chunker="tokens": 문장/문단 단위로 chunk_tokens 토큰까지, 겹침 chunk_overlap_tokens (임베딩 모델 토크나이저)
+         - 끝나면 [CHUNK]로 임베딩한 토큰 수 출력 (tokens면 chars 청커 대비 절감량도)
+         - dedup=0.95: SimHash 유사도가 이 값 이상인 근사 중복 청크는 처음 것만 남김 (dedup.py)
+           나머지 청크 id는 대표 청크 meta["aliases"]에, 줄어든 임베딩 입력/인덱스 행 수는 [DEDUP]로 출력
+      2) 청크를 EMBED_WINDOW개 창으로 묶음
+      3) emb = Embeddings(model=model, batch_size=batch_size, cache_dir=cache_dir)
+         vecs = emb.encode(창의 texts)  # (n, D) L2 정규화된 np.ndarray (임베딩 스레드)
+         - cache_dir의 임베딩 캐시에 이미 있는 텍스트는 API를 다시 호출하지 않음 (None이면 캐시 미사용)
+         - 요청은 max_batch_tokens 토큰 예산으로 묶고 rpm/tpm 한도를 지킴, 끝나면 처리량 출력
       4) index_path = os.path.join(index_dir, "faiss.index")
          docs_path  = os.path.join(index_dir, "docs.jsonl")
-      5) store = FaissStore(dim=vecs.shape[1], index_path=index_path, docs_path=docs_path)
-         store.add(vecs, corpus); store.save()
-      6) save_docs_jsonl(corpus, docs_path)
+      5) store = FaissStore(dim=vecs.shape[1], index_path=index_path, docs_path=docs_path,
+                            index_type=index_type, index_params=index_params)
+         창마다 store.add(vecs, items) (auto / IVF 계열은 store.stage 후 마지막에 store.finish()), store.save()
+         - index_type: auto(벡터 수로 flat/hnsw/ivf/ivfpq 선택) 또는 직접 지정, IVF 계열은 샘플로 학습
+         - mmap=True: 이 index_dir은 서빙 시 mmap으로 로드 (meta에 기록)
+         - index_params["storage"]=fp16|sq8: 벡터 압축 저장, ["rerank"]=R: 원본 벡터(vectors.npy)로 재채점
+         - 정확 검색(flat/float32)이 아니면 Flat 대비 recall@10 출력
+      6) 문서 저장: store.save()가 docs.jsonl + 바이너리 문서 스토어(docs.bin / docs.idx.npy)를 함께 기록
+         원본 벡터는 vectors.npy(문서 순서와 정렬)로 저장 → reindex로 재임베딩 없이 다른 레이아웃 빌드
+      7) manifest.json 기록 (모델/차원/벡터 수/청커/파일 체크섬) → 로드 시 네트워크 없이 호환성 검사
+         sources.json 기록 (원본 파일별 크기/mtime/sha256 + 청크 id) → 다음 빌드의 증분 기준
     """
-   
-     # # 1) 코퍼스 생성
-    corpus = build_corpus(paths)  # list[dict{id, text, meta}]
-    
-    if not corpus:
+    build_kwargs = dict(model=model, batch_size=batch_size, cache_dir=cache_dir, max_batch_tokens=max_batch_tokens,
+                        rpm=rpm, tpm=tpm, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                        chunker=chunker, chunk_tokens=chunk_tokens, chunk_overlap_tokens=chunk_overlap_tokens,
+                        dedup=dedup, index_type=index_type, index_params=index_params, mmap=mmap, full=full,
+                        max_inflight=max_inflight)
+    if versioned:
+        name, target = new_version(index_dir)
+        try:
+            build_index(paths, target, shards=shards, shard_by=shard_by, only_shards=only_shards,
+                        versioned=False, base_dir=resolve(index_dir), **build_kwargs)
+        except BaseException:
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        if not (os.path.exists(os.path.join(target, "faiss.index")) or is_sharded(target)):
+            shutil.rmtree(target, ignore_errors=True)
+            print(f"[VERSION] 인덱스가 만들어지지 않아 CURRENT를 유지합니다: {index_dir}")
+            return
+        publish(index_dir, name, keep_versions)
+        return
+    check_unversioned(index_dir)
+    if shards:
+        return build_sharded_index(paths, index_dir, shards, shard_by, only_shards, base_dir=base_dir,
+                                   **build_kwargs)
+    if is_sharded(index_dir):
+        os.remove(os.path.join(index_dir, SHARDS_NAME))  # 단일 인덱스로 전환 → 서빙이 샤드 대신 이 인덱스를 사용
+    build_kwargs.pop("full")
+    if not full and update_index(paths, index_dir, base_dir or index_dir, **build_kwargs):
+        return
+
+    # 1)~3) 파싱/청크 → 임베딩 → store.add 를 겹쳐서 스트리밍 (pipeline.py, 메모리에는 최대 max_inflight 청크)
+    sources, _, _, _ = diff_sources(list_files(paths))
+    emb = Embeddings(model=model, batch_size=batch_size, cache_dir=cache_dir,
+                     max_batch_tokens=max_batch_tokens, rpm=rpm, tpm=tpm)
+    chunker_cfg = chunker_config(chunk_size, chunk_overlap, chunker, chunk_tokens, chunk_overlap_tokens, emb.model)
+    stats = _chunk_stats(chunker_cfg, emb.model, chunk_size, chunk_overlap)
+    near = NearDuplicates(dedup) if dedup else None
+    if near is not None:
+        chunker_cfg = {**chunker_cfg, "dedup": near.config()}
+    store = _stream_into(None, list(sources), emb, index_dir, chunker_cfg, max_inflight, stats, near,
+                         index_type=index_type, index_params=index_params, mmap=mmap)
+    if store is None:
         # 빈 코퍼스일 땐 인덱스 파일만 비워두고 종료
         os.makedirs(index_dir, exist_ok=True)
         docs_path = os.path.join(index_dir, "docs.jsonl")
         save_docs_jsonl([], docs_path)
         return
+    print(f"[CHUNK] {stats}")
+    if near is not None:
+        print(f"[DEDUP] {near}")
+    print(f"[EMBED] {emb.stats} (cached={len(store.docs) - emb.stats.items:,})")
+
+    # 4)~7) 인덱스 / 문서 스토어 / 원본 벡터 / 매니페스트 저장
+    save_index(store, index_dir, emb.model, chunker_cfg)
+    write_sources(index_dir, _with_chunks(sources, store.docs))
+
+
+def _stream_into(store: FaissStore | None, files: List[str], emb: Embeddings, index_dir: str,
+                 chunker: dict, max_inflight: int, stats: ChunkStats | None = None,
+                 dedup: NearDuplicates | None = None, **store_kwargs) -> FaissStore | None:
+    """
+    files를 embed_stream으로 흘려 store에 추가 (store=None이면 첫 창의 차원으로 새로 생성, 청크가 없으면 None)
+    - 새 스토어가 auto / IVF 계열이면 전체 벡터 수를 알아야 종류·학습이 정해짐 → stage로 행만 모았다가 finish()
+    """
+    deferred = store is None and store_kwargs.get("index_type", "auto") not in ("flat", "hnsw")
+    for items, vecs in embed_stream(files, emb, max_inflight=max_inflight, chunker=chunker, stats=stats,
+                                    dedup=dedup):
+        if not isinstance(vecs, np.ndarray) or vecs.ndim != 2:
+            raise ValueError("Embeddings.encode() must return a 2D numpy array of shape (N, D).")
+        if store is None:
+            store = _new_store(index_dir, vecs.shape[1], **store_kwargs)
+        (store.stage if deferred else store.add)(vecs, items)
+    if store is not None:
+        store.finish()
+    return store
 
-    # 2) 텍스트만 추출
-    texts = [item.get("text", "") for item in corpus]
 
-    # 3) 임베딩 생성
-    emb = Embeddings(model=model, batch_size=batch_size)
-    vecs = emb.encode(texts)  # np.ndarray [N, D]
-    if not isinstance(vecs, np.ndarray) or vecs.ndim != 2:
-        raise ValueError("Embeddings.encode() must return a 2D numpy array of shape (N, D).")
+def _chunk_stats(chunker: dict, model: str, chunk_size: int, chunk_overlap: int) -> ChunkStats:
+    """토큰 청커면 같은 문서를 chars 청커(chunk_size/chunk_overlap)로 나눴을 때와 비교"""
+    baseline = chunker_config(chunk_size, chunk_overlap) if chunker["type"] != "chars" else None
+    return ChunkStats(chunker.get("tokenizer") or tokenizer_name(model), baseline)
 
-    # 4) 경로 준비
+
+def _new_store(index_dir: str, dim: int, index_type: str = "auto", index_params: dict | None = None,
+               mmap: bool = False) -> FaissStore:
     os.makedirs(index_dir, exist_ok=True)
-    index_path = os.path.join(index_dir, "faiss.index")
-    docs_path  = os.path.join(index_dir, "docs.jsonl")
+    return FaissStore(dim=dim, index_path=os.path.join(index_dir, "faiss.index"),
+                      docs_path=os.path.join(index_dir, "docs.jsonl"),
+                      index_type=index_type, index_params=index_params, mmap=mmap)
+
+
+def _with_chunks(sources: dict, corpus: List[dict]) -> dict:
+    """소스 상태에 파일별 청크 id 채우기 (corpus에 있는 파일만)"""
+    chunks = {}
+    for it in corpus:
+        chunks.setdefault(it["meta"]["path"], []).append(it["id"])
+    return {fp: {**st, "chunks": chunks[fp]} if fp in chunks else st for fp, st in sources.items()}
+
+
+def _alias_files(store: FaissStore, gone: set, sources: dict) -> List[str]:
+    """gone 파일의 청크가 대표였던 별칭 청크의 파일 (gone이 아니고 아직 소스에 있는 것만)"""
+    docs = store.editable_docs()
+    found = {alias_path(a) for i in np.flatnonzero(store.ids != -1) if docs[i]["meta"].get("path") in gone
+             for a in docs[i]["meta"].get("aliases", ())}
+    return sorted(p for p in found - gone if p in sources)
 
-    # 5) FAISS 저장
-    store = FaissStore(dim=vecs.shape[1], index_path=index_path, docs_path=docs_path)
+
+def _live_docs(store: FaissStore, gone: set) -> List[dict]:
+    """삭제되지 않은 문서 행 (gone 파일을 가리키던 별칭은 지움 → 다시 처리하면서 새로 기록)"""
+    docs = store.editable_docs()
+    live = [docs[i] for i in np.flatnonzero(store.ids != -1)]
+    for d in live:
+        aliases = d["meta"].get("aliases")
+        if aliases:
+            kept = [a for a in aliases if alias_path(a) not in gone]
+            if kept:
+                d["meta"]["aliases"] = kept
+            else:
+                del d["meta"]["aliases"]
+    return live
+
+
+def update_index(paths: List[str], index_dir: str, base_dir: str, model: str | None = None, batch_size: int = 128,
+                 cache_dir: str | None = DEFAULT_CACHE_DIR, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 rpm: float | None = None, tpm: float | None = None,
+                 chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP, chunker: str = "chars",
+                 chunk_tokens: int = CHUNK_TOKENS, chunk_overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 dedup: float | None = None,
+                 index_type: str = "auto", index_params: dict | None = None, mmap: bool = False,
+                 max_inflight: int = MAX_INFLIGHT) -> bool:
+    """
+    증분 빌드: base_dir(이전 빌드)의 인덱스에 변경분만 반영해 index_dir에 기록 (같은 디렉토리도 가능)
+    - 삭제/변경 파일: store.delete(경로) → 변경/추가 파일만 청크 + 임베딩 → store.add (embed_stream)
+    - 변경이 없으면 base_dir을 하드링크로 가져옴 (index_dir이 다를 때)
+    - dedup: 남는 청크를 대표로 미리 등록 → 새 청크도 기존 청크와 비교
+      지워지는 대표 청크에 별칭이 있던 파일은 함께 다시 처리 (그 파일 청크는 인덱스에 없으므로)
+    - 반환 False: 증분 불가 → 호출 쪽에서 전체 빌드
+      (sources.json/매니페스트 없음, 모델/청커/인덱스 종류·파라미터 변경, 청크 id/원본 벡터 없는 예전 인덱스)
+    """
+    prev_sources, manifest = read_sources(base_dir), read_manifest(base_dir)
+    files = list_files(paths)
+    if prev_sources is None or manifest is None or not files:
+        return False
+    emb = Embeddings(model=model, batch_size=batch_size, cache_dir=cache_dir,
+                     max_batch_tokens=max_batch_tokens, rpm=rpm, tpm=tpm)
+    chunker_cfg = chunker_config(chunk_size, chunk_overlap, chunker, chunk_tokens, chunk_overlap_tokens, emb.model)
+    near = NearDuplicates(dedup) if dedup else None
+    if near is not None:
+        chunker_cfg = {**chunker_cfg, "dedup": near.config()}
+    info = manifest.get("index") or {}
+    reason = None
+    if manifest.get("embedding_model") != emb.model:
+        reason = f"임베딩 모델 변경 ({manifest.get('embedding_model')} → {emb.model})"
+    elif manifest.get("chunker") != chunker_cfg:
+        reason = "청커/중복 제거 설정 변경"
+    elif index_type != "auto" and info.get("type") != index_type:
+        reason = f"인덱스 종류 변경 ({info.get('type')} → {index_type})"
+    elif any((info.get("params") or {}).get(k) != v for k, v in (index_params or {}).items()):
+        reason = "인덱스 파라미터 변경"
+    if reason:
+        print(f"[INCR] {reason} → 전체 빌드")
+        return False
+
+    sources, added, changed, removed = diff_sources(files, prev_sources)
+    if not (added or changed or removed):
+        if os.path.abspath(base_dir) != os.path.abspath(index_dir):
+            link_tree(base_dir, index_dir)
+        write_sources(index_dir, sources)  # touch된 파일의 mtime 갱신
+        print(f"[INCR] 변경 없음: files={len(files):,}")
+        return True
+
+    store = FaissStore.load(os.path.join(base_dir, "faiss.index"), os.path.join(base_dir, "docs.jsonl"),
+                            mmap=False, migrate=True)
+    if store.ids is None or store.vectors is None:
+        print("[INCR] 청크 id/원본 벡터가 없는 예전 인덱스 → 전체 빌드")
+        return False
+    realias: List[str] = []  # 원본은 그대로지만 대표 청크가 지워져 다시 처리하는 별칭 파일
+    if near is not None:
+        realias = _alias_files(store, set(changed + removed), sources)
+        if realias:
+            print(f"[DEDUP] 지워지는 대표 청크의 별칭 파일 {len(realias)}개 다시 처리")
+    redo = changed + realias
+    n_deleted = store.delete(redo + removed) if redo or removed else 0
+    if near is not None:
+        near.seed(_live_docs(store, set(redo + removed)))
+    n_rows = len(store.docs)
+    stats = _chunk_stats(chunker_cfg, emb.model, chunk_size, chunk_overlap)
+    _stream_into(store, added + redo, emb, index_dir, chunker_cfg, max_inflight, stats, near)
+    n_added = len(store.docs) - n_rows
+    if n_added:
+        print(f"[CHUNK] {stats}")
+        print(f"[EMBED] {emb.stats} (cached={n_added - emb.stats.items:,})")
+    if near is not None and near.kept + near.dropped:
+        print(f"[DEDUP] {near}")
+    store.compact()
+    print(f"[INCR] added={len(added)} changed={len(changed)} removed={len(removed)} "
+          + (f"realiased={len(realias)} " if realias else "")
+          + f"unchanged={len(files) - len(added) - len(redo):,} chunks: -{n_deleted:,} +{n_added:,}")
+
+    os.makedirs(index_dir, exist_ok=True)
+    store.index_path = os.path.join(index_dir, "faiss.index")
+    store.docs_path = os.path.join(index_dir, "docs.jsonl")
+    store.mmap = mmap
+    save_index(store, index_dir, emb.model, chunker_cfg, recall=False)
+    write_sources(index_dir, _with_chunks(sources, store.docs))
+    return True
+
+
+def write_index(corpus: List[dict], vecs: np.ndarray, index_dir: str, model: str, chunker: dict,
+                index_type: str = "auto", index_params: dict | None = None, mmap: bool = False) -> FaissStore:
+    """
+    임베딩이 끝난 코퍼스로 index_dir 작성 (reindex가 사용)
+    - vecs: corpus와 같은 순서의 L2 정규화 벡터 → vectors.npy(원본 벡터 사이드카)로도 저장
+    """
+    store = _new_store(index_dir, vecs.shape[1], index_type, index_params, mmap)
     store.add(vecs, corpus)
+    return save_index(store, index_dir, model, chunker)
+
+
+def save_index(store: FaissStore, index_dir: str, model: str, chunker: dict, recall: bool = True) -> FaissStore:
+    """
+    build_index 4~7단계: 인덱스 / 문서 스토어 / 원본 벡터(vectors.npy) / ids.npy 저장 → 매니페스트
+    - recall: 정확 검색(flat/float32)이 아니면 Flat 대비 recall@10 출력
+    """
     store.save()
+    size_mb = os.path.getsize(store.index_path) / 1e6
+    print(f"[INDEX] type={store.index_type} params={store.index_params} ntotal={store.index.ntotal:,} "
+          f"size={size_mb:.2f}MB")
+    if recall and (store.index_type != "flat" or store.index_params.get("storage", "float32") != "float32"):
+        print(f"[RECALL] recall@10 vs flat = {store.recall_vs_flat(store.vectors, top_k=10):.3f} "
+              f"(rerank={store.rerank or 'off'})")
+
+    # 6) 원본 문서 메타: store.save()에서 docs.jsonl + docs.bin / docs.idx.npy로 저장됨
+    #    (여기서 docs.jsonl을 다시 쓰면 바이너리 스토어가 오래된 것으로 판정되어 로드 때마다 재변환)
+
+    # 7) 매니페스트 (반드시 마지막: 파일 크기/체크섬이 최종본 기준)
+    write_manifest(index_dir, model=model, dim=store.dim, count=store.index.ntotal,
+                   chunker=chunker, index=store.index_info())
+    return store
+
 
-    # 6) 원본 문서 메타 저장
-    save_docs_jsonl(corpus, docs_path)
+def build_sharded_index(paths: List[str], index_dir: str, shards: int, shard_by: str = "source",
+                        only_shards: List[str] | None = None, base_dir: str | None = None, **build_kwargs):
+    """
+    파일 단위로 샤드를 나눠 index_dir/shards/<name>/ 에 각각 빌드
+    - 배정은 shards.json에 기록, 같은 샤드 수/기준이면 이전 배정 유지
+    - only_shards: 지정한 샤드만 재빌드 (나머지 샤드 디렉토리는 건드리지 않음)
+      base_dir(이전 버전)이 따로 있으면 나머지 샤드는 하드링크로 가져옴 → 내용/inode 그대로
+    - shards.json은 마지막에 원자적으로 교체 → 서빙은 새 샤드 목록을 한 번에 봄
+    """
+    base_dir = base_dir or index_dir
+    prev = read_shards(base_dir)
+    same_layout = prev is not None and prev.get("n") == shards and prev.get("by") == shard_by
+    assignment = assign_files(list_files(paths), shards, shard_by,
+                              previous=prev.get("files") if same_layout else None)
+    names = [shard_name(i) for i in range(shards)]
+    if only_shards:
+        unknown = sorted(set(only_shards) - set(names))
+        if unknown:
+            raise ValueError(f"없는 샤드입니다: {unknown} (가능: {', '.join(names)})")
+        if not same_layout:
+            raise ValueError("샤드 수/기준이 기존 shards.json과 달라 일부 샤드만 재빌드할 수 없습니다 (전체 재빌드 필요)")
+
+    for name in names:
+        d = shard_dir(index_dir, name)
+        if only_shards and name not in only_shards:
+            src = shard_dir(base_dir, name)
+            if os.path.abspath(src) != os.path.abspath(d) and os.path.isdir(src):
+                link_tree(src, d)
+            continue
+        files = sorted(fp for fp, s in assignment.items() if s == name)
+        if not files:
+            shutil.rmtree(d, ignore_errors=True)
+            continue
+        print(f"[SHARD] {name}: files={len(files)}")
+        build_index(files, d, versioned=False, base_dir=shard_dir(base_dir, name), **build_kwargs)
+
+    built = [n for n in names
+             if n in assignment.values() and os.path.exists(os.path.join(shard_dir(index_dir, n), "faiss.index"))]
+    os.makedirs(index_dir, exist_ok=True)
+    write_shards(index_dir, {"n": shards, "by": shard_by, "shards": built, "files": assignment})
+    print(f"[SHARD] {len(built)}/{shards} shards → {os.path.join(index_dir, SHARDS_NAME)}")
 
 """
 실행 방법! 꼭 터미널에 아래 코드를 복사해서 붙여넣고 실행 먼저!
@@ -78,6 +371,26 @@ python -m student.day2.impl.build_index `
   --model text-embedding-3-small `
   --batch_size 128
 
+(옵션) --model local-hash : 네트워크 없이 로컬 해시 임베딩으로 빌드 (질의 때도 Day2Plan.embedding_model="local-hash")
+(옵션) --cache_dir indices/embed_cache : 임베딩 캐시 위치 / --no_cache : 캐시 미사용
+(옵션) --index_type auto|flat|hnsw|ivf|ivfpq --nprobe 16 --ef_search 64 : 인덱스 종류 / 검색 파라미터
+(옵션) --storage float32|fp16|sq8 --rerank 4 : 벡터 압축 저장(메모리 1/2, 1/4) / 원본 벡터로 상위 후보 재채점
+(옵션) --shards 4 --shard_by source|size : 파일 단위로 샤드 분할 빌드 / --only_shard shard_02 : 해당 샤드만 재빌드
+(옵션) --full : 증분 빌드 대신 전체 재빌드 (기본은 sources.json 기준으로 추가/변경/삭제 파일만 반영)
+(옵션) --keep_versions 3 : 보관할 이전 버전 수 / --no_versions : 버전 없이 index_dir에 바로 기록 (CURRENT가 없는 index_dir만)
+       되돌리기: python -m student.day2.impl.versions --index_dir indices/day2 --rollback
+(옵션) --mmap : 서빙 시 인덱스를 mmap으로 로드 (워커 간 페이지 캐시 공유, 빠른 기동)
+(옵션) --chunker tokens --chunk_tokens 512 --chunk_overlap_tokens 64 : 문장/문단 단위로 토큰 예산까지 채우는 청커
+       (기본 chars: --chunk_size 1200 --chunk_overlap 200 글자 윈도우) — 청커를 바꾸면 다음 빌드는 자동으로 전체 빌드
+(옵션) --dedup 0.95 : 근사 중복 청크 제거 (SimHash 유사도 기준) — 원문을 인용한 산출물(*__day1__*.md 등)이 섞인 폴더용
+       대표 청크만 임베딩/인덱싱, 나머지 청크 id는 대표 청크 meta["aliases"]에 기록
+(옵션) --max_inflight 8192 : 파싱·임베딩·인덱스 추가가 겹쳐 도는 동안 메모리에 둘 최대 청크 수
+(참고) 입력 형식: txt/md/pdf/hwpx/csv/html — data/raw를 중간 파일 없이 직접 읽음, 새 형식은 ingest.register_loader()
+(참고) 파싱 프로세스 수: 환경변수 DAY2_PARSE_WORKERS (기본 min(4, CPU 수), 1이면 직렬) — 큰 PDF는 페이지 단위로 나눠 병렬 처리
+(참고) PDF 추출 텍스트 캐시: indices/text_cache (환경변수 TEXT_CACHE_DIR, 빈 값이면 끔) — 바뀌지 않은 PDF는 재파싱 없음
+(옵션) --max_batch_tokens 50000 --rpm 3000 --tpm 1000000 : 요청당 토큰 예산 / 분당 요청·토큰 한도
+(참고) 빌드 성능 측정(합성 코퍼스 1k/10k/100k 청크, 단계별 시간·최대 RSS → JSON): python -m student.day2.impl.bench
+(참고) 인덱스 종류/압축/샤드만 바꿀 때는 재임베딩 없이: python -m student.day2.impl.reindex --src indices/day2 --dst ...
 """
 
 if __name__ == "__main__":
@@ -86,7 +399,41 @@ if __name__ == "__main__":
     ap.add_argument("--index_dir", default="indices/day2")
     ap.add_argument("--model", default=None)
     ap.add_argument("--batch_size", type=int, default=128)
+    ap.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR)
+    ap.add_argument("--no_cache", action="store_true")
+    ap.add_argument("--max_batch_tokens", type=int, default=DEFAULT_MAX_BATCH_TOKENS)
+    ap.add_argument("--rpm", type=float, default=None)
+    ap.add_argument("--tpm", type=float, default=None)
+    ap.add_argument("--chunk_size", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--chunk_overlap", type=int, default=CHUNK_OVERLAP)
+    ap.add_argument("--chunker", default="chars", choices=["chars", "tokens"])
+    ap.add_argument("--chunk_tokens", type=int, default=CHUNK_TOKENS)
+    ap.add_argument("--chunk_overlap_tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    ap.add_argument("--dedup", type=float, default=None)
+    ap.add_argument("--index_type", default="auto", choices=["auto", *INDEX_TYPES])
+    ap.add_argument("--nprobe", type=int, default=None)
+    ap.add_argument("--ef_search", type=int, default=None)
+    ap.add_argument("--storage", default=None, choices=list(STORAGE_TYPES))
+    ap.add_argument("--rerank", type=int, default=None)
+    ap.add_argument("--mmap", action="store_true")
+    ap.add_argument("--shards", type=int, default=0)
+    ap.add_argument("--shard_by", default="source", choices=list(SHARD_BY))
+    ap.add_argument("--only_shard", nargs="+", default=None)
+    ap.add_argument("--keep_versions", type=int, default=KEEP_VERSIONS)
+    ap.add_argument("--no_versions", action="store_true")
+    ap.add_argument("--full", action="store_true")
+    ap.add_argument("--max_inflight", type=int, default=MAX_INFLIGHT)
     args = ap.parse_args()
+    index_params = {k: v for k, v in (("nprobe", args.nprobe), ("efSearch", args.ef_search),
+                                      ("storage", args.storage), ("rerank", args.rerank)) if v is not None}
 
     os.makedirs(args.index_dir, exist_ok=True)
-    build_index(args.paths, args.index_dir, args.model, args.batch_size)
+    build_index(args.paths, args.index_dir, args.model, args.batch_size,
+                cache_dir=None if args.no_cache else args.cache_dir,
+                max_batch_tokens=args.max_batch_tokens, rpm=args.rpm, tpm=args.tpm,
+                chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, chunker=args.chunker,
+                chunk_tokens=args.chunk_tokens, chunk_overlap_tokens=args.chunk_overlap_tokens, dedup=args.dedup,
+                index_type=args.index_type, index_params=index_params or None, mmap=args.mmap,
+                shards=args.shards, shard_by=args.shard_by, only_shards=args.only_shard,
+                versioned=not args.no_versions, keep_versions=args.keep_versions, full=args.full,
+                max_inflight=args.max_inflight)
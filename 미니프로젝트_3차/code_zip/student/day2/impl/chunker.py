@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+토큰 기준 청커 (ingest.chunker_config(kind="tokens")로 선택)
+- 단위: 문장(. ! ? 。 등 뒤 공백) / 줄바꿈 → 단위를 자르지 않고 max_tokens까지 채움
+- 문단(빈 줄) 경계 우선: 청크가 절반 이상 찼고 다음 문단이 통째로 안 들어가면 문단 앞에서 끊음
+- 겹침: 직전 청크의 끝 문장들을 overlap_tokens 이내로 다음 청크 앞에 다시 포함 (글자 수가 아니라 토큰 기준)
+- max_tokens보다 긴 한 문장만 공백 근처에서 나눔
+- max_tokens는 실제로 내보내는 구간(단위 사이 공백/개행 포함) 기준의 상한
+    단위 토큰 합 + 구분 글자 수가 한도 안이면 그대로 넣고, 한도 근처에서만 구간을 직접 세어 확인
+- 토큰 수: tiktoken(모델 인코더, pyproject 의존성)으로 정확히 계산
+    tiktoken이 없으면 scheduler.estimate_tokens 추정으로 대신하고 [WARN] 출력 (local-hash 모델은 원래 추정 사용)
+    어느 쪽을 썼는지 청커 설정의 "tokenizer"로 매니페스트에 기록 → 바뀌면 증분 빌드 대신 전체 빌드
+- 청크는 원문 구간 그대로 (공백/개행 보존)
+"""
+
+from __future__ import annotations
+import re, math
+from typing import Callable, List, Tuple
+
+from .scheduler import estimate_tokens, tiktoken
+
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+MODEL_MAX_TOKENS = 8191  # OpenAI embeddings 입력 한도
+_BOUNDARY = re.compile(r"(?<=[.!?。？！…])\s+|\s*\n\s*")
+
+
+def tokenizer_name(model: str | None = None) -> str:
+    """모델 토크나이저 이름 (tiktoken 인코딩 이름, 미설치면 "estimate" — 토큰 청커로 쓸 때는 경고, chunker_config)"""
+    if tiktoken is None:
+        return "estimate"
+    try:
+        return tiktoken.encoding_for_model(model or "").name
+    except Exception:
+        return "cl100k_base"
+
+
+def token_counter(tokenizer: str) -> Callable[[str], int]:
+    if tokenizer == "estimate" or tiktoken is None:
+        return lambda s: estimate_tokens(s, "")  # tiktoken 없으면 ASCII 4글자/그 외 1글자 = 1토큰
+    enc = tiktoken.get_encoding(tokenizer)
+    return lambda s: max(1, len(enc.encode(s, disallowed_special=())))
+
+
+def _units(text: str) -> List[Tuple[int, int, bool]]:
+    """(시작, 끝, 문단 시작 여부) 목록 — 경계 공백은 단위에서 제외"""
+    out: List[Tuple[int, int, bool]] = []
+    start, para = 0, True
+    for m in _BOUNDARY.finditer(text):
+        if m.start() > start:
+            out.append((start, m.start(), para))
+        para = m.group().count("\n") >= 2
+        start = m.end()
+    if start < len(text):
+        out.append((start, len(text), para))
+    return out
+
+
+def _split_long(text: str, a: int, b: int, n_tokens: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """max_tokens보다 긴 단위를 비슷한 길이로 나눔 (가능하면 공백에서)"""
+    n = math.ceil(n_tokens / max_tokens)
+    step = (b - a) / n
+    cuts = [a]
+    for i in range(1, n):
+        at = int(a + step * i)
+        space = text.rfind(" ", cuts[-1] + 1, at)
+        cuts.append(space + 1 if space > cuts[-1] + step / 2 else at)
+    cuts.append(b)
+    return [(x, y) for x, y in zip(cuts, cuts[1:]) if y > x]
+
+
+def chunk_tokens(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 tokenizer: str = "estimate") -> List[str]:
+    """문장/문단 단위로 max_tokens까지 채운 청크 목록 (text는 clean_text를 거친 것으로 가정)"""
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError(f"overlap_tokens는 0 이상 max_tokens 미만이어야 합니다 (max={max_tokens}, overlap={overlap_tokens})")
+    count = token_counter(tokenizer)
+    if count(text) <= max_tokens:
+        return [text]
+    units: List[Tuple[int, int, bool, int]] = []
+    for a, b, para in _units(text):
+        n = count(text[a:b])
+        if n <= max_tokens:
+            units.append((a, b, para, n))
+            continue
+        pieces = _split_long(text, a, b, n, max_tokens)
+        while pieces:
+            x, y = pieces.pop(0)
+            m = count(text[x:y])
+            if m > max_tokens and y - x > 1:  # 나눈 조각이 아직 길면 다시 나눔
+                pieces[:0] = _split_long(text, x, y, m, max_tokens)
+                continue
+            units.append((x, y, para and x == a, m))
+
+    # 문단 i의 남은 토큰 수 (문단 경계에서 끊을지 판단)
+    para_rest = [0] * len(units)
+    rest = 0
+    for i in range(len(units) - 1, -1, -1):
+        rest += units[i][3]
+        para_rest[i] = rest
+        if units[i][2]:
+            rest = 0
+
+    def fits(first: int, last: int, tokens: int) -> bool:
+        """units[first]~units[last] 원문 구간(구분 공백 포함)이 max_tokens 이내인지 — tokens: 그 단위들의 토큰 합"""
+        if tokens > max_tokens:
+            return False
+        a, b = units[first][0], units[last][1]
+        gap = (b - a) - sum(units[j][1] - units[j][0] for j in range(first, last + 1))
+        return tokens + gap <= max_tokens or count(text[a:b]) <= max_tokens
+
+    chunks: List[str] = []
+    cur: List[int] = []  # 현재 청크의 단위 번호
+    cur_tokens = 0
+    for i, (a, b, para, n) in enumerate(units):
+        full = bool(cur) and not fits(cur[0], i, cur_tokens + n)
+        para_break = para and cur_tokens >= max_tokens // 2 and cur_tokens + para_rest[i] > max_tokens
+        if cur and (full or para_break):
+            chunks.append(text[units[cur[0]][0]:units[cur[-1]][1]])
+            keep, kept = [], 0  # 끝에서부터 overlap_tokens 이내 문장 유지 (전체를 유지하면 진행이 없으므로 제외)
+            for j in reversed(cur[1:]):
+                if kept + units[j][3] > overlap_tokens or not fits(j, i, kept + units[j][3] + n):
+                    break
+                keep.insert(0, j)
+                kept += units[j][3]
+            cur, cur_tokens = keep, kept
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        chunks.append(text[units[cur[0]][0]:units[cur[-1]][1]])
+    return chunks
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+근사 중복 청크 제거 (임베딩 전, iter_corpus(dedup=...)에서 사용)
+- data/processed처럼 원문과 그 원문을 인용한 에이전트 산출물이 섞인 폴더 → 같은 구절을 여러 번 임베딩/검색하지 않게
+- SimHash(64bit): 정규화한 텍스트의 글자 SHINGLE-gram 해시를 비트별 다수결 → 비슷한 텍스트는 해밍 거리가 작음
+- 유사도 = 1 - 해밍거리/64, threshold 이상이면 같은 묶음
+    후보 검색: 64비트를 (허용 거리 + 1)개 밴드로 나눠 밴드 값이 같은 것만 비교 (비둘기집 원리로 누락 없음)
+- 묶음마다 처음 나온 청크 하나만 남기고, 나머지 청크 id는 대표 청크 meta["aliases"]에 기록
+    증분 빌드에서는 이미 인덱스에 있는 청크가 대표 (대표가 지워지면 별칭 파일을 다시 처리 → build_index.update_index)
+- 샤드 빌드에서는 샤드 안에서만 비교
+- 빈 청크(공백뿐인 것 포함)는 비교하지 않고 그대로 남김 — simhash("") = 0 이라 모두 한 묶음이 되는 것 방지
+"""
+
+from __future__ import annotations
+import re
+from typing import Any, Dict, Iterable, List
+import numpy as np
+
+from .scheduler import estimate_tokens
+
+DEDUP_THRESHOLD = 0.95  # 해밍 거리 3비트 이내
+SHINGLE = 5
+_BITS = np.arange(64, dtype=np.uint64)
+_PRIME = np.uint64(1099511628211)
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 마무리 단계 (글자 코드 롤링 해시의 비트를 고르게 섞음)"""
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def simhash(text: str, shingle: int = SHINGLE) -> int:
+    s = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    codes = np.frombuffer(s.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    n = max(1, len(codes) - shingle + 1)
+    h = np.zeros(n, dtype=np.uint64)
+    for k in range(min(shingle, len(codes))):
+        h = h * _PRIME + codes[k:k + n]
+    votes = ((_mix(h)[:, None] >> _BITS) & np.uint64(1)).sum(axis=0)
+    return int((((votes * 2) > n).astype(np.uint64) << _BITS).sum())
+
+
+def alias_path(chunk_id: str) -> str:
+    """"<path>::chunk_0003" → "<path>" """
+    return chunk_id.rsplit("::", 1)[0]
+
+
+class NearDuplicates:
+    """
+    스트리밍 근사 중복 판정
+    - check(item): 앞서 남긴 청크와 threshold 이상 비슷하면 그 대표 청크 meta["aliases"]에 item id를 추가하고 True
+      아니면 item을 대표로 등록하고 False
+    - seed(items): 증분 빌드에서 이미 인덱스에 있는 청크를 대표로 등록
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, shingle: int = SHINGLE):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"dedup threshold는 0~1 사이여야 합니다: {threshold}")
+        self.threshold = threshold
+        self.shingle = shingle
+        self.max_distance = int(round((1 - threshold) * 64, 6))
+        n_bands = min(64, self.max_distance + 1)
+        edges = [64 * i // n_bands for i in range(n_bands + 1)]
+        self._bands = [(a, (1 << (b - a)) - 1) for a, b in zip(edges, edges[1:])]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._hashes: List[int] = []
+        self._items: List[Dict[str, Any]] = []
+        self.kept = 0
+        self.dropped = 0
+        self.dropped_tokens = 0
+
+    def config(self) -> Dict[str, Any]:
+        """매니페스트 기록용 (바뀌면 증분 대신 전체 빌드)"""
+        return {"type": "simhash", "threshold": self.threshold, "shingle": self.shingle}
+
+    def _find(self, h: int) -> int:
+        for t, (shift, mask) in zip(self._tables, self._bands):
+            for j in t.get((h >> shift) & mask, ()):
+                if bin(h ^ self._hashes[j]).count("1") <= self.max_distance:
+                    return j
+        return -1
+
+    def _register(self, h: int, item: Dict[str, Any]):
+        j = len(self._items)
+        self._hashes.append(h)
+        self._items.append(item)
+        for t, (shift, mask) in zip(self._tables, self._bands):
+            t.setdefault((h >> shift) & mask, []).append(j)
+
+    def seed(self, items: Iterable[Dict[str, Any]]):
+        for it in items:
+            if (it.get("text") or "").strip():
+                self._register(simhash(it["text"], self.shingle), it)
+
+    def check(self, item: Dict[str, Any]) -> bool:
+        if not (item.get("text") or "").strip():  # 빈 청크는 지문 없이 통과
+            self.kept += 1
+            return False
+        h = simhash(item.get("text", ""), self.shingle)
+        j = self._find(h)
+        if j < 0:
+            self._register(h, item)
+            self.kept += 1
+            return False
+        self._items[j].setdefault("meta", {}).setdefault("aliases", []).append(item["id"])
+        self.dropped += 1
+        self.dropped_tokens += estimate_tokens(item.get("text", ""))
+        return True
+
+    def __str__(self) -> str:
+        total = self.kept + self.dropped
+        rate = self.dropped / total if total else 0.0
+        return (f"threshold={self.threshold} kept={self.kept:,} dropped={self.dropped:,} ({rate:.1%}) "
+                f"→ 임베딩 입력 -{self.dropped:,}건 (~{self.dropped_tokens:,} tokens), 인덱스 행 -{self.dropped:,}")
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+오프셋 인덱스 기반 문서 스토어 (docs.jsonl 전체 로드 대체)
+- docs.bin     : 문서 레코드(JSON, utf-8)를 이어 붙인 blob → mmap으로 읽음
+- docs.idx.npy : int64 오프셋 배열 (N+1) → np.load(mmap_mode="r")
+- 행 i = json.loads(blob[off[i]:off[i+1]]) : 검색 결과(top_k)만 디코딩
+- 로드 시간/상주 메모리가 코퍼스 크기와 무관
+- 마이그레이션: docs.jsonl만 있으면 한 줄씩 읽어 바이너리 스토어 생성 (migrate_jsonl / __main__)
+    빌드 쪽(build_index 증분 / reindex / __main__)에서만 수행, 서빙 load는 스토어가 없으면 docs.jsonl을 읽기만 함
+    파일 테이블이 없는 예전 스토어도 서빙 쪽에서는 메모리에서만 만들고 파일로 쓰지 않음
+    docs.lock 잠금 안에서 수행, 임시 파일은 pid + 임의 접미사 이름 → 여러 프로세스가 동시에 돌아도 서로 덮어쓰지 않음
+- 파일 테이블(메타 필터용): docs.files.json [{path, ext, source, date}] + docs.fileidx.npy (행 → 파일 번호, int32)
+    필터는 파일 단위로 평가 후 fileidx로 행 비트맵 생성 → 문서 디코딩 없음
+
+실행 (기존 인덱스 변환):
+  python -m student.day2.impl.docstore --docs indices/day2/docs.jsonl
+"""
+
+from __future__ import annotations
+import os, json, mmap, argparse
+from typing import Any, Dict, Iterable, Iterator, List
+import numpy as np
+
+from student.common.file_lock import file_lock, tmp_path
+from .ingest import file_meta
+
+FILE_KEYS = ("ext", "source", "date")
+
+
+def docstore_paths(docs_path: str):
+    """docs.jsonl 경로 → (docs.bin, docs.idx.npy)"""
+    base = os.path.splitext(docs_path)[0]
+    return base + ".bin", base + ".idx.npy"
+
+
+def filetable_paths(docs_path: str):
+    """docs.jsonl 경로 → (docs.files.json, docs.fileidx.npy)"""
+    base = os.path.splitext(docs_path)[0]
+    return base + ".files.json", base + ".fileidx.npy"
+
+
+class _FileTable:
+    """문서 스트림을 보며 파일 테이블 누적 (메타에 ext/source/date가 없으면 경로로 보충)"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.files: List[Dict[str, Any]] = []
+        self.rows: List[int] = []
+
+    def add(self, item: Dict[str, Any]):
+        meta = item.get("meta") or {}
+        path = meta.get("path", "")
+        fid = self.ids.get(path)
+        if fid is None:
+            fid = self.ids[path] = len(self.files)
+            attrs = meta if all(k in meta for k in FILE_KEYS) else {**file_meta(path), **meta}
+            self.files.append({"path": path, **{k: attrs.get(k, "") for k in FILE_KEYS}})
+        self.rows.append(fid)
+
+    def arrays(self):
+        return self.files, np.asarray(self.rows, dtype=np.int32)
+
+
+def build_file_table(items: Iterable[Dict[str, Any]]):
+    """(파일 목록, 행 → 파일 번호 배열)"""
+    table = _FileTable()
+    for it in items:
+        table.add(it)
+    return table.arrays()
+
+
+def _stage_file_table(docs_path: str, files: List[Dict[str, Any]], rows: np.ndarray, staged: List[tuple]):
+    """파일 테이블을 임시 파일에 기록하고 (임시, 최종) 경로를 staged에 추가 (교체는 write_docstore가)"""
+    files_path, fidx_path = filetable_paths(docs_path)
+    files_tmp, fidx_tmp = tmp_path(files_path), tmp_path(fidx_path, ".npy")
+    staged += [(files_tmp, files_path), (fidx_tmp, fidx_path)]
+    with open(files_tmp, "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, ensure_ascii=False)
+    with open(fidx_tmp, "wb") as f:
+        np.save(f, rows)
+
+
+def _encode(item: Dict[str, Any]) -> bytes:
+    return json.dumps(item, ensure_ascii=False).encode("utf-8")
+
+
+def write_docstore(items: Iterable[Dict[str, Any]], docs_path: str) -> int:
+    """
+    items를 스트리밍으로 바이너리 스토어에 기록
+    - 네 파일(docs.bin / 파일 테이블 2개 / docs.idx.npy)을 모두 임시 파일로 쓴 뒤 교체, 오프셋 파일을 마지막에 교체
+    반환: 문서 수
+    """
+    bin_path, idx_path = docstore_paths(docs_path)
+    bin_tmp = tmp_path(bin_path)
+    staged = [(bin_tmp, bin_path)]
+    offsets: List[int] = [0]
+    table = _FileTable()
+    try:
+        with open(bin_tmp, "wb") as f:
+            for it in items:
+                f.write(_encode(it))
+                offsets.append(f.tell())
+                table.add(it)
+        _stage_file_table(docs_path, *table.arrays(), staged)
+        idx_tmp = tmp_path(idx_path, ".npy")
+        staged.append((idx_tmp, idx_path))
+        with open(idx_tmp, "wb") as f:
+            np.save(f, np.asarray(offsets, dtype=np.int64))
+        for tmp, final in staged:  # 오프셋 파일이 마지막
+            os.replace(tmp, final)
+    finally:
+        for tmp, _ in staged:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return len(offsets) - 1
+
+
+def _iter_jsonl(docs_path: str) -> Iterator[Dict[str, Any]]:
+    with open(docs_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def lock_path(docs_path: str) -> str:
+    """docs.jsonl 경로 → 마이그레이션 잠금 파일 (docs.lock)"""
+    return os.path.splitext(docs_path)[0] + ".lock"
+
+
+def migrate_jsonl(docs_path: str, force: bool = True) -> int:
+    """
+    docs.jsonl → docs.bin / docs.idx.npy (한 줄씩 처리, 전체를 메모리에 올리지 않음)
+    - force=False: 잠금을 기다리는 사이 다른 프로세스가 이미 변환했으면 건너뜀 (반환 -1)
+    """
+    with file_lock(lock_path(docs_path)):
+        if not force and is_fresh(docs_path):
+            return -1
+        return write_docstore(_iter_jsonl(docs_path), docs_path)
+
+
+def is_fresh(docs_path: str) -> bool:
+    """바이너리 스토어가 있고 docs.jsonl보다 오래되지 않았으면 True"""
+    bin_path, idx_path = docstore_paths(docs_path)
+    if not (os.path.exists(bin_path) and os.path.exists(idx_path)):
+        return False
+    if not os.path.exists(docs_path):
+        return True
+    return os.stat(idx_path).st_mtime_ns >= os.stat(docs_path).st_mtime_ns
+
+
+class DocStore:
+    """읽기 전용 지연 디코딩 문서 스토어 (list처럼 len / [i] / 반복 지원)"""
+
+    def __init__(self, docs_path: str):
+        self.docs_path = docs_path
+        bin_path, idx_path = docstore_paths(docs_path)
+        self.offsets = np.load(idx_path, mmap_mode="r")
+        self._file = open(bin_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @classmethod
+    def open(cls, docs_path: str, migrate: bool = False) -> "DocStore":
+        """
+        바이너리 스토어 열기
+        - 없거나 docs.jsonl보다 오래됐으면: migrate=True(빌드 쪽)면 먼저 마이그레이션, 아니면 FileNotFoundError
+        """
+        if not is_fresh(docs_path):
+            if not (migrate and os.path.exists(docs_path)):
+                raise FileNotFoundError(f"문서 스토어가 없습니다: {docstore_paths(docs_path)[0]}")
+            migrate_jsonl(docs_path, force=False)
+        return cls(docs_path)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._blob[a:b])
+
+    def file_table(self):
+        """
+        (파일 목록, 행 → 파일 번호 배열)
+        - 파일 테이블이 없거나 행 수가 맞지 않는 예전 스토어는 한 번 훑어서 메모리에서만 생성 (서빙 쪽은 파일을 쓰지 않음)
+        """
+        files_path, fidx_path = filetable_paths(self.docs_path)
+        if os.path.exists(files_path) and os.path.exists(fidx_path):
+            with open(files_path, "r", encoding="utf-8") as f:
+                files = json.load(f)["files"]
+            rows = np.load(fidx_path, mmap_mode="r")
+            if len(rows) == len(self):
+                return files, rows
+        return build_file_table(self)
+
+    def get_many(self, ids: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self[i] for i in ids]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="docs.jsonl → 바이너리 문서 스토어 변환")
+    ap.add_argument("--docs", nargs="+", required=True, help="docs.jsonl 경로들")
+    args = ap.parse_args()
+    for p in args.docs:
+        n = migrate_jsonl(p)
+        print(f"[DOCSTORE] {p} → {docstore_paths(p)[0]} ({n:,} docs)")
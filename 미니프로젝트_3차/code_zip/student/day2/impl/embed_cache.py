@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+임베딩 디스크 캐시 (content-addressed)
+- 키: (model, sha256(text)) → 모델별 디렉토리 + 텍스트 해시
+- 저장: <cache_dir>/<model>/
+    vectors.bin : (N, D) float32|float16 행 단위 append (np.memmap으로 읽기)
+    keys.bin    : 32바이트 sha256 digest × N (행 번호 = 순서)
+    meta.json   : {"model", "dim", "dtype"}
+- 벡터를 먼저 쓰고 키를 나중에 써서, 키가 있는 행은 항상 벡터가 존재
+- 여러 프로세스(동시 빌드, 서버)가 같은 디렉토리를 공유 가능
+    append는 <model>/.lock 배타 잠금 안에서만: 디스크의 파일 크기로 행 번호를 정하고, 다른 프로세스가 추가한 키도 먼저 읽음
+    끊긴 꼬리(키 없는 벡터, 반쪽 행) 정리도 잠금 안에서만 — 읽기만 하는 프로세스는 파일을 고치지 않음
+"""
+
+from __future__ import annotations
+import os, re, json, hashlib, threading
+from typing import Dict, List
+import numpy as np
+
+from student.common.file_lock import file_lock
+
+DIGEST_SIZE = 32
+
+
+def text_key(text: str) -> bytes:
+    """텍스트 sha256 digest (32바이트)"""
+    return hashlib.sha256((text or "").encode("utf-8")).digest()
+
+
+def _safe_name(model: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", model) or "model"
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: str, model: str, dtype: str = "float32"):
+        """
+        - cache_dir: 캐시 루트 (모델별 하위 디렉토리 생성)
+        - dtype: 새 캐시 생성 시 저장 dtype ("float32" | "float16"). 기존 캐시는 meta.json 값을 따름
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"지원하지 않는 캐시 dtype: {dtype}")
+        self.model = model
+        self.dir = os.path.join(cache_dir, _safe_name(model))
+        self.vec_path = os.path.join(self.dir, "vectors.bin")
+        self.key_path = os.path.join(self.dir, "keys.bin")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        self.dtype = dtype
+        self.dim: int | None = None
+        self._rows: Dict[bytes, int] = {}
+        self._mm: np.memmap | None = None
+        self._n = 0  # _rows에 반영한 디스크 행 수 (같은 키가 두 번 적힌 행이 있으면 len(_rows)보다 큼)
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---------- Load ----------
+    def _load(self):
+        """읽기 전용: 완전한 행(키와 벡터가 모두 있는 행)만 인덱싱, 파일은 건드리지 않음"""
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = int(meta["dim"])
+        self.dtype = meta.get("dtype", self.dtype)
+        self._sync()
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(self.dtype).itemsize
+
+    def _disk_rows(self) -> int:
+        """디스크에서 키와 벡터가 모두 온전한 행 수"""
+        n_vec = os.path.getsize(self.vec_path) // self._row_bytes() if os.path.exists(self.vec_path) else 0
+        n_key = os.path.getsize(self.key_path) // DIGEST_SIZE if os.path.exists(self.key_path) else 0
+        return min(n_vec, n_key)
+
+    def _sync(self) -> int:
+        """다른 프로세스가 추가한 행의 키를 읽어 _rows에 반영 (반환: 디스크의 온전한 행 수)"""
+        n = self._disk_rows()
+        start = self._n
+        if n > start:
+            with open(self.key_path, "rb") as f:
+                f.seek(start * DIGEST_SIZE)
+                raw = f.read((n - start) * DIGEST_SIZE)
+            for i in range(n - start):
+                self._rows.setdefault(raw[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], start + i)
+            self._n = n
+            self._mm = None
+        return n
+
+    def _repair_tail(self, n: int):
+        """끊긴 쓰기(키 없는 벡터, 반쪽 행) 잘라내기 — 반드시 file_lock 안에서 (다른 writer가 없을 때만 안전)"""
+        for path, size in ((self.vec_path, n * self._row_bytes()), (self.key_path, n * DIGEST_SIZE)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+    def _vectors(self) -> np.memmap | None:
+        if self._mm is None and self._rows:
+            self._mm = np.memmap(self.vec_path, dtype=self.dtype, mode="r", shape=(self._n, self.dim))
+        return self._mm
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ---------- Lookup ----------
+    def get(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """캐시에 있는 키만 {key: float32 벡터} 로 반환"""
+        with self._lock:
+            hits = {k: self._rows[k] for k in keys if k in self._rows}
+            if not hits:
+                return {}
+            mm = self._vectors()
+            rows = np.fromiter(hits.values(), dtype="int64", count=len(hits))
+            vecs = np.asarray(mm[rows], dtype="float32")
+        return dict(zip(hits.keys(), vecs))
+
+    # ---------- Append ----------
+    def put(self, keys: List[bytes], vecs: np.ndarray):
+        """새 키/벡터 append (이미 있는 키는 건너뜀)"""
+        vecs = np.asarray(vecs)
+        if len(keys) != len(vecs):
+            raise ValueError("keys와 vecs 길이가 다릅니다.")
+        if not keys:
+            return
+        with self._lock, file_lock(self.lock_path):
+            if self.dim is None:
+                if os.path.exists(self.meta_path):  # 그 사이 다른 프로세스가 만든 캐시
+                    self._load()
+                else:
+                    self.dim = int(vecs.shape[1])
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"model": self.model, "dim": self.dim, "dtype": self.dtype}, f)
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"캐시 차원과 다릅니다. (cache={self.dim}, vecs={vecs.shape[1]})")
+            base = self._sync()  # 행 번호는 메모리가 아니라 디스크 기준
+            self._repair_tail(base)
+            new_keys, new_rows, seen = [], [], set()
+            for i, k in enumerate(keys):
+                if k in self._rows or k in seen:
+                    continue
+                seen.add(k)
+                new_keys.append(k)
+                new_rows.append(i)
+            if not new_keys:
+                return
+            with open(self.vec_path, "ab") as f:
+                f.write(np.ascontiguousarray(vecs[new_rows], dtype=self.dtype).tobytes())
+            with open(self.key_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            for j, k in enumerate(new_keys):
+                self._rows[k] = base + j
+            self._n = base + len(new_keys)
+            self._mm = None  # 파일이 커졌으므로 다음 조회 때 다시 매핑
@@ -1,58 +1,238 @@
 # -*- coding: utf-8 -*-
 """
-OpenAI 임베딩 래퍼
+임베딩 래퍼
 - 요구사항: 배치 인코딩, 재시도(backoff), L2 정규화
+- 백엔드 레지스트리: 모델 이름 접두어로 백엔드 선택
+    "local-hash[-D]" → LocalHashBackend (오프라인, CPU)
+    그 외             → OpenAIBackend (text-embedding-3-small 등)
+- OpenAI: 배치 하나 = 리스트 입력 embeddings 요청 1회, 여러 요청을 동시에 전송
+  요청 묶음/재시도/속도 제한은 EmbedScheduler가 담당 (토큰 예산, RPM/TPM, retry-after, 적응형 동시성)
+- cache_dir 지정 시 (model, sha256(text)) 디스크 캐시를 먼저 조회, 없는 텍스트만 백엔드 호출
+- AsyncEmbeddings: 같은 설정/캐시를 쓰는 asyncio 버전 (AsyncOpenAI, 이벤트 루프를 막지 않음)
 """
 
-import os, time
-from typing import List
+import os, asyncio
+from typing import Callable, Dict, List
 import numpy as np
-from httpx import ReadTimeout  # 선택: 재시도 구분용
-from openai import OpenAI
+
+from .embed_cache import EmbeddingCache, text_key
+from .local_embed import LOCAL_PREFIX, LocalHashBackend
+from .scheduler import EmbedScheduler, DEFAULT_MAX_BATCH_TOKENS, estimate_tokens, pack_batches
+
+DEFAULT_MODEL = "text-embedding-3-small"
+DEFAULT_DIM = 1536
+# 네트워크 없이 차원을 알기 위한 OpenAI 모델 차원표
+KNOWN_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+MAX_WORKERS = 4
+
+
+def _env_float(name: str) -> float | None:
+    val = os.getenv(name, "").strip()
+    return float(val) if val else None
+
+
+def l2_normalize(mat: np.ndarray) -> np.ndarray:
+    """(N, D) 행 단위 L2 정규화 (한 번에 벡터화)"""
+    mat = np.asarray(mat, dtype="float32")
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / (norms + 1e-12)
+
+
+class OpenAIBackend:
+    """OpenAI embeddings API 백엔드"""
+
+    cacheable = True
+
+    def __init__(self, model: str, batch_size: int = 128, max_retries: int = 4, max_workers: int = MAX_WORKERS,
+                 max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, rpm: float | None = None, tpm: float | None = None):
+        from openai import OpenAI  # 로컬 백엔드만 쓸 때는 openai 불필요
+
+        self.model = model
+        self.dim: int | None = KNOWN_DIMS.get(model)  # 모르는 모델이면 첫 호출 후 확정
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.scheduler = EmbedScheduler(
+            max_workers=max_workers,
+            rpm=rpm if rpm is not None else _env_float("OPENAI_EMBED_RPM"),
+            tpm=tpm if tpm is not None else _env_float("OPENAI_EMBED_TPM"),
+            max_retries=max_retries,
+        )
+        # 재시도는 스케줄러가 하므로 SDK 재시도는 끔
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self._aclient = None  # AsyncOpenAI, aembed 첫 호출 때 생성
+
+    @property
+    def stats(self):
+        return self.scheduler.stats
+
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        """
+        리스트 입력 임베딩 1회 호출 → (len(batch), D) float32 (정규화 전)
+        - 응답은 index 기준으로 정렬해 입력 순서를 보장
+        - 빈 문자열은 API가 거부하므로 공백 1자로 대체
+        """
+        inputs = [t if t else " " for t in batch]
+        resp = self.client.embeddings.create(model=self.model, input=inputs)
+        self._record_usage(resp)
+        data = sorted(resp.data, key=lambda d: d.index)
+        return np.array([d.embedding for d in data], dtype="float32")
+
+    async def _aembed_batch(self, batch: List[str]) -> np.ndarray:
+        """_embed_batch의 AsyncOpenAI 버전"""
+        if self._aclient is None:
+            from openai import AsyncOpenAI
+            self._aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        inputs = [t if t else " " for t in batch]
+        resp = await self._aclient.embeddings.create(model=self.model, input=inputs)
+        self._record_usage(resp)
+        data = sorted(resp.data, key=lambda d: d.index)
+        return np.array([d.embedding for d in data], dtype="float32")
+
+    def _record_usage(self, resp):
+        """응답의 실제 토큰 사용량 → 처리량 통계 (usage가 없으면 추정치 유지)"""
+        used = getattr(getattr(resp, "usage", None), "total_tokens", None)
+        if used:
+            self.scheduler.stats.add_usage(int(used))
+
+    def _plan(self, texts: List[str]):
+        costs = [estimate_tokens(t, self.model) for t in texts]
+        spans = pack_batches(costs, self.batch_size, self.max_batch_tokens)
+        return spans, [sum(costs[a:b]) for a, b in spans], [b - a for a, b in spans]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        추정 토큰 수 기준으로 요청을 묶고, 스케줄러가 속도 제한/재시도/동시성을 관리
+        - 결과는 입력 순서대로 결합
+        """
+        spans, costs, sizes = self._plan(texts)
+        jobs = [(lambda a=a, b=b: self._embed_batch(texts[a:b])) for a, b in spans]
+        out = np.vstack(self.scheduler.run(jobs, costs, sizes))
+        self.dim = out.shape[1]
+        return out
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """embed의 asyncio 버전"""
+        spans, costs, sizes = self._plan(texts)
+        jobs = [(lambda a=a, b=b: self._aembed_batch(texts[a:b])) for a, b in spans]
+        out = np.vstack(await self.scheduler.arun(jobs, costs, sizes))
+        self.dim = out.shape[1]
+        return out
+
+
+# ---------- 백엔드 레지스트리 ----------
+BACKENDS: Dict[str, Callable[..., object]] = {}
+
+
+def register_backend(prefix: str, factory: Callable[..., object]):
+    """
+    모델 이름이 prefix로 시작하면 factory(model=..., **options)로 백엔드 생성
+    - 백엔드는 embed(texts) -> (N, D) ndarray, dim, stats, cacheable 속성을 제공
+      stats 토큰 수: API 응답 usage가 있으면 stats.add_usage로 기록, 없는 백엔드는 싼 추정치로 stats.add
+    - (선택) async aembed(texts): 없으면 AsyncEmbeddings가 embed를 그대로 호출 (CPU 백엔드용)
+    """
+    BACKENDS[prefix] = factory
+
+
+def get_backend(model: str, **options):
+    for prefix in sorted(BACKENDS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return BACKENDS[prefix](model=model, **options)
+    return OpenAIBackend(model=model, **options)
+
+
+register_backend(LOCAL_PREFIX, LocalHashBackend)
 
 
 class Embeddings:
-    def __init__(self, model: str | None = None, batch_size: int = 128, max_retries: int = 4):
+    def __init__(self, model: str | None = None, batch_size: int = 128, max_retries: int = 4,
+                 max_workers: int = MAX_WORKERS, cache_dir: str | None = None, cache_dtype: str = "float32",
+                 max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, rpm: float | None = None, tpm: float | None = None):
         """
-        - self.model 기본값: "text-embedding-3-small" 권장
-        - self.batch_size, self.max_retries 저장
-        - OpenAI 클라이언트 생성 (키는 환경변수 OPENAI_API_KEY)
+        - self.model 기본값: "text-embedding-3-small" 권장, "local-hash" 는 오프라인 로컬 임베딩
+        - self.batch_size: 요청 1회당 최대 텍스트 수, max_batch_tokens: 요청 1회당 추정 토큰 예산
+        - self.max_retries 저장
+        - self.max_workers: 동시에 전송할 요청 수 상한
+        - rpm / tpm: 분당 요청/토큰 한도 (없으면 환경변수 OPENAI_EMBED_RPM / OPENAI_EMBED_TPM)
+        - cache_dir: 임베딩 디스크 캐시 위치 (없으면 환경변수 DAY2_EMBED_CACHE_DIR, 그것도 없으면 캐시 미사용)
+        - 백엔드는 모델 이름으로 레지스트리에서 선택
         """
-        self.model = model or "text-embedding-3-small"
+        self.model = model or DEFAULT_MODEL
         self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
         self.max_retries = max_retries
-        key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=key)
-        
+        self.max_workers = max(1, max_workers)
+        self.backend = get_backend(self.model, batch_size=batch_size, max_retries=max_retries,
+                                   max_workers=self.max_workers, max_batch_tokens=max_batch_tokens, rpm=rpm, tpm=tpm)
+        cache_dir = cache_dir or os.getenv("DAY2_EMBED_CACHE_DIR")
+        use_cache = bool(cache_dir) and getattr(self.backend, "cacheable", True)
+        self.cache = EmbeddingCache(cache_dir, self.model, cache_dtype) if use_cache else None
 
-    def _embed_once(self, text: str) -> np.ndarray:
-        """
-        단일 텍스트 임베딩 호출 → np.ndarray(float32) + L2 정규화
-        - 예외 발생 시 상위 encode에서 재시도하도록 예외를 그대로 올려보냄
-        """
-        
-        resp = self.client.embeddings.create(model=self.model, input=text)
-        vec = np.array(resp.data[0].embedding, dtype="float32")
-        norm = np.linalg.norm(vec) + 1e-12
-        vec = vec / norm
-        return vec
-        
+    @property
+    def stats(self):
+        """백엔드 호출 처리량 통계 (ThroughputStats)"""
+        return self.backend.stats
+
+    @property
+    def dim(self) -> int | None:
+        """임베딩 차원 (네트워크 없이 알 수 있을 때만, 모르면 None)"""
+        return getattr(self.backend, "dim", None) or (self.cache.dim if self.cache else None)
+
+    def _encode_api(self, texts: List[str]) -> np.ndarray:
+        """캐시 없이 백엔드로 인코딩 + L2 정규화"""
+        return l2_normalize(self.backend.embed(texts))
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros((0, self.dim or DEFAULT_DIM), dtype="float32")
+
+    def _cache_lookup(self, texts: List[str]):
+        """(keys, 캐시 적중 {key: vec}, 미적중 {key: text}) — 미적중은 중복 제거"""
+        keys = [text_key(t) for t in texts]
+        found = self.cache.get(keys)
+        todo: dict[bytes, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in todo:
+                todo[k] = t
+        return keys, found, todo
+
+    def _cache_fill(self, keys, found, todo, new: np.ndarray) -> np.ndarray:
+        if todo:
+            self.cache.put(list(todo.keys()), new)
+            found.update(zip(todo.keys(), new))
+        return l2_normalize(np.vstack([found[k] for k in keys]))
 
     def encode(self, texts: List[str]) -> np.ndarray:
         """
         배치 인코딩 + 재시도(backoff). 최종 shape = (N, D)
         - 비어 있으면 (0, D) 반환. D는 1536 등 모델 차원 (미정이면 1536 가정 가능)
+        - 캐시가 있으면 캐시 적중분은 재사용하고, 미적중 텍스트(중복 제거)만 백엔드 호출 후 캐시에 기록
         """
-        if not texts: return np.zeros((0, 1536), dtype="float32")
-        out: list[np.ndarray] = []
-        for start in range(0, len(texts), self.batch_size):
-            batch = texts[start:start+self.batch_size]
-            for each in batch:
-                  for attempt in range(self.max_retries):
-                    try:
-                        out.append(self._embed_once(each)); break
-                    except Exception as e:
-                       time.sleep(0.5 * (2 ** attempt))
-                       if attempt == self.max_retries - 1: raise
-        return np.vstack(out)
-        
+        if not texts:
+            return self._empty()
+        if self.cache is None:
+            return self._encode_api(texts)
+        keys, found, todo = self._cache_lookup(texts)
+        new = self._encode_api(list(todo.values())) if todo else None
+        return self._cache_fill(keys, found, todo, new)
+
+
+class AsyncEmbeddings(Embeddings):
+    """
+    Embeddings의 asyncio 버전 (생성 인자/캐시 동일)
+    - encode는 코루틴: OpenAI 백엔드는 AsyncOpenAI로 호출해 이벤트 루프를 막지 않음
+    - aembed가 없는 백엔드(local-hash 등 CPU 백엔드)는 그대로 동기 호출 (1ms 미만)
+    - 디스크 캐시 조회/기록(파일 잠금 + 파일 IO)은 asyncio.to_thread로 → 느린 writer가 다른 요청을 막지 않음
+    """
+
+    async def _aencode_api(self, texts: List[str]) -> np.ndarray:
+        aembed = getattr(self.backend, "aembed", None)
+        raw = await aembed(texts) if aembed is not None else self.backend.embed(texts)
+        return l2_normalize(raw)
+
+    async def encode(self, texts: List[str]) -> np.ndarray:  # type: ignore[override]
+        if not texts:
+            return self._empty()
+        if self.cache is None:
+            return await self._aencode_api(texts)
+        keys, found, todo = await asyncio.to_thread(self._cache_lookup, texts)
+        new = await self._aencode_api(list(todo.values())) if todo else None
+        return await asyncio.to_thread(self._cache_fill, keys, found, todo, new)
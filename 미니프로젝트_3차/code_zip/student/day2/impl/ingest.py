@@ -1,12 +1,46 @@
 # -*- coding: utf-8 -*-
 """
 인덱싱 입력 데이터 로딩/정제/청크
+- 형식별 로더 레지스트리(LOADERS): 확장자 → 텍스트 조각을 내는 추출 함수 (pdf, hwpx, csv, md, txt, html)
+    data/raw를 중간 파일(data/processed) 없이 한 번에 읽음, 새 형식은 register_loader()로 추가 (build_corpus 수정 불필요)
+- 파싱은 ProcessPoolExecutor로 병렬 실행 (PARSE_WORKERS, 환경변수 DAY2_PARSE_WORKERS, 1이면 직렬)
+    큰 PDF(PDF_SPLIT_BYTES 이상)는 PDF_PAGES_PER_PART 페이지 단위로 나눠 여러 워커가 처리
+    결과는 항상 파일 목록 순서대로 (페이지 조각도 순서대로 합침) → 청크 id/인덱스 순서가 실행마다 동일
+    파일별 파싱 시간은 문서의 parse_sec에 기록, 끝나면 가장 느린 파일들을 [PARSE]로 출력
+- PDF/HWPX 추출 텍스트는 내용 해시 키 캐시(student/common/text_cache.py)에 gzip으로 저장 → 바뀌지 않은 파일은 재파싱 없음
+    추출/정제 코드를 바꾸면 PDF_TEXT_VERSION / HWPX_TEXT_VERSION을 올릴 것 (pypdf 버전도 키에 포함)
+- 청커: chars(기본, 글자 슬라이딩 윈도우) / tokens(문장·문단 단위로 토큰 예산까지 채움, chunker.py)
+    설정은 chunker_config()로 만들어 매니페스트에 기록, ChunkStats로 임베딩 토큰 수와 chars 대비 절감량 집계
+- 근사 중복 청크 제거(선택): iter_corpus(dedup=NearDuplicates(...)) → 대표 청크만 남기고 나머지 id는 meta["aliases"] (dedup.py)
 """
 
-import re, json
-from typing import List, Dict, Any
+import os, re, csv, json, time, zipfile, multiprocessing, importlib.metadata
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Iterator, Tuple, Callable
 from pathlib import Path
 
+from student.common.text_cache import TEXT_CACHE_DIR, TextCache, content_key
+from student.day2.impl.chunker import (chunk_tokens, token_counter, tokenizer_name,
+                                       CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, MODEL_MAX_TOKENS)
+from student.day2.impl.dedup import NearDuplicates
+from student.day2.impl.local_embed import LOCAL_PREFIX
+
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+PARSE_WORKERS = int(os.getenv("DAY2_PARSE_WORKERS", "") or min(4, os.cpu_count() or 1))
+PDF_SPLIT_BYTES = 1 << 20   # 이 크기 이상인 PDF만 페이지 수를 보고 나눔
+PDF_PAGES_PER_PART = 16
+PARSE_AHEAD = 4             # 워커당 미리 제출해 둘 작업 수 (결과 대기 메모리 상한)
+PARSE_REPORT_TOP = 5
+PDF_TEXT_VERSION = "1"      # read_pdf_file / clean_text 결과가 바뀌면 올림 → 추출 텍스트 캐시 무효
+HWPX_TEXT_VERSION = "2"     # iter_hwpx_text / clean_text 결과가 바뀌면 올림 (2: 정제 후 텍스트 저장)
+CSV_ENCODINGS = ("utf-8-sig", "cp949", "euc-kr")
+# 에이전트 산출물 파일명: YYYYMMDD_HHMMSS__dayN__질의.md
+REPORT_NAME = re.compile(r"^(\d{4})(\d{2})(\d{2})_\d{6}__(day\d+)__")
+
 def read_text_file(path: str) -> str:
     """
     안전한 텍스트 로드(utf-8, errors='ignore')
@@ -15,19 +49,116 @@ def read_text_file(path: str) -> str:
         return f.read()
 
 
-def read_pdf_file(path: str) -> str:
+def read_pdf_file(path: str, start: int = 0, end: int | None = None) -> str:
     """
-    pypdf 로 PDF 모든 페이지 텍스트 추출
+    pypdf 로 PDF 페이지 텍스트 추출 (start~end 페이지 범위, 기본은 전체)
     """
+    return "\n".join(iter_pdf_pages(path, start, end))
+
+
+def pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader  # type: ignore
+    return len(PdfReader(path).pages)
+
+
+def iter_pdf_pages(path: str, start: int = 0, end: int | None = None) -> Iterator[str]:
+    """페이지마다 추출 텍스트 하나씩 (추출에 실패한 페이지는 빈 문자열)"""
     from pypdf import PdfReader  # type: ignore
-    reader = PdfReader(path)
-    texts: List[str] = []
-    for page in reader.pages:
+    for page in PdfReader(path).pages[start:end]:
         try:
-            texts.append(page.extract_text() or "")
+            yield page.extract_text() or ""
         except Exception:
-            texts.append("")
-    return "\n".join(texts)
+            yield ""
+
+
+def iter_text_file(path: str) -> Iterator[str]:
+    yield read_text_file(path)
+
+
+def iter_hwpx_text(path: str) -> Iterator[str]:
+    """
+    HWPX(zip + XML) 본문 섹션별 텍스트
+    - Contents/section*.xml 등 이름에 section이 들어간 XML (없으면 모든 XML), 태그만 제거하는 가벼운 추출
+    """
+    with zipfile.ZipFile(path, "r") as zf:
+        names = [n for n in zf.namelist() if n.lower().endswith(".xml")]
+        for name in [n for n in names if "section" in n.lower()] or names:
+            try:
+                data = zf.read(name).decode("utf-8", errors="ignore")
+            except Exception:
+                continue
+            s = re.sub(r"[ \t]+", " ", re.sub(r"<[^>]+>", "", data)).strip()
+            if s:
+                yield s
+
+
+def csv_encoding(path: str) -> str:
+    """CSV_ENCODINGS 중 파일 전체를 오류 없이 읽는 첫 인코딩 (한 줄씩 읽어 메모리 사용 일정)"""
+    for enc in CSV_ENCODINGS:
+        try:
+            with open(path, "r", encoding=enc, newline="") as f:
+                for _ in f:
+                    pass
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "utf-8"  # 판별 실패 → 아래에서 errors="ignore"로 읽음
+
+
+def iter_csv_rows(path: str) -> Iterator[str]:
+    """CSV → 행마다 "열: 값; 열: 값" 한 줄 (빈 값 생략, 첫 행은 열 이름)"""
+    enc = csv_encoding(path)
+    with open(path, "r", encoding=enc, errors="ignore", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        if header:
+            yield f"[CSV] {Path(path).name} 열: {', '.join(header)}"
+        for row in reader:
+            cells = [f"{h}: {v.strip()}" for h, v in zip(header, row) if v.strip()]
+            if cells:
+                yield "; ".join(cells)
+
+
+class _HTMLText(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template", "svg"}
+    BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article",
+             "header", "footer", "table", "title", "pre", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip = 0
+        self.out: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skip += 1
+        elif tag in self.BLOCK:
+            self.out.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self.skip = max(0, self.skip - 1)
+        elif tag in self.BLOCK:
+            self.out.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.out.append(data)
+
+    def pop(self) -> str:
+        s, self.out = "".join(self.out), []
+        return s
+
+
+def iter_html_text(path: str, bufsize: int = 1 << 16) -> Iterator[str]:
+    """HTML → 본문 텍스트 (script/style 제외, 블록 태그는 줄바꿈), bufsize씩 읽어 파서에 흘려 넣음"""
+    parser = _HTMLText()
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for block in iter(lambda: f.read(bufsize), ""):
+            parser.feed(block)
+            yield parser.pop()
+    parser.close()
+    yield parser.pop()
 
 
 def clean_text(s: str) -> str:
@@ -42,7 +173,7 @@ def clean_text(s: str) -> str:
     return s.strip()
 
 
-def chunk_text(text: str, chunk_size: int = 1200, chunk_overlap: int = 200) -> List[str]:
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
     """
     슬라이딩 윈도우로 청크 분할.
     - 길이가 chunk_size 이하이면 그대로 1청크
@@ -60,46 +191,325 @@ def chunk_text(text: str, chunk_size: int = 1200, chunk_overlap: int = 200) -> L
     return chunks
 
 
-def load_documents(paths_or_dir: List[str]) -> List[Dict[str, Any]]:
+def pdf_text_version() -> str:
+    """PDF 추출 텍스트 캐시 버전: 추출/정제 코드 버전 + pypdf 버전 (둘 중 하나라도 바뀌면 캐시 무효)"""
+    try:
+        lib = importlib.metadata.version("pypdf")
+    except importlib.metadata.PackageNotFoundError:
+        lib = "none"
+    return f"{PDF_TEXT_VERSION}-pypdf{lib}"
+
+
+def pdf_parts(path: str) -> List[Tuple[int, int | None]]:
+    """큰 PDF(PDF_SPLIT_BYTES 이상) → PDF_PAGES_PER_PART 페이지 범위 목록"""
+    if os.path.getsize(path) < PDF_SPLIT_BYTES:
+        return [(0, None)]
+    try:
+        n = pdf_page_count(path)
+    except Exception:
+        return [(0, None)]  # 페이지 수를 못 읽으면 통째로 (오류는 워커에서 그대로 발생)
+    return [(a, min(a + PDF_PAGES_PER_PART, n)) for a in range(0, n, PDF_PAGES_PER_PART)] or [(0, None)]
+
+
+# ---------- 로더 레지스트리 ----------
+@dataclass(frozen=True)
+class Loader:
+    """
+    형식 하나의 텍스트 추출기
+    - extract(path) → 텍스트 조각 이터레이터 (파일 전체를 한 번에 만들지 않아도 됨), 조각은 sep로 이어 붙임
+      parts가 있으면 extract(path, start, end)로 범위별 호출 (큰 PDF의 페이지 범위)
+    - pool=True: 프로세스 풀에서 실행 (CPU를 많이 쓰는 바이너리 형식) → extract/parts는 모듈 최상위 함수여야 함
+    - cache: 추출 텍스트 캐시 버전 (None이면 캐시 안 함 — 다시 읽는 편이 더 싼 텍스트 형식)
+    """
+    extract: Callable[..., Iterator[str]]
+    sep: str = "\n"
+    pool: bool = False
+    cache: str | None = None
+    parts: Callable[[str], List[Tuple[int, int | None]]] | None = None
+
+
+LOADERS: Dict[str, Loader] = {}
+
+
+def register_loader(ext: str, extract: Callable[..., Iterator[str]], **options: Any) -> Loader:
+    """확장자(점 없이, 소문자 비교)에 로더 등록 — 같은 확장자면 교체. options: Loader의 sep/pool/cache/parts"""
+    loader = Loader(extract, **options)
+    LOADERS[ext.lower().lstrip(".")] = loader
+    return loader
+
+
+def _ext(path: str) -> str:
+    return path.lower().rsplit(".", 1)[-1]
+
+
+def loader_for(path: str) -> Loader | None:
+    return LOADERS.get(_ext(path))
+
+
+# 등록 순서 = 디렉토리 수집 순서 (txt, md, pdf 먼저: 기존 인덱스와 같은 행 순서)
+register_loader("txt", iter_text_file)
+register_loader("md", iter_text_file)
+register_loader("pdf", iter_pdf_pages, pool=True, cache=pdf_text_version(), parts=pdf_parts)
+register_loader("hwpx", iter_hwpx_text, sep="\n\n", pool=True, cache=HWPX_TEXT_VERSION)
+register_loader("csv", iter_csv_rows)
+register_loader("html", iter_html_text, sep="")
+register_loader("htm", iter_html_text, sep="")
+
+
+def list_files(paths_or_dir: List[str]) -> List[str]:
     """
-    입력 경로(디렉토리/파일)에서 txt/md/pdf 수집 → [{"path":..., "text":...}, ...]
+    입력 경로(디렉토리/파일) → 대상 파일 경로 목록 (디렉토리는 LOADERS에 등록된 확장자만 재귀 수집)
     """
     files: List[str] = []
     for p in paths_or_dir:
         pp = Path(p)
         if pp.is_dir():
-            for ext in ("*.txt", "*.md", "*.pdf"):
-                files.extend([str(x) for x in pp.rglob(ext)])
+            for ext in LOADERS:
+                files.extend([str(x) for x in pp.rglob(f"*.{ext}")])
         else:
             files.append(str(pp))
+    return list(dict.fromkeys(files))  # 겹치는 입력(디렉토리 + 그 안의 파일) → 한 번만 (청크 id 중복 방지)
+
+
+def _parse_part(loader: Loader, path: str, start: int = 0, end: int | None = None) -> Tuple[str, float]:
+    """워커 작업 하나: (원문, 걸린 초) — 보통은 파일 전체, parts가 있는 로더는 start~end 범위"""
+    t0 = time.perf_counter()
+    pieces = loader.extract(path, start, end) if loader.parts else loader.extract(path)
+    return loader.sep.join(pieces), time.perf_counter() - t0
+
+
+def _parts(loader: Loader, path: str) -> List[Tuple[int, int | None]]:
+    """파일 → 범위 목록 (큰 PDF만 여러 조각)"""
+    return loader.parts(path) if loader.parts else [(0, None)]
+
+
+def _done(result) -> Future:
+    f: Future = Future()
+    f.set_result(result)
+    return f
 
-    docs: List[Dict[str, Any]] = []
-    for fp in files:
-        ext = fp.lower().split(".")[-1]
-        if ext in ("txt", "md"):
-            raw = read_text_file(fp)
-        elif ext == "pdf":
-            raw = read_pdf_file(fp)
-        else:
-            continue
-        txt = clean_text(raw)
-        docs.append({"path": fp, "text": txt})
-    return docs
 
+def load_text(path: str) -> str:
+    """파일 하나 → 정제된 텍스트 (등록된 로더 + 추출 텍스트 캐시, 다른 스크립트에서 재사용용)"""
+    loader = loader_for(path)
+    if loader is None:
+        raise ValueError(f"등록된 로더가 없는 형식입니다: {path} (가능: {', '.join(LOADERS)})")
+    if loader.cache is None or not TEXT_CACHE_DIR:
+        return clean_text(_parse_part(loader, path)[0])
+    return TextCache(_ext(path), loader.cache).extract(path, lambda fp: clean_text(_parse_part(loader, fp)[0]))
 
-def build_corpus(paths_or_dir: List[str]) -> List[Dict[str, Any]]:
+
+def iter_documents(paths_or_dir: List[str], workers: int | None = None) -> Iterator[Dict[str, Any]]:
+    """
+    입력 경로(디렉토리/파일)에서 등록된 형식(LOADERS)을 읽어 {"path", "text", "parse_sec", "parts"}를 파일 목록 순서대로 생성
+    - workers: 프로세스 수 (None이면 PARSE_WORKERS, 1 이하면 현재 프로세스에서 직렬)
+    - 미리 제출하는 작업은 workers * PARSE_AHEAD개까지 → 메모리에 대기하는 원문 수 제한
+    - cache가 있는 로더(PDF/HWPX)는 추출 텍스트 캐시(student/common/text_cache.py)를 먼저 조회
+      → 적중하면 파싱 없이 사용(parts=0)
+    """
+    files = [fp for fp in list_files(paths_or_dir) if loader_for(fp) is not None]
+    caches: Dict[str, TextCache] = {}
+    cached: Dict[str, Tuple[str, str | None, TextCache]] = {}  # 파일 → (캐시 키, 캐시된 텍스트, 캐시)
+
+    def lookup(fp: str) -> str | None:
+        loader = loader_for(fp)
+        if not TEXT_CACHE_DIR or loader.cache is None:
+            return None
+        cache = caches.get(_ext(fp))
+        if cache is None:
+            cache = caches[_ext(fp)] = TextCache(_ext(fp), loader.cache)
+        key = content_key(fp)
+        text = cache.get(key)
+        cached[fp] = (key, text, cache)
+        return text
+
+    workers = PARSE_WORKERS if workers is None else workers
+    timings: List[Tuple[float, str, int]] = []
+    t0 = time.perf_counter()
+
+    def doc(fp: str, parts: List[Tuple[str, float]]) -> Dict[str, Any]:
+        sec = sum(t for _, t in parts)
+        timings.append((sec, fp, len(parts)))
+        key, text, cache = cached.pop(fp, (None, None, None))
+        if text is None:
+            text = clean_text("\n".join(raw for raw, _ in parts))
+            if key is not None:
+                cache.put(key, text)
+        return {"path": fp, "text": text, "parse_sec": round(sec, 4), "parts": len(parts)}
+
+    if workers <= 1:
+        for fp in files:
+            yield doc(fp, [] if lookup(fp) is not None else [_parse_part(loader_for(fp), fp)])
+    else:
+        # 프로세스 풀은 pool 로더(PDF/HWPX) 파일이 처음 나올 때 생성 (텍스트 형식은 현재 프로세스에서 읽는 편이 빠름)
+        # spawn: 임베딩 스레드가 도는 중에 fork하면 잠긴 락을 물려받을 수 있음 (Windows 기본값과도 동일)
+        pool: List[ProcessPoolExecutor] = []
+
+        def submit(fp: str) -> list:
+            loader = loader_for(fp)
+            if lookup(fp) is not None:
+                return []
+            if not loader.pool:
+                return [_done(_parse_part(loader, fp))]
+            if not pool:
+                pool.append(ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")))
+            return [pool[0].submit(_parse_part, loader, fp, a, b) for a, b in _parts(loader, fp)]
+
+        try:
+            pending: deque = deque()  # (파일, [future...]) — 제출 순서 = 파일 순서, 캐시 적중이면 빈 리스트
+            todo = iter(files)
+            limit = workers * PARSE_AHEAD
+
+            def fill():
+                while sum(len(fs) for _, fs in pending) < limit:
+                    fp = next(todo, None)
+                    if fp is None:
+                        return
+                    pending.append((fp, submit(fp)))
+
+            fill()
+            while pending:
+                fp, futures = pending.popleft()
+                parts = [f.result() for f in futures]
+                fill()
+                yield doc(fp, parts)
+        finally:
+            for ex in pool:
+                ex.shutdown(wait=True, cancel_futures=True)
+
+    if timings:
+        total = sum(t for t, _, _ in timings)
+        hits = ""
+        n_hits, n_lookups = sum(c.hits for c in caches.values()), sum(c.hits + c.misses for c in caches.values())
+        if n_lookups:
+            hits = f" text_cache={n_hits}/{n_lookups}"
+        print(f"[PARSE] files={len(timings):,} workers={max(1, workers)} wall={time.perf_counter() - t0:.2f}s "
+              f"sum={total:.2f}s{hits}")
+        for sec, fp, n in sorted(timings, reverse=True)[:PARSE_REPORT_TOP]:
+            print(f"[PARSE]   {sec:7.2f}s  {fp}" + (f" (pages split into {n} parts)" if n > 1 else ""))
+
+
+def load_documents(paths_or_dir: List[str]) -> List[Dict[str, Any]]:
+    """
+    입력 경로(디렉토리/파일)에서 등록된 형식(LOADERS) 수집 → [{"path":..., "text":...}, ...]
+    """
+    return list(iter_documents(paths_or_dir))
+
+
+def file_meta(path: str) -> Dict[str, Any]:
+    """
+    검색 필터용 파일 단위 메타
+    - ext: 확장자(소문자, 점 제외)
+    - source: 에이전트 산출물이면 "day1"/"day2"/..., 그 외는 상위 폴더 이름 (예: "processed")
+    - date: 수집일 YYYY-MM-DD (산출물은 파일명 시각, 그 외는 파일 수정일)
+    """
+    p = Path(path)
+    ext = p.suffix.lower().lstrip(".")
+    m = REPORT_NAME.match(p.name)
+    if m:
+        return {"ext": ext, "source": m.group(4), "date": f"{m.group(1)}-{m.group(2)}-{m.group(3)}"}
+    try:
+        date = time.strftime("%Y-%m-%d", time.localtime(os.path.getmtime(path)))
+    except OSError:
+        date = ""
+    return {"ext": ext, "source": p.parent.name, "date": date}
+
+
+def chunker_config(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP, kind: str = "chars",
+                   max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                   model: str | None = None) -> Dict[str, Any]:
+    """
+    인덱스 매니페스트에 기록할 청커 파라미터
+    - kind="chars": chunk_size/chunk_overlap 글자 슬라이딩 윈도우 (기존 방식)
+    - kind="tokens": 문장/문단 단위로 max_tokens까지, 겹침 overlap_tokens (model의 토크나이저로 계산)
+    """
+    if kind == "chars":
+        return {"type": "chars", "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+    if kind != "tokens":
+        raise ValueError(f"알 수 없는 청커: {kind} (chars|tokens)")
+    if not 0 < max_tokens <= MODEL_MAX_TOKENS:
+        raise ValueError(f"max_tokens는 1~{MODEL_MAX_TOKENS} (임베딩 모델 입력 한도) 이어야 합니다: {max_tokens}")
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError(f"overlap_tokens는 0 이상 max_tokens 미만이어야 합니다: {overlap_tokens}")
+    tokenizer = tokenizer_name(model)
+    if tokenizer == "estimate" and not (model or "").startswith(LOCAL_PREFIX):
+        print(f"[WARN] tiktoken이 설치되지 않아 {model or '임베딩 모델'} 토크나이저 대신 글자 기반 추정으로 청크를 나눕니다 "
+              f"(실제 토큰 수가 max_tokens를 넘을 수 있음) → pip install tiktoken 후 다시 빌드하세요")
+    return {"type": "tokens", "max_tokens": max_tokens, "overlap_tokens": overlap_tokens, "tokenizer": tokenizer}
+
+
+def make_chunker(config: Dict[str, Any] | None = None) -> Callable[[str], List[str]]:
+    """청커 설정 → text를 청크 목록으로 나누는 함수"""
+    config = config or chunker_config()
+    if config["type"] == "tokens":
+        return lambda text: chunk_tokens(clean_text(text), config["max_tokens"], config["overlap_tokens"],
+                                         config["tokenizer"])
+    return lambda text: chunk_text(text, config["chunk_size"], config["chunk_overlap"])
+
+
+class ChunkStats:
+    """
+    빌드 리포트용 청크/토큰 집계 (iter_corpus(stats=...)가 채움)
+    - tokens: 임베딩에 들어가는 토큰 수 (겹침 포함)
+    - baseline: 비교할 청커 설정 → 같은 문서를 그 설정으로 나눴을 때의 청크/토큰 수도 집계
+    """
+
+    def __init__(self, tokenizer: str = "estimate", baseline: Dict[str, Any] | None = None):
+        self.count = token_counter(tokenizer)
+        self.baseline = baseline
+        self._split_baseline = make_chunker(baseline) if baseline else None
+        self.docs = self.chunks = self.tokens = 0
+        self.baseline_chunks = self.baseline_tokens = 0
+
+    def add(self, text: str, chunks: List[str]):
+        self.docs += 1
+        self.chunks += len(chunks)
+        self.tokens += sum(self.count(ch) for ch in chunks)
+        if self._split_baseline is not None:
+            base = self._split_baseline(text)
+            self.baseline_chunks += len(base)
+            self.baseline_tokens += sum(self.count(ch) for ch in base)
+
+    def __str__(self) -> str:
+        s = f"docs={self.docs:,} chunks={self.chunks:,} tokens={self.tokens:,}"
+        if self.baseline:
+            saved = 1 - self.tokens / self.baseline_tokens if self.baseline_tokens else 0.0
+            s += (f" (vs chars {self.baseline['chunk_size']}/{self.baseline['chunk_overlap']}: "
+                  f"chunks={self.baseline_chunks:,} tokens={self.baseline_tokens:,} → {saved:.1%} 절감)")
+        return s
+
+
+def iter_corpus(paths_or_dir: List[str], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                chunker: Dict[str, Any] | None = None, stats: ChunkStats | None = None,
+                dedup: NearDuplicates | None = None) -> Iterator[Dict[str, Any]]:
+    """
+    문서를 하나씩 읽어 청크 단위로 생성 (build_corpus의 스트리밍 버전, pipeline.py가 사용)
+    - chunker: chunker_config() 결과 (None이면 chunk_size/chunk_overlap 글자 청커)
+    - dedup: 앞서 나온 청크와 근사 중복인 청크는 건너뜀 (대표 청크 meta["aliases"]에 id 추가, stats도 남은 청크만)
+    """
+    split = make_chunker(chunker or chunker_config(chunk_size, chunk_overlap))
+    for d in iter_documents(paths_or_dir):
+        fmeta = file_meta(d["path"])
+        items = [{"id": f"{d['path']}::chunk_{i:04d}", "text": ch, "meta": {"path": d["path"], "chunk": i, **fmeta}}
+                 for i, ch in enumerate(split(d["text"]))]
+        if dedup is not None:
+            items = [it for it in items if not dedup.check(it)]
+        if stats is not None:
+            stats.add(d["text"], [it["text"] for it in items])
+        yield from items
+
+
+def build_corpus(paths_or_dir: List[str], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 chunker: Dict[str, Any] | None = None, stats: ChunkStats | None = None,
+                 dedup: NearDuplicates | None = None) -> List[Dict[str, Any]]:
     """
     문서를 청크 단위로 나눠 코퍼스 생성
-    반환 예: [{"id":"<path>::chunk_0000","text":"...", "meta":{"path":..., "chunk":0}}, ...]
-    """
-    docs = load_documents(paths_or_dir)
-    corpus: List[Dict[str, Any]] = []
-    for d in docs:
-        chunks = chunk_text(d["text"])
-        for i, ch in enumerate(chunks):
-            cid = f"{d['path']}::chunk_{i:04d}"
-            corpus.append({"id": cid, "text": ch, "meta": {"path": d["path"], "chunk": i}})
-    return corpus
+    - chunker=chunker_config(kind="tokens", max_tokens=512, model=...) 로 토큰 기준 청커 사용
+    - dedup=NearDuplicates(threshold=0.95) 로 근사 중복 청크 제거 (dedup.dropped: 줄어든 임베딩 입력/인덱스 행 수)
+    반환 예: [{"id":"<path>::chunk_0000","text":"...",
+              "meta":{"path":..., "chunk":0, "ext":"md", "source":"day1", "date":"2025-11-12"}}, ...]
+    """
+    return list(iter_corpus(paths_or_dir, chunk_size, chunk_overlap, chunker, stats, dedup))
 
 
 def save_docs_jsonl(items: List[Dict[str, Any]], out_path: str):
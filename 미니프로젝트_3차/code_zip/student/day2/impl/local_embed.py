@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+오프라인 로컬 임베딩 (네트워크/외부 모델 불필요)
+- 문자 n-gram(기본 1~3)을 해시 버킷으로 모으고 고정 시드 랜덤 투영으로 D차원 벡터 생성
+- 한국어는 음절 단위 n-gram이 형태소 없이도 잘 맞음
+- 모델 이름: "local-hash" (D=256) 또는 "local-hash-<D>" (예: local-hash-384)
+- 같은 모델 이름이면 어느 프로세스에서든 항상 같은 벡터 (Python hash() 미사용)
+"""
+
+from __future__ import annotations
+import re, time, threading
+from typing import Dict, List, Tuple
+import numpy as np
+
+from .scheduler import ThroughputStats
+
+LOCAL_PREFIX = "local-hash"
+DEFAULT_LOCAL_DIM = 256
+N_BUCKETS = 1 << 14
+NGRAM_RANGE = (1, 3)
+SEED = 20251112
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_PRIMES = (np.uint64(1), np.uint64(0x100000001B3), np.uint64(0xC2B2AE3D27D4EB4F))
+_PROJ: Dict[Tuple[int, int], np.ndarray] = {}
+_PROJ_LOCK = threading.Lock()
+
+
+def parse_local_dim(model: str) -> int:
+    m = re.fullmatch(re.escape(LOCAL_PREFIX) + r"(?:-(\d+))?", model or "")
+    if not m:
+        raise ValueError(f"로컬 임베딩 모델 이름이 아닙니다: {model}")
+    return int(m.group(1) or DEFAULT_LOCAL_DIM)
+
+
+def _projection(dim: int, seed: int = SEED) -> np.ndarray:
+    """(N_BUCKETS, dim) 고정 랜덤 투영 행렬 (프로세스당 1회 생성)"""
+    key = (dim, seed)
+    with _PROJ_LOCK:
+        mat = _PROJ.get(key)
+        if mat is None:
+            rng = np.random.default_rng(seed)
+            mat = rng.standard_normal((N_BUCKETS, dim), dtype=np.float32) / np.float32(np.sqrt(dim))
+            _PROJ[key] = mat
+    return mat
+
+
+def ngram_buckets(text: str) -> np.ndarray:
+    """문자 n-gram 해시 버킷 id 배열 (벡터화, 결정적)"""
+    s = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    if not s:
+        return np.zeros(0, dtype=np.int64)
+    cp = np.frombuffer(s.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    out = []
+    lo, hi = NGRAM_RANGE
+    with np.errstate(over="ignore"):
+        for n in range(lo, hi + 1):
+            if len(cp) < n:
+                break
+            h = np.full(len(cp) - n + 1, np.uint64(n), dtype=np.uint64)
+            for j in range(n):
+                h = h * _PRIMES[2] + cp[j:len(cp) - n + 1 + j] * _PRIMES[j % 3]
+            h ^= h >> np.uint64(29)
+            h *= _MIX
+            h ^= h >> np.uint64(32)
+            out.append(h % np.uint64(N_BUCKETS))
+    return np.concatenate(out).astype(np.int64)
+
+
+class LocalHashBackend:
+    """해시 n-gram + 랜덤 투영 임베딩 (CPU만 사용)"""
+
+    cacheable = False  # 계산이 캐시 조회보다 싸므로 디스크 캐시를 쓰지 않음
+
+    def __init__(self, model: str = LOCAL_PREFIX, **_: object):
+        self.model = model
+        self.dim = parse_local_dim(model)
+        self.proj = _projection(self.dim)
+        self.stats = ThroughputStats()
+
+    def embed_one(self, text: str) -> np.ndarray:
+        ids, counts = np.unique(ngram_buckets(text), return_counts=True)
+        if ids.size == 0:
+            return np.zeros(self.dim, dtype=np.float32)
+        w = (1.0 + np.log(counts)).astype(np.float32)  # sublinear tf
+        return w @ self.proj[ids]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        t0 = time.perf_counter()
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i] = self.embed_one(t)
+        self.stats.elapsed += time.perf_counter() - t0
+        # 사용량 API가 없으므로 UTF-8 길이로 대략 집계 (영문 3바이트·한글 1글자 ≈ 1토큰, 글자별 estimate_tokens보다 훨씬 쌈)
+        self.stats.add(sum(len(t.encode("utf-8")) for t in texts) // 3, len(texts))
+        return out
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+인덱스 매니페스트 (index_dir/manifest.json)
+- build_index가 faiss.index / docs.jsonl 옆에 기록
+- 내용: 임베딩 모델, 차원, 벡터 수, 정규화 방식, 청커 파라미터, 빌드 시각, 파일 크기/sha256
+- 로드 시 네트워크 호출 없이 호환성 검사 → 모델/청커/차원이 다르면 IndexMismatchError
+- 소스 매니페스트(index_dir/sources.json): 원본 파일별 크기/mtime/sha256 + 만든 청크 id
+    build_index 증분 빌드가 추가/변경/삭제 파일을 가려내는 데 사용
+"""
+
+from __future__ import annotations
+import os, json, time, hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+MANIFEST_NAME = "manifest.json"
+SOURCES_NAME = "sources.json"
+MANIFEST_VERSION = 1
+NORMALIZER = "l2"
+
+
+class IndexMismatchError(ValueError):
+    """인덱스와 현재 설정(모델/차원/청커/파일)이 맞지 않음"""
+
+
+def manifest_path(index_dir: str) -> str:
+    return os.path.join(index_dir, MANIFEST_NAME)
+
+
+def file_sha256(path: str, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_manifest(index_dir: str, model: str, dim: int, count: int, chunker: Dict[str, Any],
+                   files: tuple = ("faiss.index", "faiss.index.meta.json", "docs.jsonl", "docs.bin", "docs.idx.npy",
+                                  "vectors.npy", "ids.npy"),
+                   **extra: Any) -> Dict[str, Any]:
+    """
+    매니페스트 기록 (임시 파일에 쓴 뒤 rename → 읽는 쪽이 반쯤 쓰인 파일을 보지 않음)
+    - files: index_dir 기준 상대 경로, 크기와 sha256을 함께 기록
+    """
+    manifest: Dict[str, Any] = {
+        "version": MANIFEST_VERSION,
+        "embedding_model": model,
+        "dim": int(dim),
+        "count": int(count),
+        "normalizer": NORMALIZER,
+        "chunker": dict(chunker),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "files": {},
+    }
+    for name in files:
+        p = os.path.join(index_dir, name)
+        if os.path.exists(p):
+            manifest["files"][name] = {"size": os.path.getsize(p), "sha256": file_sha256(p)}
+    manifest.update(extra)
+    tmp = manifest_path(index_dir) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, manifest_path(index_dir))
+    return manifest
+
+
+def read_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    """매니페스트가 없으면 None (매니페스트 도입 전 인덱스)"""
+    p = manifest_path(index_dir)
+    if not os.path.exists(p):
+        return None
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_manifest(manifest: Dict[str, Any], index_dir: str, model: Optional[str] = None,
+                   dim: Optional[int] = None, count: Optional[int] = None,
+                   chunker: Optional[Dict[str, Any]] = None, deep: bool = False):
+    """
+    매니페스트 기준 호환성 검사 (네트워크 호출 없음)
+    - model / dim / count / chunker: 주어진 값만 비교
+    - 파일 크기는 항상 비교 (faiss.index와 docs.jsonl이 다른 빌드에서 온 경우 감지)
+    - deep=True 이면 sha256까지 비교
+    """
+    where = f"({index_dir})"
+    if manifest.get("version", 0) > MANIFEST_VERSION:
+        raise IndexMismatchError(f"지원하지 않는 매니페스트 버전입니다: {manifest.get('version')} {where}")
+    if model is not None and manifest.get("embedding_model") != model:
+        raise IndexMismatchError(
+            f"임베딩 모델이 인덱스와 다릅니다. (index={manifest.get('embedding_model')}, embedder={model}) {where}")
+    if dim is not None and int(manifest.get("dim", -1)) != int(dim):
+        raise IndexMismatchError(f"임베딩 차원이 인덱스와 다릅니다. (index={manifest.get('dim')}, embedder={dim}) {where}")
+    if count is not None and int(manifest.get("count", -1)) != int(count):
+        raise IndexMismatchError(f"벡터 수가 매니페스트와 다릅니다. (manifest={manifest.get('count')}, index={count}) {where}")
+    if chunker is not None and manifest.get("chunker") != dict(chunker):
+        raise IndexMismatchError(f"청커 설정이 인덱스와 다릅니다. (index={manifest.get('chunker')}, now={chunker}) {where}")
+    for name, info in (manifest.get("files") or {}).items():
+        p = os.path.join(index_dir, name)
+        if not os.path.exists(p):
+            raise IndexMismatchError(f"매니페스트에 있는 파일이 없습니다: {p}")
+        if os.path.getsize(p) != info.get("size"):
+            raise IndexMismatchError(f"파일 크기가 매니페스트와 다릅니다(빌드 도중이거나 섞인 파일): {p}")
+        if deep and file_sha256(p) != info.get("sha256"):
+            raise IndexMismatchError(f"파일 체크섬이 매니페스트와 다릅니다: {p}")
+
+
+# ---------- 소스 매니페스트 ----------
+def read_sources(index_dir: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """sources.json → {경로: {"size", "mtime_ns", "sha256", "chunks": [청크 id...]}} (없으면 None)"""
+    p = os.path.join(index_dir, SOURCES_NAME)
+    if not os.path.exists(p):
+        return None
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def write_sources(index_dir: str, files: Dict[str, Dict[str, Any]]):
+    p = os.path.join(index_dir, SOURCES_NAME)
+    with open(p + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, ensure_ascii=False, indent=1)
+    os.replace(p + ".tmp", p)
+
+
+def diff_sources(paths: List[str], previous: Optional[Dict[str, Dict[str, Any]]] = None
+                 ) -> Tuple[Dict[str, Dict[str, Any]], List[str], List[str], List[str]]:
+    """
+    현재 파일 목록 vs 이전 소스 매니페스트 → (상태, 추가, 변경, 삭제)
+    - 크기/mtime이 같으면 해시 생략, 다르면 sha256 비교 (touch만 된 파일은 변경 아님)
+    - 상태: 파일별 {"size", "mtime_ns", "sha256", "chunks"} — 추가/변경 파일의 chunks는 빈 리스트(빌드 후 채움)
+    """
+    previous = previous or {}
+    states: Dict[str, Dict[str, Any]] = {}
+    added: List[str] = []
+    changed: List[str] = []
+    for fp in paths:
+        st = os.stat(fp)
+        prev = previous.get(fp)
+        if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            states[fp] = prev
+            continue
+        sha = file_sha256(fp)
+        if prev and prev.get("sha256") == sha:
+            states[fp] = {**prev, "mtime_ns": st.st_mtime_ns}
+            continue
+        states[fp] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha, "chunks": []}
+        (changed if prev else added).append(fp)
+    removed = [fp for fp in previous if fp not in states]
+    return states, added, changed, removed
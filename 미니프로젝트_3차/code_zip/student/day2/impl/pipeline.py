@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+스트리밍 인덱싱 파이프라인: 파싱/청크 → 임베딩 → store.add 를 겹쳐서 실행
+- 단계마다 백그라운드 스레드 + 크기 제한 큐 (queue.Queue(maxsize)) → 앞 단계가 너무 앞서가면 put에서 대기
+- 동시에 메모리에 있는 청크 수 ≈ max_inflight (+ 단계별로 처리 중인 창 1개씩)
+    문서 전체 텍스트는 파일 하나씩만, 청크는 창(window) 단위로만 존재
+- 임베딩 창이 충분히 커야(EMBED_WINDOW) EmbedScheduler가 요청을 병렬로 보냄
+- 소비 쪽에서 예외/중단 시 stop 이벤트로 앞 단계 스레드 정리, 생산 쪽 예외는 소비 쪽에서 다시 발생
+"""
+
+from __future__ import annotations
+import os, queue, threading
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+
+from .ingest import iter_corpus, ChunkStats, NearDuplicates, CHUNK_SIZE, CHUNK_OVERLAP
+
+MAX_INFLIGHT = int(os.getenv("DAY2_MAX_INFLIGHT", "8192") or "8192")
+EMBED_WINDOW = 1024  # encode 1회에 넘길 청크 수
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def batched(items: Iterable[Any], n: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+
+def background(items: Iterable[Any], maxsize: int, name: str) -> Iterator[Any]:
+    """items를 별도 스레드에서 미리 꺼내 크기 maxsize 큐로 전달하는 이터레이터"""
+    q: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(x) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(x, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for x in items:
+                if not put(x):
+                    return
+            put(_DONE)
+        except BaseException as e:  # 소비 쪽에서 다시 발생
+            put(_Failed(e))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()  # 중단 시 앞 단계 제너레이터(와 그 스레드)도 정리
+
+    t = threading.Thread(target=run, name=name, daemon=True)
+    t.start()
+    try:
+        while True:
+            x = q.get()
+            if x is _DONE:
+                return
+            if isinstance(x, _Failed):
+                raise x.exc
+            yield x
+    finally:
+        stop.set()
+
+
+def embed_stream(files: List[str], emb, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 max_inflight: int = MAX_INFLIGHT, chunker: Dict[str, Any] | None = None,
+                 stats: ChunkStats | None = None,
+                 dedup: NearDuplicates | None = None) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+    """
+    files → (청크 창, 임베딩) 스트림
+    - 파싱/청크 스레드 → 큐 → 임베딩 스레드 → 큐 → 호출 쪽(store.add)
+    - 두 큐의 청크 수 합이 max_inflight를 넘지 않도록 창 개수로 나눠 배분
+    - chunker/stats/dedup은 iter_corpus로 그대로 전달 (stats/dedup 집계는 스트림을 끝까지 소비한 뒤에 읽을 것)
+    """
+    window = max(1, min(EMBED_WINDOW, max_inflight))
+    slots = max(2, max_inflight // window)
+    chunks = background(batched(iter_corpus(files, chunk_size, chunk_overlap, chunker, stats, dedup), window),
+                        maxsize=slots // 2, name="day2-chunk")
+    embedded = ((items, emb.encode([it.get("text", "") for it in items])) for items in chunks)
+    return background(embedded, maxsize=slots - slots // 2, name="day2-embed")
@@ -1,12 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-import os, json
-from typing import Dict, Any, List
+import os, json, asyncio, threading, weakref
+from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 from student.common.schemas import Day2Plan
-from .embeddings import Embeddings
+from .embeddings import Embeddings, AsyncEmbeddings
 from .store import FaissStore
+from .sharded import ShardedStore, is_sharded, read_shards, shard_dir, SHARDS_NAME
+from .versions import resolve
+from .manifest import MANIFEST_NAME, IndexMismatchError, read_manifest, check_manifest
+
+# ahandle에서 FAISS 로드/검색을 돌리는 전용 스레드 풀 (동시 검색 수 상한)
+SEARCH_WORKERS = int(os.getenv("DAY2_SEARCH_WORKERS", "4") or "4")
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="day2-search")
 
 def _idx_paths(index_dir: str):
     return (
@@ -14,17 +22,189 @@ def _idx_paths(index_dir: str):
         os.path.join(index_dir, "docs.jsonl"),
     )
 
-def _load_store(plan: Day2Plan, emb: Embeddings) -> FaissStore:
-    index_path, docs_path = _idx_paths(plan.index_dir)
-    if not (os.path.exists(index_path) and os.path.exists(docs_path)):
-        raise FileNotFoundError(f"FAISS 인덱스가 없습니다. 먼저 ingest를 실행하세요: {plan.index_dir}")
-    store = FaissStore.load(index_path, docs_path)
-    # 차원 체크
-    test_dim = emb.encode(["__dim_check__"]).shape[1]
+# ---------- 프로세스 공용 스토어/임베더 레지스트리 ----------
+# index_dir(논리 경로, 절대경로) → (서명, FaissStore). 서명 = (실제 버전 디렉토리, 파일 mtime/size)
+# 파일이나 CURRENT가 바뀌면 새로 로드해 같은 키에서 통째로 교체(dict 대입은 원자적)
+# → 검색 중인 요청은 이전 스토어 객체를 계속 쓰므로 반쯤 로드된 스토어를 볼 일이 없음
+# → 교체된 이전 스토어는 STORE_CLOSE_DELAY초 뒤 close (진행 중인 검색이 끝날 시간), 차원 체크 기록도 함께 삭제
+STORE_CLOSE_DELAY = float(os.getenv("DAY2_STORE_CLOSE_DELAY", "30") or "30")
+_STORES: Dict[str, Tuple[tuple, FaissStore | ShardedStore]] = {}
+_STORE_LOCKS: Dict[str, threading.Lock] = {}
+_DIM_OK: set = set()  # (index_dir, 서명, 모델) 차원 체크 통과 기록
+_EMBEDDERS: Dict[str, Embeddings] = {}
+_AEMBEDDERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncEmbeddings]]" = weakref.WeakKeyDictionary()
+_REGISTRY_LOCK = threading.Lock()
+
+def _signature(index_dir: str) -> tuple:
+    """(디렉토리 절대경로, faiss.index / docs.jsonl (+ manifest.json) 의 (mtime_ns, size)). 인덱스 파일이 없으면 FileNotFoundError"""
+    out: list = [os.path.abspath(index_dir)]
+    for p in _idx_paths(index_dir):
+        st = os.stat(p)
+        out.append((st.st_mtime_ns, st.st_size))
+    mp = os.path.join(index_dir, MANIFEST_NAME)
+    if os.path.exists(mp):
+        st = os.stat(mp)
+        out.append((st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+def _swap(key: str, sig: tuple, store: FaissStore | ShardedStore):
+    """key의 스토어를 교체하고 이전 스토어 정리 (ShardedStore는 샤드를 새 스토어와 공유할 수 있어 닫지 않음)"""
+    old = _STORES.get(key)
+    _STORES[key] = (sig, store)
+    if old is None or old[1] is store:
+        return
+    _DIM_OK.difference_update({m for m in list(_DIM_OK) if m[0] == key and m[1] == old[0]})
+    if isinstance(old[1], FaissStore):
+        _close_later(old[1])
+    elif not isinstance(store, ShardedStore):  # 샤드 → 단일 인덱스로 전환: 샤드 스토어 정리
+        prefix = shard_dir(key, "")
+        for k in [k for k in _STORES if k.startswith(prefix)]:
+            _drop(k)
+
+def _close_later(store: FaissStore):
+    if STORE_CLOSE_DELAY <= 0:
+        store.close()
+        return
+    t = threading.Timer(STORE_CLOSE_DELAY, store.close)
+    t.daemon = True
+    t.start()
+
+def _drop(key: str):
+    """더 이상 쓰지 않는 키(레이아웃에서 빠진 샤드 등)의 스토어/잠금/차원 체크 기록 삭제"""
+    old = _STORES.pop(key, None)
+    with _REGISTRY_LOCK:
+        _STORE_LOCKS.pop(key, None)
+    _DIM_OK.difference_update({m for m in list(_DIM_OK) if m[0] == key})
+    if old is not None and isinstance(old[1], FaissStore):
+        _close_later(old[1])
+
+def get_store(index_dir: str) -> FaissStore | ShardedStore:
+    """
+    index_dir의 FaissStore를 프로세스 공용으로 재사용
+    - 파일 mtime/size가 바뀐 경우에만 다시 로드
+    - 다른 스레드가 재로드 중이면 기다리지 않고 이전 스토어를 반환
+    - shards.json이 있으면 ShardedStore (샤드별로 캐시하므로 바뀐 샤드만 재로드)
+    - index_dir/CURRENT가 있으면 그 버전 디렉토리를 사용 (요청마다 확인 → 교체 후 다음 요청부터 새 버전)
+      캐시 키는 index_dir 그대로, 버전은 서명에 포함 → 버전이 바뀌면 같은 키에서 교체, 이전 버전 스토어는 close
+    """
+    key = os.path.abspath(index_dir)
+    path = resolve(index_dir)
+    if is_sharded(path):
+        return _get_sharded(key, path)
+    return _get_single(key, path)
+
+def _get_single(key: str, path: str) -> FaissStore:
+    try:
+        sig = _signature(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"FAISS 인덱스가 없습니다. 먼저 ingest를 실행하세요: {path}") from None
+    entry = _STORES.get(key)
+    if entry and entry[0] == sig:
+        return entry[1]
+    with _REGISTRY_LOCK:
+        lock = _STORE_LOCKS.setdefault(key, threading.Lock())
+    if not lock.acquire(blocking=entry is None):
+        return entry[1]
+    try:
+        entry = _STORES.get(key)
+        if entry and entry[0] == sig:
+            return entry[1]
+        index_path, docs_path = _idx_paths(path)
+        manifest = read_manifest(path)
+        if manifest is not None:
+            check_manifest(manifest, path)  # 파일 크기 → 섞인/쓰다 만 파일 감지
+        store = FaissStore.load(index_path, docs_path)
+        store.manifest = manifest
+        if manifest is not None:
+            check_manifest(manifest, path, dim=store.dim, count=store.index.ntotal)
+        _swap(key, sig, store)  # 로드 전 서명 기록 → 로드 중 바뀌었으면 다음 요청에서 재로드
+        return store
+    finally:
+        lock.release()
+
+def _get_sharded(key: str, path: str) -> ShardedStore:
+    """샤드는 <index_dir>/shards/<이름> 논리 키로 캐시 (버전 디렉토리 아래 실제 경로는 서명에)"""
+    layout = read_shards(path)
+    names = list(layout["shards"])
+    keys = [shard_dir(key, name) for name in names]
+    stores = [_get_single(k, shard_dir(path, name)) for k, name in zip(keys, names)]
+    st = os.stat(os.path.join(path, SHARDS_NAME))
+    sig = (os.path.abspath(path), (st.st_mtime_ns, st.st_size)) + tuple(_STORES[k][0] for k in keys)
+    entry = _STORES.get(key)
+    if entry and entry[0] == sig:
+        return entry[1]
+    store = ShardedStore(stores, names)
+    prefix = shard_dir(key, "")
+    for k in [k for k in _STORES if k.startswith(prefix) and k not in keys]:
+        _drop(k)  # 레이아웃에서 빠진 샤드
+    _swap(key, sig, store)
+    return store
+
+def _store_sig(index_dir: str) -> tuple | None:
+    entry = _STORES.get(os.path.abspath(index_dir))
+    return entry[0] if entry else None
+
+def get_embedder(model: str) -> Embeddings:
+    """모델별 Embeddings(=클라이언트)를 프로세스에서 하나만 생성해 재사용"""
+    emb = _EMBEDDERS.get(model)
+    if emb is None:
+        with _REGISTRY_LOCK:
+            emb = _EMBEDDERS.get(model) or _EMBEDDERS.setdefault(model, Embeddings(model=model))
+    return emb
+
+def get_async_embedder(model: str) -> AsyncEmbeddings:
+    """실행 중인 이벤트 루프별로 AsyncEmbeddings를 재사용 (AsyncOpenAI 연결 풀은 루프에 묶임)"""
+    loop = asyncio.get_running_loop()
+    per_loop = _AEMBEDDERS.setdefault(loop, {})
+    emb = per_loop.get(model)
+    if emb is None:
+        emb = per_loop[model] = AsyncEmbeddings(model=model)
+    return emb
+
+def _check_dim(store: FaissStore, test_dim: int):
     if store.dim != test_dim:
-        raise ValueError(f"임베딩 차원이 인덱스와 다릅니다. (index={store.dim}, embedder={test_dim})")
+        raise IndexMismatchError(f"임베딩 차원이 인덱스와 다릅니다. (index={store.dim}, embedder={test_dim})")
+
+def _check_compat(plan: Day2Plan, store: FaissStore, emb: Embeddings) -> bool:
+    """
+    매니페스트로 모델/차원 호환성 검사 (네트워크 호출 없음)
+    - 통과하면 True, 매니페스트가 없는 예전 인덱스라 임베딩 호출로 차원을 확인해야 하면 False
+    """
+    for part in getattr(store, "shards", [store]):
+        manifest = getattr(part, "manifest", None)
+        if manifest is None:
+            return False
+        check_manifest(manifest, os.path.dirname(part.index_path), model=emb.model)
+    if emb.dim is not None:
+        _check_dim(store, emb.dim)
+    return True
+
+def _load_store(plan: Day2Plan, emb: Embeddings) -> FaissStore:
+    store = get_store(plan.index_dir)
+    # 호환성 체크 (스토어 버전·모델당 1회)
+    mark = (os.path.abspath(plan.index_dir), _store_sig(plan.index_dir), emb.model)
+    if mark not in _DIM_OK:
+        if not _check_compat(plan, store, emb):
+            _check_dim(store, emb.encode(["__dim_check__"]).shape[1])
+        _DIM_OK.add(mark)
     return store
 
+async def _aload_store(plan: Day2Plan, emb: AsyncEmbeddings) -> FaissStore:
+    loop = asyncio.get_running_loop()
+    store = await loop.run_in_executor(_SEARCH_POOL, get_store, plan.index_dir)
+    mark = (os.path.abspath(plan.index_dir), _store_sig(plan.index_dir), emb.model)
+    if mark not in _DIM_OK:
+        if not _check_compat(plan, store, emb):
+            _check_dim(store, (await emb.encode(["__dim_check__"])).shape[1])
+        _DIM_OK.add(mark)
+    return store
+
+def _plan_filters(plan: Day2Plan) -> Dict[str, Any] | None:
+    """Day2Plan의 메타 필터 필드 → store.search filters (설정된 값만)"""
+    filters = {k: getattr(plan, k, None) for k in ("path_prefix", "file_types", "sources", "date_from", "date_to")}
+    filters = {k: v for k, v in filters.items() if v}
+    return filters or None
+
 def _gate(contexts: List[Dict[str, Any]], plan: Day2Plan) -> Dict[str, Any]:
     if not contexts:
         return {"status":"insufficient","top_score":0.0,"mean_topk":0.0}
@@ -54,12 +234,46 @@ class Day2Agent:
 
     def handle(self, query: str, plan: Day2Plan = None) -> Dict[str, Any]:
         plan = plan or self.plan_defaults
-        emb = Embeddings(model=plan.embedding_model)
+        emb = get_embedder(plan.embedding_model)
 
         store = _load_store(plan, emb)
         qv = emb.encode([query])[0]
-        contexts = store.search(qv, top_k=plan.top_k)
+        contexts = store.search(qv, top_k=plan.top_k, filters=_plan_filters(plan))
+        return self._payload(query, plan, contexts)
+
+    def handle_batch(self, queries: List[str], plan: Day2Plan = None) -> List[Dict[str, Any]]:
+        """
+        여러 질의를 한 번에 처리 (평가/리포트 배치용, 질의별 payload는 handle과 동일)
+        - 임베딩: 전체 질의를 encode 1회로 묶어서 요청
+        - 검색: store.search_many → index.search 1회
+        """
+        plan = plan or self.plan_defaults
+        if not queries:
+            return []
+        emb = get_embedder(plan.embedding_model)
+
+        store = _load_store(plan, emb)
+        qvs = emb.encode(list(queries))
+        results = store.search_many(qvs, top_k=plan.top_k, filters=_plan_filters(plan))
+        return [self._payload(q, plan, contexts) for q, contexts in zip(queries, results)]
+
+    async def ahandle(self, query: str, plan: Day2Plan = None) -> Dict[str, Any]:
+        """
+        handle의 asyncio 버전 (payload 동일)
+        - 임베딩: AsyncEmbeddings(AsyncOpenAI) → 이벤트 루프를 막지 않음
+        - FAISS 로드/검색: 전용 스레드 풀(_SEARCH_POOL, SEARCH_WORKERS개)로 넘김
+        """
+        plan = plan or self.plan_defaults
+        emb = get_async_embedder(plan.embedding_model)
+
+        store = await _aload_store(plan, emb)
+        qv = (await emb.encode([query]))[0]
+        loop = asyncio.get_running_loop()
+        filters = _plan_filters(plan)
+        contexts = await loop.run_in_executor(_SEARCH_POOL, lambda: store.search(qv, top_k=plan.top_k, filters=filters))
+        return self._payload(query, plan, contexts)
 
+    def _payload(self, query: str, plan: Day2Plan, contexts: List[Dict[str, Any]]) -> Dict[str, Any]:
         gate = _gate(contexts, plan)
         payload: Dict[str, Any] = {
             "type": "rag_answer",
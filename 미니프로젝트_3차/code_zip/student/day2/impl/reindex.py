@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+재임베딩 없이 인덱스 다시 만들기
+- 입력: build_index가 만든 index_dir (단일 또는 샤딩) — 디렉토리마다 vectors.npy + 문서 스토어 + manifest.json
+- 출력: 다른 index_type / storage / rerank / mmap / 샤드 레이아웃의 index_dir (새 버전으로 기록 후 CURRENT 교체)
+- 임베딩 API를 호출하지 않음 → 인덱스 실험이 빠르고 오프라인에서도 가능
+
+실행:
+  python -m student.day2.impl.reindex --src indices/day2 --dst indices/day2_hnsw --index_type hnsw --storage sq8 --rerank 4
+  python -m student.day2.impl.reindex --src indices/day2 --dst indices/day2_sharded --shards 4
+"""
+import os, sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import argparse, shutil, numpy as np
+from typing import Any, Dict, List, Tuple
+
+from student.day2.impl.build_index import write_index
+from student.day2.impl.docstore import DocStore
+from student.day2.impl.manifest import IndexMismatchError, read_manifest, read_sources, write_sources
+from student.day2.impl.sharded import (SHARDS_NAME, SHARD_BY, assign_files, is_sharded, read_shards,
+                                       shard_dir, shard_name, write_shards)
+from student.day2.impl.store import INDEX_TYPES, STORAGE_TYPES, ids_path, load_vectors
+from student.day2.impl.versions import KEEP_VERSIONS, check_unversioned, new_version, publish, resolve
+
+
+def _source_dirs(src: str) -> List[str]:
+    if is_sharded(src):
+        return [shard_dir(src, name) for name in read_shards(src)["shards"]]
+    return [src]
+
+
+def load_source(src: str) -> Tuple[List[Dict[str, Any]], np.ndarray, str, Dict[str, Any], Dict[str, Any] | None]:
+    """
+    src index_dir → (corpus, vecs, 임베딩 모델, 청커 설정, 소스 매니페스트)
+    - 소스 매니페스트(sources.json)는 샤드별로 합침, 하나라도 없으면 None → dst의 다음 build_index는 전체 빌드
+    - 샤딩된 경우 샤드 순서대로 이어 붙임
+    - 삭제 표시된 행(ids.npy의 -1)은 제외 → reindex 결과는 compact된 상태
+    - 원본 벡터와 문서 수가 다르거나 샤드 간 모델/청커가 다르면 IndexMismatchError
+    """
+    corpus: List[Dict[str, Any]] = []
+    parts: List[np.ndarray] = []
+    model, chunker = None, None
+    sources: Dict[str, Any] | None = {}
+    for d in _source_dirs(resolve(src)):
+        manifest = read_manifest(d)
+        if manifest is None:
+            raise IndexMismatchError(f"매니페스트가 없는 인덱스는 reindex할 수 없습니다 (build_index로 다시 빌드): {d}")
+        if model is not None and (manifest["embedding_model"], manifest.get("chunker")) != (model, chunker):
+            raise IndexMismatchError(f"샤드 간 임베딩 모델/청커가 다릅니다: {d}")
+        model, chunker = manifest["embedding_model"], manifest.get("chunker") or {}
+        part_sources = read_sources(d)
+        sources = None if sources is None or part_sources is None else {**sources, **part_sources}
+        index_path = os.path.join(d, "faiss.index")
+        try:
+            vecs = load_vectors(index_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"원본 벡터(vectors.npy)가 없습니다 (사이드카 도입 전 빌드): {d}") from None
+        docs = DocStore.open(os.path.join(d, "docs.jsonl"), migrate=True)
+        if len(vecs) != len(docs):
+            raise IndexMismatchError(f"원본 벡터 수와 문서 수가 다릅니다 (vectors={len(vecs)}, docs={len(docs)}): {d}")
+        ip = ids_path(index_path)
+        live = np.flatnonzero(np.load(ip) != -1) if os.path.exists(ip) else None
+        if live is None or len(live) == len(docs):
+            corpus.extend(docs)
+            parts.append(vecs)
+        else:
+            corpus.extend(docs[int(i)] for i in live)
+            parts.append(np.asarray(vecs[live]))
+    if model is None:
+        raise FileNotFoundError(f"인덱스가 없습니다: {src}")
+    vecs = parts[0] if len(parts) == 1 else np.concatenate(parts)
+    return corpus, vecs, model, chunker, sources
+
+
+def reindex(src: str, dst: str, index_type: str = "auto", index_params: dict | None = None, mmap: bool = False,
+            shards: int = 0, shard_by: str = "source", versioned: bool = True, keep_versions: int = KEEP_VERSIONS):
+    """
+    src(CURRENT 버전)의 원본 벡터/문서로 dst에 새 레이아웃 작성
+    - versioned=True(기본): dst의 새 버전으로 쓴 뒤 CURRENT 교체 → src == dst 도 안전
+    - versioned=False: dst에 바로 기록 (dst에 CURRENT가 있으면 서빙되지 않으므로 RuntimeError)
+    """
+    if not versioned:
+        check_unversioned(dst)
+    corpus, vecs, model, chunker, sources = load_source(src)
+    print(f"[REINDEX] {src} → {dst}: {len(corpus):,} docs, dim={vecs.shape[1]}, model={model}")
+    if versioned:
+        name, target = new_version(dst)
+        try:
+            _write_layout(corpus, vecs, model, chunker, sources, target, index_type, index_params, mmap,
+                          shards, shard_by)
+        except BaseException:
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        publish(dst, name, keep_versions)
+    else:
+        _write_layout(corpus, vecs, model, chunker, sources, dst, index_type, index_params, mmap, shards, shard_by)
+
+
+def _write_layout(corpus, vecs, model, chunker, sources, dst, index_type, index_params, mmap, shards, shard_by):
+    build = dict(index_type=index_type, index_params=index_params, mmap=mmap)
+    if not shards:
+        write_index(corpus, vecs, dst, model, chunker, **build)
+        if sources is not None:
+            write_sources(dst, sources)
+        if is_sharded(dst):
+            os.remove(os.path.join(dst, SHARDS_NAME))  # 단일 인덱스로 전환
+        return
+
+    paths = list(dict.fromkeys(it.get("meta", {}).get("path", "") for it in corpus))
+    sizes = dict.fromkeys(paths, 0)
+    for it in corpus:
+        sizes[it.get("meta", {}).get("path", "")] += len(it.get("text", "").encode("utf-8"))
+    assignment = assign_files(paths, shards, shard_by, sizes=sizes)
+    names = [shard_name(i) for i in range(shards)]
+    built = []
+    for name in names:
+        rows = [i for i, it in enumerate(corpus) if assignment[it.get("meta", {}).get("path", "")] == name]
+        d = shard_dir(dst, name)
+        if not rows:
+            shutil.rmtree(d, ignore_errors=True)
+            continue
+        print(f"[SHARD] {name}: docs={len(rows):,}")
+        write_index([corpus[i] for i in rows], np.asarray(vecs[rows]), d, model, chunker, **build)
+        if sources is not None:
+            write_sources(d, {fp: st for fp, st in sources.items() if assignment.get(fp) == name})
+        built.append(name)
+    write_shards(dst, {"n": shards, "by": shard_by, "shards": built, "files": assignment})
+    print(f"[SHARD] {len(built)}/{shards} shards → {os.path.join(dst, SHARDS_NAME)}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="원본 벡터 사이드카로 재임베딩 없이 인덱스 재구성")
+    ap.add_argument("--src", default="indices/day2")
+    ap.add_argument("--dst", required=True)
+    ap.add_argument("--index_type", default="auto", choices=["auto", *INDEX_TYPES])
+    ap.add_argument("--nprobe", type=int, default=None)
+    ap.add_argument("--ef_search", type=int, default=None)
+    ap.add_argument("--storage", default=None, choices=list(STORAGE_TYPES))
+    ap.add_argument("--rerank", type=int, default=None)
+    ap.add_argument("--mmap", action="store_true")
+    ap.add_argument("--shards", type=int, default=0)
+    ap.add_argument("--shard_by", default="source", choices=list(SHARD_BY))
+    ap.add_argument("--keep_versions", type=int, default=KEEP_VERSIONS)
+    ap.add_argument("--no_versions", action="store_true")
+    args = ap.parse_args()
+    index_params = {k: v for k, v in (("nprobe", args.nprobe), ("efSearch", args.ef_search),
+                                      ("storage", args.storage), ("rerank", args.rerank)) if v is not None}
+    reindex(args.src, args.dst, index_type=args.index_type, index_params=index_params or None, mmap=args.mmap,
+            shards=args.shards, shard_by=args.shard_by, versioned=not args.no_versions,
+            keep_versions=args.keep_versions)
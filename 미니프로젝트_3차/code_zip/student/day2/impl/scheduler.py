@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+임베딩 요청 스케줄러
+- 토큰 추정치 기준으로 요청을 묶음 (아이템 개수 상한은 보조)
+- RPM/TPM 토큰 버킷으로 분당 요청/토큰 수 제한
+- 429 등 서버 back-off 힌트(retry-after-ms / retry-after) 준수
+- 동시 요청 수 적응(AIMD): 429 → 절반, 연속 성공 → +1
+- 처리량 통계(tokens/s, chunks/s) 집계
+    토큰 수는 API 응답 usage가 있으면 그 값(측정), 없으면 요청 전 추정치 — 추정이면 [EMBED] 출력에 "(추정)" 표시
+- 동기(run, 스레드) / 비동기(arun, asyncio) 모두 지원
+"""
+
+from __future__ import annotations
+import time, asyncio, threading, weakref
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tiktoken  # 선택 의존성: 있으면 정확한 토큰 수
+except Exception:  # pragma: no cover
+    tiktoken = None
+
+T = TypeVar("T")
+
+MAX_INPUTS_PER_REQUEST = 2048     # OpenAI embeddings 입력 개수 한도
+DEFAULT_MAX_BATCH_TOKENS = 50_000  # 요청 1회당 토큰 예산 (API 한도 300k보다 작게 잡아 병렬성 확보)
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+INCREASE_EVERY = 4                 # 연속 성공 N회마다 동시성 +1
+
+_ENCODERS: dict = {}
+
+
+def estimate_tokens(text: str, model: str | None = None) -> int:
+    """
+    토큰 수 추정
+    - tiktoken 설치 시: 모델 인코더로 정확히 계산
+    - 미설치 시: ASCII 4글자당 1토큰, 그 외(한글 등) 1글자당 1토큰으로 보수적으로 추정
+    """
+    text = text or ""
+    if tiktoken is not None:
+        enc = _ENCODERS.get(model)
+        if enc is None:
+            try:
+                enc = tiktoken.encoding_for_model(model or "")
+            except Exception:
+                enc = tiktoken.get_encoding("cl100k_base")
+            _ENCODERS[model] = enc
+        return max(1, len(enc.encode(text, disallowed_special=())))
+    n_ascii = sum(1 for ch in text if ord(ch) < 128)
+    return max(1, (n_ascii + 3) // 4 + (len(text) - n_ascii))
+
+
+def pack_batches(costs: Sequence[int], max_items: int, max_tokens: int = DEFAULT_MAX_BATCH_TOKENS) -> List[Tuple[int, int]]:
+    """
+    입력 순서를 유지한 채 [start, end) 구간으로 묶음
+    - 구간 토큰 합 <= max_tokens, 아이템 수 <= max_items
+    - 단일 아이템이 max_tokens를 넘으면 그 아이템 하나로 구간 구성
+    """
+    max_items = max(1, min(max_items, MAX_INPUTS_PER_REQUEST))
+    spans: List[Tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, c in enumerate(costs):
+        if i > start and (tokens + c > max_tokens or i - start >= max_items):
+            spans.append((start, i))
+            start, tokens = i, 0
+        tokens += c
+    if start < len(costs):
+        spans.append((start, len(costs)))
+    return spans
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """예외에 실린 서버 back-off 힌트(초). 없으면 None"""
+    resp = getattr(exc, "response", None)
+    headers = getattr(resp, "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        val = headers.get(name)
+        if val is None:
+            continue
+        try:
+            return max(0.0, float(val) * scale)
+        except ValueError:
+            continue
+    return None
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+class TokenBucket:
+    """분당 capacity 만큼 채워지는 토큰 버킷 (capacity None → 제한 없음)"""
+
+    def __init__(self, per_minute: Optional[float]):
+        self.capacity = float(per_minute) if per_minute else None
+        self.level = self.capacity or 0.0
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self, amount: float) -> float:
+        """가능하면 amount 만큼 차감하고 0 반환, 아니면 기다려야 할 초 반환"""
+        amount = min(amount, self.capacity)  # 버킷보다 큰 요청은 가득 찰 때까지만 대기
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.stamp) * self.capacity / 60.0)
+            self.stamp = now
+            if self.level >= amount:
+                self.level -= amount
+                return 0.0
+            return (amount - self.level) * 60.0 / self.capacity
+
+    def acquire(self, amount: float = 1.0):
+        if self.capacity is None:
+            return
+        while (wait := self._take(amount)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1.0):
+        if self.capacity is None:
+            return
+        while (wait := self._take(amount)) > 0:
+            await asyncio.sleep(wait)
+
+    def drain(self):
+        """서버가 한도 초과를 알리면 로컬 추정치도 비움"""
+        if self.capacity is None:
+            return
+        with self.lock:
+            self.level = 0.0
+            self.stamp = time.monotonic()
+
+
+class AdaptiveLimit:
+    """동시 실행 수 상한을 AIMD로 조절하는 게이트"""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.streak = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.in_flight >= self.limit:
+                self.cond.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def on_success(self):
+        with self.cond:
+            self.streak += 1
+            if self.streak >= INCREASE_EVERY and self.limit < self.max_limit:
+                self.limit += 1
+                self.streak = 0
+                self.cond.notify_all()
+
+    def on_throttle(self):
+        with self.cond:
+            self.limit = max(1, self.limit // 2)
+            self.streak = 0
+
+
+@dataclass
+class ThroughputStats:
+    tokens: int = 0
+    items: int = 0
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+    elapsed: float = 0.0
+    usage_tokens: int = 0  # API 응답 usage로 잰 토큰 수 (있으면 tokens 대신 보고)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, tokens: int, items: int):
+        """요청 1건 성공: tokens는 요청 전 추정치"""
+        with self.lock:
+            self.tokens += tokens
+            self.items += items
+            self.requests += 1
+
+    def add_usage(self, tokens: int):
+        """응답의 usage.total_tokens 기록 (백엔드가 호출)"""
+        with self.lock:
+            self.usage_tokens += tokens
+
+    def summary(self) -> dict:
+        secs = self.elapsed or 1e-9
+        tokens = self.usage_tokens or self.tokens
+        return {
+            "tokens": tokens, "tokens_measured": bool(self.usage_tokens), "chunks": self.items,
+            "requests": self.requests, "retries": self.retries, "throttled": self.throttled,
+            "seconds": round(self.elapsed, 3),
+            "tokens_per_s": round(tokens / secs, 1), "chunks_per_s": round(self.items / secs, 2),
+        }
+
+    def __str__(self) -> str:
+        s = self.summary()
+        est = "" if s["tokens_measured"] or not s["tokens"] else "(추정)"
+        return (f"tokens={s['tokens']:,}{est} chunks={s['chunks']:,} requests={s['requests']} "
+                f"retries={s['retries']} throttled={s['throttled']} time={s['seconds']:.1f}s "
+                f"→ {s['tokens_per_s']:,.0f} tokens/s, {s['chunks_per_s']:,.1f} chunks/s")
+
+
+class EmbedScheduler:
+    def __init__(self, max_workers: int = 4, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_retries: int = 4, base_backoff: float = 0.5):
+        """
+        - max_workers: 동시 요청 상한 (429 발생 시 자동으로 줄였다가 다시 늘림)
+        - rpm / tpm: 분당 요청 수 / 토큰 수 한도 (None → 로컬 제한 없음, 서버 힌트만 준수)
+        - max_retries: 요청 1건당 최대 시도 횟수
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(1, max_retries)
+        self.base_backoff = base_backoff
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = AdaptiveLimit(self.max_workers)
+        self.stats = ThroughputStats()
+        # arun용 게이트 (이벤트 루프별): 동시에 도는 arun 호출들이 같은 in-flight 상한(self.limit.limit)을 나눠 씀
+        self._agates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[asyncio.Condition, dict]]" = \
+            weakref.WeakKeyDictionary()
+
+    def _backoff(self, exc: Exception, attempt: int) -> float:
+        """
+        실패 처리: 재시도 불가/마지막 시도면 예외를 다시 올리고, 아니면 대기할 초를 반환
+        - 429면 동시성 절반 + 로컬 TPM 추정치 비움
+        """
+        code = status_code(exc)
+        if code in NON_RETRYABLE_STATUS or attempt == self.max_retries - 1:
+            raise exc
+        hint = retry_after_seconds(exc)
+        with self.stats.lock:
+            self.stats.retries += 1
+            if code == 429:
+                self.stats.throttled += 1
+        if code == 429:
+            self.limit.on_throttle()
+            self.tokens.drain()
+        return hint if hint is not None else self.base_backoff * (2 ** attempt)
+
+    def _run_one(self, fn: Callable[[], T], cost: int, n_items: int) -> T:
+        for attempt in range(self.max_retries):
+            self.requests.acquire(1)
+            self.tokens.acquire(cost)
+            try:
+                with self.limit:
+                    out = fn()
+            except Exception as e:
+                time.sleep(self._backoff(e, attempt))
+                continue
+            self.limit.on_success()
+            self.stats.add(cost, n_items)
+            return out
+        raise RuntimeError("unreachable")
+
+    def run(self, jobs: Sequence[Callable[[], T]], costs: Sequence[int], sizes: Sequence[int]) -> List[T]:
+        """
+        jobs[i]() 를 병렬 실행하고 결과를 입력 순서대로 반환
+        - costs[i]: 추정 토큰 수, sizes[i]: 포함된 아이템 수 (통계용)
+        """
+        t0 = time.perf_counter()
+        try:
+            if len(jobs) == 1:
+                return [self._run_one(jobs[0], costs[0], sizes[0])]
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as ex:
+                return list(ex.map(self._run_one, jobs, costs, sizes))
+        finally:
+            self.stats.elapsed += time.perf_counter() - t0
+
+    async def _arun_one(self, fn: Callable[[], Awaitable[T]], cost: int, n_items: int,
+                        gate: asyncio.Condition, state: dict) -> T:
+        for attempt in range(self.max_retries):
+            await self.requests.aacquire(1)
+            await self.tokens.aacquire(cost)
+            async with gate:
+                await gate.wait_for(lambda: state["in_flight"] < self.limit.limit)
+                state["in_flight"] += 1
+            try:
+                out = await fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+            else:
+                self.limit.on_success()
+                self.stats.add(cost, n_items)
+                return out
+            finally:
+                async with gate:
+                    state["in_flight"] -= 1
+                    gate.notify_all()
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    async def arun(self, jobs: Sequence[Callable[[], Awaitable[T]]], costs: Sequence[int],
+                   sizes: Sequence[int]) -> List[T]:
+        """run의 asyncio 버전: 이벤트 루프를 막지 않고 동시 실행, 결과는 입력 순서대로"""
+        t0 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if loop not in self._agates:
+            self._agates[loop] = (asyncio.Condition(), {"in_flight": 0})
+        gate, state = self._agates[loop]
+        try:
+            return list(await asyncio.gather(*(self._arun_one(j, c, n, gate, state)
+                                               for j, c, n in zip(jobs, costs, sizes))))
+        finally:
+            self.stats.elapsed += time.perf_counter() - t0
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+샤딩된 FAISS 스토어
+- index_dir/shards.json       : 샤드 목록 + 파일→샤드 배정 (빌드가 마지막에 원자적으로 기록)
+- index_dir/shards/<name>/    : 샤드마다 독립된 faiss.index / 문서 스토어 / manifest.json
+- 배정 기준(by): "source"(파일 경로 해시, 기본) | "size"(파일 크기 기준 가장 가벼운 샤드에 배정)
+    한 번 배정된 파일은 같은 샤드에 유지 → 샤드 하나만 재빌드해도 다른 샤드는 그대로
+- ShardedStore: FaissStore와 같은 search / search_many 계약
+    샤드별 검색은 스레드 풀에서 병렬 실행 → 점수 내림차순 결과를 heapq.merge(k-way)로 합쳐 상위 top_k
+"""
+
+from __future__ import annotations
+import os, json, heapq, zlib
+from itertools import islice
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .store import FaissStore
+from .manifest import IndexMismatchError
+
+SHARDS_NAME = "shards.json"
+SHARD_BY = ("source", "size")
+# 샤드 검색 전용 스레드 풀 (FAISS search는 GIL을 놓으므로 스레드로 병렬화)
+SHARD_WORKERS = int(os.getenv("DAY2_SHARD_WORKERS", "4") or "4")
+_SHARD_POOL = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="day2-shard")
+
+
+def shard_name(i: int) -> str:
+    return f"shard_{i:02d}"
+
+
+def shard_dir(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, "shards", name)
+
+
+def is_sharded(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(index_dir, SHARDS_NAME))
+
+
+def read_shards(index_dir: str) -> Optional[Dict[str, Any]]:
+    """shards.json → {"n", "by", "shards": [이름...], "files": {경로: 이름}} (없으면 None)"""
+    p = os.path.join(index_dir, SHARDS_NAME)
+    if not os.path.exists(p):
+        return None
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_shards(index_dir: str, layout: Dict[str, Any]):
+    p = os.path.join(index_dir, SHARDS_NAME)
+    with open(p + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(layout, f, ensure_ascii=False, indent=2)
+    os.replace(p + ".tmp", p)
+
+
+def assign_files(files: List[str], n: int, by: str = "source",
+                 previous: Optional[Dict[str, str]] = None, sizes: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+    """
+    파일 → 샤드 이름 배정
+    - source: crc32(경로) % n → 실행마다 같은 결과
+    - size  : 이전 배정은 유지, 새 파일은 큰 것부터 누적 바이트가 가장 적은 샤드로
+    - sizes: 파일별 크기 (없으면 os.path.getsize, 원본 파일 없이 재배정할 때 사용)
+    """
+    if by not in SHARD_BY:
+        raise ValueError(f"지원하지 않는 shard_by: {by} (가능: {', '.join(SHARD_BY)})")
+    names = [shard_name(i) for i in range(n)]
+    size = sizes.__getitem__ if sizes is not None else os.path.getsize
+    if by == "source":
+        return {fp: names[zlib.crc32(fp.encode("utf-8")) % n] for fp in files}
+    previous = {fp: s for fp, s in (previous or {}).items() if s in names}
+    out: Dict[str, str] = {}
+    load = dict.fromkeys(names, 0)
+    for fp in files:
+        if fp in previous:
+            out[fp] = previous[fp]
+            load[out[fp]] += size(fp)
+    for fp in sorted((f for f in files if f not in out), key=lambda f: (-size(f), f)):
+        out[fp] = min(names, key=lambda s: (load[s], s))
+        load[out[fp]] += size(fp)
+    return out
+
+
+class ShardedStore:
+    """여러 FaissStore를 하나처럼 검색"""
+
+    def __init__(self, shards: List[FaissStore], names: List[str]):
+        dims = {s.dim for s in shards}
+        if len(dims) > 1:
+            raise IndexMismatchError(f"샤드 간 임베딩 차원이 다릅니다: {dict(zip(names, (s.dim for s in shards)))}")
+        self.shards = shards
+        self.names = names
+        self.dim = dims.pop() if dims else 0
+
+    @property
+    def ntotal(self) -> int:
+        return sum(s.index.ntotal for s in self.shards)
+
+    @classmethod
+    def load(cls, index_dir: str, mmap: bool | None = None) -> "ShardedStore":
+        layout = read_shards(index_dir)
+        if layout is None:
+            raise FileNotFoundError(f"샤드 목록이 없습니다: {os.path.join(index_dir, SHARDS_NAME)}")
+        shards = []
+        for name in layout["shards"]:
+            d = shard_dir(index_dir, name)
+            shards.append(FaissStore.load(os.path.join(d, "faiss.index"), os.path.join(d, "docs.jsonl"), mmap=mmap))
+        return cls(shards, list(layout["shards"]))
+
+    def search(self, query_vec: np.ndarray, top_k: int = 5,
+               filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        if query_vec.ndim == 1:
+            query_vec = query_vec[None, :]
+        return self.search_many(query_vec[:1], top_k, filters)[0]
+
+    def search_many(self, query_vecs: np.ndarray, top_k: int = 5,
+                    filters: Dict[str, Any] | None = None) -> List[List[Dict[str, Any]]]:
+        """샤드별 search_many를 병렬 실행 → 질의마다 k-way merge로 상위 top_k"""
+        if len(query_vecs) == 0:
+            return []
+        per_shard = list(_SHARD_POOL.map(lambda s: s.search_many(query_vecs, top_k, filters), self.shards))
+        return [
+            list(islice(heapq.merge(*(res[q] for res in per_shard), key=lambda h: -h["score"]), top_k))
+            for q in range(len(query_vecs))
+        ]
@@ -1,57 +1,702 @@
 # -*- coding: utf-8 -*-
-import os, json
+"""
+FAISS 벡터 스토어
+- 인덱스 종류(index_type): "flat" | "hnsw" | "ivf" | "ivfpq" | "auto"(코퍼스 크기로 자동 선택)
+- 학습이 필요한 IVF 계열은 첫 add 때 샘플로 학습
+- 검색 파라미터(nprobe / efSearch)와 인덱스 종류는 <index_path>.meta.json 에 저장 → load 시 복원
+- 모든 종류가 내적(=정규화 벡터의 코사인) 기준, search API 동일
+- mmap 로드: 인덱스를 프로세스 메모리로 복사하지 않고 파일을 매핑 → 워커들이 페이지 캐시 공유
+    flat/hnsw 벡터 저장소 → IO_FLAG_MMAP_IFC, ivf/ivfpq 역리스트 → IO_FLAG_MMAP (on-disk inverted lists)
+    (hnsw 그래프 자체는 메모리에 로드됨)
+- save는 임시 파일에 쓴 뒤 rename → 매핑 중인 이전 파일(inode)은 그대로 유지
+- 문서: docs.jsonl(사람이 읽는 용도/호환) + 바이너리 문서 스토어(docs.bin / docs.idx.npy)
+    load는 바이너리 스토어를 지연 로드 → search는 적중한 행만 디코딩 (docstore.py)
+    스토어가 없거나 오래된 예전 인덱스: 서빙 load는 docs.jsonl을 읽기만 함(전체 로드), 변환은 load(migrate=True)를 쓰는 빌드 쪽에서
+- 벡터 저장 방식(index_params["storage"]): "float32"(기본) | "fp16"(1/2) | "sq8"(1/4, 학습 필요)
+    flat/hnsw/ivf에 적용 (ivfpq는 이미 압축이라 미지원)
+- 원본 벡터 사이드카(vectors.npy): 문서 행 순서와 같은 (N, D) float32 → reindex / 재정렬에 사용
+- 청크 id: "<path>::chunk_NNNN" → 63bit 해시 id (chunk_id64), 행 → id 배열은 ids.npy
+    flat/hnsw는 IndexIDMap2로 감싸고, IVF 계열은 역리스트에 id를 직접 저장
+    upsert / delete(doc_path)는 행을 삭제 표시(-1) 후 인덱스에서 제거, compact()가 문서/벡터 공간 회수
+- 재정렬(index_params["rerank"]=R): 후보 top_k*R개를 원본 벡터(vectors.npy, mmap)로 정확히 재채점
+- 메타 필터(filters): path_prefix / file_types / sources / date_from~date_to
+    파일 테이블로 행 마스크를 만들어(필터별 캐시) IDSelectorBatch(청크 id) / IDSelectorBitmap(예전 인덱스)으로 FAISS 검색 안에서 적용
+    → 후처리 필터와 달리 조건에 맞는 문서로 top_k를 채움
+"""
+import os, json, math, hashlib
 from typing import List, Dict, Any, Tuple
 import numpy as np
 import faiss
 
+from .docstore import DocStore, write_docstore, build_file_table
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+# auto 선택 기준 (벡터 수)
+AUTO_FLAT_MAX = 20_000
+AUTO_HNSW_MAX = 200_000
+AUTO_IVF_MAX = 2_000_000
+TRAIN_SAMPLE = 100_000
+MIN_POINTS_PER_LIST = 39  # FAISS 권장: 리스트당 학습 벡터 39개 이상
+SEED = 1234
+# 벡터 저장 방식 → ScalarQuantizer 종류 (float32는 양자화 없음)
+STORAGE_TYPES = {
+    "float32": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+RECALL_QUERIES = 200
+FILTER_KEYS = ("path_prefix", "file_types", "sources", "date_from", "date_to")
+MAX_CACHED_MASKS = 64
+
+
+def _norm_path(p: str) -> str:
+    return p.replace("\\", "/")
+
+
+def filter_key(filters: Dict[str, Any] | None) -> tuple:
+    """필터 dict → 캐시 키 (비어 있는 조건은 제외, 값 정규화)"""
+    if not filters:
+        return ()
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"지원하지 않는 필터: {sorted(unknown)} (가능: {', '.join(FILTER_KEYS)})")
+    out = []
+    for k in FILTER_KEYS:
+        v = filters.get(k)
+        if not v:
+            continue
+        if k == "file_types":
+            v = tuple(sorted({str(x).lower().lstrip(".") for x in v}))
+        elif k == "sources":
+            v = tuple(sorted(set(map(str, v))))
+        elif k == "path_prefix":
+            v = _norm_path(str(v))
+        out.append((k, v))
+    return tuple(out)
+
+
+def match_file(f: Dict[str, Any], key: tuple) -> bool:
+    """파일 테이블 한 행이 필터 조건을 모두 만족하는지"""
+    for k, v in key:
+        if k == "path_prefix" and not _norm_path(f.get("path", "")).startswith(v):
+            return False
+        if k == "file_types" and f.get("ext", "") not in v:
+            return False
+        if k == "sources" and f.get("source", "") not in v:
+            return False
+        if k == "date_from" and (f.get("date") or "") < v:
+            return False
+        if k == "date_to" and (f.get("date") or "9999") > v:
+            return False
+    return True
+
+
+def auto_index_type(n: int) -> str:
+    """벡터 수로 인덱스 종류 선택: 작으면 정확 검색, 커질수록 근사/압축"""
+    if n <= AUTO_FLAT_MAX:
+        return "flat"
+    if n <= AUTO_HNSW_MAX:
+        return "hnsw"
+    if n <= AUTO_IVF_MAX:
+        return "ivf"
+    return "ivfpq"
+
+
+def default_index_params(index_type: str, dim: int, n: int) -> Dict[str, Any]:
+    """종류별 기본 파라미터 (n: 예상 벡터 수)"""
+    if index_type == "hnsw":
+        return {"M": 32, "efConstruction": 200, "efSearch": 64}
+    if index_type in ("ivf", "ivfpq"):
+        nlist = int(min(65536, max(16, 4 * math.sqrt(max(n, 1)))))
+        nlist = max(1, min(nlist, n // MIN_POINTS_PER_LIST or 1))
+        params: Dict[str, Any] = {"nlist": nlist, "nprobe": min(nlist, max(16, nlist // 16))}
+        if index_type == "ivfpq":
+            params["pq_m"] = next((m for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1) if dim % m == 0 and m <= dim), 1)
+            params["pq_nbits"] = 8
+        return params
+    return {}
+
+
+def make_index(index_type: str, dim: int, params: Dict[str, Any]) -> faiss.Index:
+    ip = faiss.METRIC_INNER_PRODUCT
+    storage = params.get("storage", "float32")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"지원하지 않는 storage: {storage} (가능: {', '.join(STORAGE_TYPES)})")
+    qtype = STORAGE_TYPES[storage]
+    if qtype is not None and index_type == "ivfpq":
+        raise ValueError("ivfpq는 storage(fp16/sq8)와 함께 쓸 수 없습니다 (이미 PQ 압축)")
+    if index_type == "flat":
+        if qtype is not None:
+            return faiss.IndexScalarQuantizer(dim, qtype, ip)
+        return faiss.IndexFlatIP(dim)  # 코사인=내적 (임베딩 정규화 가정)
+    if index_type == "hnsw":
+        if qtype is not None:
+            index = faiss.IndexHNSWSQ(dim, qtype, int(params["M"]), ip)
+        else:
+            index = faiss.IndexHNSWFlat(dim, int(params["M"]), ip)
+        index.hnsw.efConstruction = int(params["efConstruction"])
+        return index
+    if index_type == "ivf":
+        if qtype is not None:
+            return faiss.IndexIVFScalarQuantizer(faiss.IndexFlatIP(dim), dim, int(params["nlist"]), qtype, ip)
+        return faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, int(params["nlist"]), ip)
+    if index_type == "ivfpq":
+        return faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, int(params["nlist"]),
+                                int(params["pq_m"]), int(params["pq_nbits"]), ip)
+    raise ValueError(f"지원하지 않는 index_type: {index_type} (가능: auto, {', '.join(INDEX_TYPES)})")
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]):
+    """저장된 검색 파라미터(nprobe / efSearch)를 인덱스에 적용"""
+    ps = faiss.ParameterSpace()
+    for name in ("nprobe", "efSearch"):
+        if params.get(name) is not None:
+            ps.set_index_parameter(index, name, int(params[name]))
+
+
+def _meta_path(index_path: str) -> str:
+    return index_path + ".meta.json"
+
+
+def vectors_path(index_path: str) -> str:
+    """원본(정규화) 벡터 (N, D) float32, 문서 순서와 정렬"""
+    return os.path.join(os.path.dirname(index_path), "vectors.npy")
+
+
+def mmap_flags(index_type: str) -> int:
+    """인덱스 종류별 mmap 읽기 플래그"""
+    if index_type in ("ivf", "ivfpq"):
+        return faiss.IO_FLAG_MMAP
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def mmap_enabled_for(index_path: str) -> bool:
+    """
+    환경변수 DAY2_MMAP_INDEX_DIRS(os.pathsep 구분 index_dir 목록)에 포함된 디렉토리면 True
+    → 재빌드 없이 index_dir별로 mmap 로드를 켤 수 있음
+    """
+    dirs = [d for d in os.getenv("DAY2_MMAP_INDEX_DIRS", "").split(os.pathsep) if d.strip()]
+    here = os.path.abspath(os.path.dirname(index_path))
+    return any(os.path.abspath(d.strip()) == here for d in dirs)
+
+
+def _save_npy(path: str, arr: np.ndarray):
+    with open(path, "wb") as f:  # np.save(경로)는 .npy를 덧붙이므로 파일 객체로 저장
+        np.save(f, np.ascontiguousarray(arr, dtype="float32"))
+
+
+def _atomic_write(path: str, write):
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def save_vectors(index_path: str, vecs: np.ndarray):
+    """원본 벡터 사이드카 저장 (임시 파일 → rename)"""
+    _atomic_write(vectors_path(index_path), lambda p: _save_npy(p, vecs))
+
+
+def load_vectors(index_path: str) -> np.ndarray:
+    """원본 벡터 사이드카를 memmap으로 열기 (없으면 FileNotFoundError)"""
+    return np.load(vectors_path(index_path), mmap_mode="r")
+
+
+def chunk_id64(doc_id: str) -> int:
+    """청크 id 문자열("<path>::chunk_NNNN") → 안정적인 63bit 정수 id (-1과 겹치지 않게 양수)"""
+    digest = hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def ids_path(index_path: str) -> str:
+    """행 → 청크 id(int64) 배열, 삭제된 행은 -1"""
+    return os.path.join(os.path.dirname(index_path), "ids.npy")
+
+
+def _save_ids(path: str, ids: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(ids, dtype=np.int64))
+
+
 class FaissStore:
-    def __init__(self, dim: int, index_path: str, docs_path: str):
+    def __init__(self, dim: int, index_path: str, docs_path: str,
+                 index_type: str = "flat", index_params: Dict[str, Any] | None = None, mmap: bool = False):
+        """
+        - index_type: "flat"(기본, 정확) | "hnsw" | "ivf" | "ivfpq" | "auto"
+          auto / 학습 필요 종류는 첫 add 때 벡터 수를 보고 인덱스를 만듦
+        - index_params: 기본값 위에 덮어쓸 파라미터 (nlist, nprobe, M, efSearch, pq_m ...)
+        - mmap: save 시 meta에 기록 → 이후 load가 기본으로 mmap 모드 사용
+        """
+        if index_type != "auto" and index_type not in INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 index_type: {index_type} (가능: auto, {', '.join(INDEX_TYPES)})")
         self.dim = dim
         self.index_path = index_path
         self.docs_path = docs_path
-        self.index = faiss.IndexFlatIP(dim)  # 코사인=내적 (임베딩 정규화 가정)
-        self.docs: List[Dict[str, Any]] = []
+        self.index_type = index_type
+        self.index_params: Dict[str, Any] = dict(index_params or {})
+        self.index: faiss.Index | None = None
+        self.mmap = mmap
+        self.read_only = False  # mmap으로 로드된 인덱스는 수정 불가
+        if index_type in ("flat", "hnsw"):
+            self._create(index_type, 0)
+        self.docs: List[Dict[str, Any]] | DocStore = []  # load 후에는 DocStore(읽기 전용, 지연 디코딩)
+        self.vectors: np.ndarray | None = None  # 원본 벡터 (load 후에는 memmap)
+        self._vector_parts: List[np.ndarray] = []  # add로 들어온 벡터 조각 → vectors 접근 시 한 번에 이어 붙임
+        # 행 → 청크 id(64bit), 삭제된 행은 -1. None이면 id 도입 전 인덱스(FAISS 번호 = 행 번호)
+        # add로 들어온 id도 조각으로 모았다가(_id_parts) ids 접근 시 이어 붙임, 중복 검사는 살아 있는 id 집합(_live_ids)으로
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.manifest: Dict[str, Any] | None = None  # index_dir/manifest.json (있을 때만)
+        self._file_table = None  # (파일 목록, 행 → 파일 번호), 첫 필터 검색 때 로드
+        self._selectors: Dict[tuple, Any] = {}  # 필터 키 → (선택자, SearchParameters)
+        self._id_rows = None  # (정렬된 id, 해당 행) — 검색 결과 id → 행 변환용
+
+    def _create(self, index_type: str, n: int):
+        params = default_index_params(index_type, self.dim, n)
+        params.update(self.index_params)
+        self.index_type, self.index_params = index_type, params
+        inner = make_index(index_type, self.dim, params)
+        # IVF 계열은 역리스트에 id를 직접 저장 (IDMap2로 감싸면 remove_ids 후 번호가 어긋남)
+        self.index = inner if index_type in ("ivf", "ivfpq") else faiss.IndexIDMap2(inner)
+        apply_search_params(self.index, params)
+
+    def _inner(self) -> faiss.Index:
+        """IndexIDMap2 안쪽의 실제 인덱스"""
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+
+    @property
+    def vectors(self) -> np.ndarray | None:
+        if self._vector_parts:
+            parts = ([] if self._vectors is None else [self._vectors]) + self._vector_parts
+            self._vectors = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            self._vector_parts = []
+        return self._vectors
+
+    @vectors.setter
+    def vectors(self, value: np.ndarray | None):
+        self._vectors, self._vector_parts = value, []
+
+    @property
+    def ids(self) -> np.ndarray | None:
+        if self._id_parts:
+            self._ids = np.concatenate([self._ids, *self._id_parts])
+            self._id_parts = []
+        return self._ids
+
+    @ids.setter
+    def ids(self, value: np.ndarray | None):
+        self._ids, self._id_parts = value, []
+        self._live_ids: set | None = None  # 첫 중복 검사 때 생성, 이후 add/삭제마다 갱신
+
+    def _live_id_set(self) -> set:
+        if self._live_ids is None:
+            ids = self.ids
+            self._live_ids = set(ids[ids != -1].tolist())
+        return self._live_ids
+
+    def _n_vectors(self) -> int:
+        return (0 if self._vectors is None else len(self._vectors)) + sum(len(p) for p in self._vector_parts)
+
+    def _invalidate(self, files: bool = False):
+        self._selectors, self._id_rows = {}, None
+        if files:
+            self._file_table = None
 
     # ---------- Build ----------
+    def train(self, sample: np.ndarray):
+        """IVF 계열 학습 (최대 TRAIN_SAMPLE개 무작위 샘플)"""
+        sample = np.ascontiguousarray(sample, dtype="float32")
+        if len(sample) > TRAIN_SAMPLE:
+            rng = np.random.default_rng(SEED)
+            sample = sample[rng.choice(len(sample), TRAIN_SAMPLE, replace=False)]
+        self.index.train(sample)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"mmap으로 로드된 인덱스는 수정할 수 없습니다: {self.index_path}")
+
+    def _require_ids(self):
+        if self.ids is None:
+            raise RuntimeError(f"청크 id가 없는 예전 인덱스입니다. reindex로 다시 만든 뒤 사용하세요: {self.index_path}")
+
     def add(self, embeddings: np.ndarray, items: List[Dict[str, Any]]):
+        """새 청크 추가 (이미 있는 청크 id면 ValueError → upsert 사용)"""
+        self._check_writable()
         assert embeddings.shape[1] == self.dim
-        self.index.add(embeddings.astype("float32"))
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if self.index is None:
+            kind = auto_index_type(len(embeddings)) if self.index_type == "auto" else self.index_type
+            self._create(kind, len(embeddings))
+        if not self.index.is_trained:
+            self.train(embeddings)
+        if self._ids is None:
+            self.index.add(embeddings)
+            self._append(embeddings, items, None)
+            return
+        new_ids = np.array([chunk_id64(it["id"]) for it in items], dtype=np.int64)
+        new = new_ids.tolist()
+        if len(set(new)) != len(new) or not self._live_id_set().isdisjoint(new):
+            raise ValueError("이미 있는 청크 id입니다 (같은 문서를 다시 넣을 때는 upsert 사용)")
+        self.index.add_with_ids(embeddings, new_ids)
+        self._append(embeddings, items, new_ids)
+
+    def _append(self, embeddings: np.ndarray, items: List[Dict[str, Any]], new_ids: np.ndarray | None):
+        """문서/원본 벡터/id 배열에 행 추가 (인덱스는 호출 쪽에서 처리)"""
+        # 원본 벡터는 처음부터 모아 온 경우에만 이어 붙임 (문서 순서와 어긋나지 않게)
+        # 조각으로 모았다가 필요할 때 한 번에 이어 붙임 → 스트리밍 add에서 매번 전체 복사하지 않음
+        if self._n_vectors() == len(self.docs):
+            self._vector_parts.append(embeddings)
+        if not isinstance(self.docs, list):
+            self.docs = self._materialize(range(len(self.docs)))  # 로드된 스토어에 추가: 그때만 전체 디코딩
         self.docs.extend(items)
+        if new_ids is not None:
+            self._id_parts.append(new_ids)  # 스트리밍 add에서 매번 전체 id 배열을 복사하지 않음
+            if self._live_ids is not None:
+                self._live_ids.update(new_ids.tolist())
+        self._invalidate(files=True)
+
+    def _materialize(self, rows) -> List[Dict[str, Any]]:
+        """문서 행 → list (DocStore는 닫음: 같은 경로에 다시 save할 때 열린 mmap이 교체를 막지 않게)"""
+        docs = [self.docs[int(i)] for i in rows]
+        if isinstance(self.docs, DocStore):
+            self.docs.close()
+        return docs
+
+    def editable_docs(self) -> List[Dict[str, Any]]:
+        """문서 행을 수정 가능한 list로 (로드된 DocStore면 전체 디코딩) → meta를 고친 뒤 save()"""
+        self._check_writable()
+        if not isinstance(self.docs, list):
+            self.docs = self._materialize(range(len(self.docs)))
+            self._invalidate(files=True)
+        return self.docs
+
+    def stage(self, embeddings: np.ndarray, items: List[Dict[str, Any]]):
+        """
+        인덱스 없이 행만 추가 → finish()에서 한 번에 인덱스 생성
+        - auto / IVF 계열은 전체 벡터 수를 알아야 종류·nlist를 정하고 학습할 수 있음 (스트리밍 빌드용)
+        """
+        self._check_writable()
+        if self.index is not None:
+            raise RuntimeError("이미 인덱스가 있는 스토어에는 stage할 수 없습니다 (add 사용)")
+        assert embeddings.shape[1] == self.dim
+        new_ids = np.array([chunk_id64(it["id"]) for it in items], dtype=np.int64)
+        self._append(np.ascontiguousarray(embeddings, dtype="float32"), items, new_ids)
+
+    def finish(self):
+        """stage한 행으로 인덱스 생성 (auto는 전체 벡터 수로 종류 선택, IVF 계열은 학습) — 인덱스가 있으면 아무것도 안 함"""
+        if self.index is not None:
+            return
+        if len(np.unique(self.ids)) != len(self.ids):
+            raise ValueError("같은 청크 id가 여러 번 들어왔습니다")
+        if self.index_type == "auto":
+            self.index_type = auto_index_type(len(self.ids))
+        self._rebuild()
+
+    def _rows(self, labels: np.ndarray) -> np.ndarray:
+        """FAISS 결과 id → 문서 행 번호 (없거나 삭제된 id는 -1)"""
+        labels = np.asarray(labels, dtype=np.int64)
+        if self.ids is None:
+            return labels
+        if self._id_rows is None:
+            live = np.flatnonzero(self.ids != -1)
+            order = np.argsort(self.ids[live], kind="stable")
+            self._id_rows = (self.ids[live][order], live[order])
+        keys, rows = self._id_rows
+        if len(keys) == 0:
+            return np.full(labels.shape, -1, dtype=np.int64)
+        pos = np.clip(np.searchsorted(keys, labels), 0, len(keys) - 1)
+        return np.where((keys[pos] == labels) & (labels != -1), rows[pos], -1)
+
+    # ---------- Update ----------
+    def _delete_ids(self, ids: np.ndarray) -> int:
+        """id들의 행을 삭제 표시 + 인덱스에서 제거 (hnsw는 remove_ids 미지원 → 호출 쪽에서 _rebuild)"""
+        rows = self._rows(ids)
+        rows = rows[rows != -1]
+        if len(rows) == 0:
+            return 0
+        if self.index_type != "hnsw":
+            self.index.remove_ids(np.ascontiguousarray(self.ids[rows]))
+        if self._live_ids is not None:
+            self._live_ids.difference_update(self.ids[rows].tolist())
+        self.ids[rows] = -1
+        self._invalidate()
+        return len(rows)
+
+    def _rebuild(self):
+        """원본 벡터의 살아 있는 행으로 인덱스 재생성 (hnsw 삭제용)"""
+        if self.vectors is None or len(self.vectors) != len(self.ids):
+            raise RuntimeError(f"원본 벡터(vectors.npy)가 없어 인덱스를 다시 만들 수 없습니다: {self.index_path}")
+        live = np.flatnonzero(self.ids != -1)
+        self._create(self.index_type, len(live))
+        if len(live):
+            vecs = np.ascontiguousarray(self.vectors[live], dtype="float32")
+            if not self.index.is_trained:
+                self.train(vecs)
+            self.index.add_with_ids(vecs, self.ids[live])
+        self._invalidate()
+
+    def upsert(self, items: List[Dict[str, Any]], vectors: np.ndarray) -> int:
+        """
+        청크 id 기준으로 교체/추가 (반환: 교체된 청크 수)
+        - 기존 행은 삭제 표시(compact 전까지 문서 스토어에 남음), 새 행을 뒤에 추가
+        - hnsw는 삭제를 지원하지 않아 원본 벡터로 그래프를 다시 만듦 → 변경은 한 번에 묶어서 호출
+        """
+        self._check_writable()
+        self._require_ids()
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.index is None or (self.index.ntotal == 0 and not len(self.docs)):
+            self.add(vectors, items)
+            return 0
+        new_ids = np.array([chunk_id64(it["id"]) for it in items], dtype=np.int64)
+        if len(np.unique(new_ids)) != len(new_ids):
+            raise ValueError("upsert 입력에 같은 청크 id가 여러 번 있습니다")
+        replaced = self._delete_ids(new_ids)
+        if self.index_type == "hnsw":
+            self._append(vectors, items, new_ids)
+            self._rebuild()
+        else:
+            self.index.add_with_ids(vectors, new_ids)
+            self._append(vectors, items, new_ids)
+        return replaced
+
+    def delete(self, doc_path: str | List[str]) -> int:
+        """문서(meta.path)의 모든 청크 삭제, 경로 리스트도 가능 (반환: 삭제된 청크 수)"""
+        self._check_writable()
+        self._require_ids()
+        files, rows = self._files()
+        targets = {_norm_path(p) for p in ([doc_path] if isinstance(doc_path, str) else doc_path)}
+        fids = [i for i, f in enumerate(files) if _norm_path(f.get("path", "")) in targets]
+        hit = np.flatnonzero(np.isin(np.asarray(rows), fids))
+        removed = self._delete_ids(self.ids[hit][self.ids[hit] != -1])
+        if removed and self.index_type == "hnsw":
+            self._rebuild()
+        return removed
+
+    def compact(self) -> int:
+        """
+        삭제 표시된 행을 문서 스토어/원본 벡터/id 배열에서 제거 (반환: 제거된 행 수)
+        - 인덱스는 삭제 시점에 이미 반영됨 (flat/ivf: remove_ids, hnsw: 재생성)
+        - 이후 save() 하면 docs.bin / vectors.npy 크기가 줄어듦
+        """
+        self._check_writable()
+        if self.ids is None:
+            return 0
+        live = np.flatnonzero(self.ids != -1)
+        removed = len(self.ids) - len(live)
+        if removed == 0:
+            return 0
+        self.docs = self._materialize(live)
+        if self.vectors is not None and len(self.vectors) == len(self.ids):
+            self.vectors = np.ascontiguousarray(self.vectors[live])
+        self.ids = self.ids[live]
+        self._invalidate(files=True)
+        return removed
+
+    @property
+    def n_deleted(self) -> int:
+        """compact 대기 중인 삭제 행 수"""
+        return 0 if self.ids is None else int((self.ids == -1).sum())
+
+    def set_search_params(self, **params: Any):
+        """검색 파라미터 변경 (nprobe=..., efSearch=...) → save 시 함께 저장"""
+        self.index_params.update({k: v for k, v in params.items() if v is not None})
+        apply_search_params(self.index, self.index_params)
+        self._selectors = {}  # 캐시된 SearchParameters에 이전 nprobe/efSearch가 들어 있음
+
+    @property
+    def rerank(self) -> int:
+        """재정렬 후보 배수 (0이면 끔)"""
+        return int(self.index_params.get("rerank") or 0)
+
+    def index_info(self) -> Dict[str, Any]:
+        return {"type": self.index_type, "params": self.index_params, "mmap": self.mmap}
 
     def save(self):
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        faiss.write_index(self.index, self.index_path)
-        with open(self.docs_path, "w", encoding="utf-8") as f:
-            for it in self.docs:
-                f.write(json.dumps(it, ensure_ascii=False) + "\n")
+        _atomic_write(self.index_path, lambda p: faiss.write_index(self.index, p))
+
+        def write_meta(p):
+            with open(p, "w", encoding="utf-8") as f:
+                json.dump(self.index_info(), f, ensure_ascii=False, indent=2)
+
+        def write_docs(p):
+            with open(p, "w", encoding="utf-8") as f:
+                for it in self.docs:
+                    f.write(json.dumps(it, ensure_ascii=False) + "\n")
+
+        _atomic_write(_meta_path(self.index_path), write_meta)
+        _atomic_write(self.docs_path, write_docs)
+        if self.vectors is not None and len(self.vectors) == len(self.docs):
+            save_vectors(self.index_path, self.vectors)
+        if self.ids is not None:
+            _atomic_write(ids_path(self.index_path), lambda p: _save_ids(p, self.ids))
+        write_docstore(self.docs, self.docs_path)  # docs.jsonl 다음에 기록 → 최신 판정(mtime) 유지
 
     # ---------- Load ----------
     @classmethod
-    def load(cls, index_path: str, docs_path: str):
-        index = faiss.read_index(index_path)
+    def load(cls, index_path: str, docs_path: str, mmap: bool | None = None, migrate: bool = False):
+        """
+        - mmap: True/False 강제, None이면 meta의 mmap 값 또는 DAY2_MMAP_INDEX_DIRS 설정을 따름
+        - migrate: 바이너리 문서 스토어가 없거나 오래됐으면 docs.jsonl에서 변환 (빌드/증분 갱신 전용, 서빙은 False)
+        """
+        info = {"type": "flat", "params": {}}
+        if os.path.exists(_meta_path(index_path)):
+            with open(_meta_path(index_path), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        index_type = info.get("type", "flat")
+        if mmap is None:
+            mmap = bool(info.get("mmap")) or mmap_enabled_for(index_path)
+        index = faiss.read_index(index_path, mmap_flags(index_type) if mmap else 0)
         dim = index.d
-        store = cls(dim, index_path, docs_path)
+        store = cls(dim, index_path, docs_path, index_type=index_type, index_params=info.get("params"),
+                    mmap=bool(info.get("mmap")))
         store.index = index
-        store.docs = []
-        with open(docs_path, "r", encoding="utf-8") as f:
-            for line in f:
-                store.docs.append(json.loads(line))
+        store.read_only = mmap
+        apply_search_params(index, store.index_params)
+        ip = ids_path(index_path)
+        store.ids = np.load(ip) if os.path.exists(ip) else None  # 없으면 id 도입 전 인덱스
+        if os.path.exists(vectors_path(index_path)):
+            store.vectors = load_vectors(index_path)  # memmap: 재정렬/재생성 때 필요한 행만 페이지 인
+        elif store.rerank:
+            print(f"[WARN] rerank 설정이 있지만 원본 벡터가 없습니다 → 재정렬 없이 검색: {vectors_path(index_path)}")
+        try:
+            store.docs = DocStore.open(docs_path, migrate=migrate)
+        except OSError:
+            # 스토어 없음(예전 인덱스, 서빙) 또는 읽기 전용 디렉토리 → 예전 방식(전체 로드), 파일은 건드리지 않음
+            if not migrate:
+                print(f"[WARN] 바이너리 문서 스토어가 없거나 오래됨 → docs.jsonl 전체 로드 "
+                      f"(변환: python -m student.day2.impl.docstore --docs {docs_path})")
+            with open(docs_path, "r", encoding="utf-8") as f:
+                store.docs = [json.loads(line) for line in f if line.strip()]
         return store
 
+    def close(self):
+        """
+        서빙에서 교체된 스토어 정리: 문서 스토어 파일/mmap을 닫고 인덱스·벡터·필터 캐시 참조를 놓음
+        - 닫은 뒤에는 검색 불가 (rag는 진행 중인 검색이 끝나도록 잠시 뒤에 호출)
+        """
+        if isinstance(self.docs, DocStore):
+            self.docs.close()
+        self.docs = []
+        self.index = None
+        self.vectors = None
+        self._file_table = None
+        self._selectors = {}
+        self._id_rows = None
+
     # ---------- Search ----------
-    def search(self, query_vec: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _hit(self, score: float, idx: int) -> Dict[str, Any]:
+        doc = self.docs[idx]
+        return {
+            "doc_id": doc["id"],
+            "chunk": doc["text"],
+            "score": float(score),  # 내적값(정규화 가정 → 코사인)
+            "meta": doc.get("meta", {})
+        }
+
+    def search(self, query_vec: np.ndarray, top_k: int = 5,
+               filters: Dict[str, Any] | None = None) -> List[Dict[str, Any]]:
+        """filters: {"path_prefix", "file_types", "sources", "date_from", "date_to"} 중 필요한 것만"""
         if query_vec.ndim == 1:
             query_vec = query_vec[None, :]
-        D, I = self.index.search(query_vec.astype("float32"), top_k)
-        out = []
-        for rank, (score, idx) in enumerate(zip(D[0], I[0])):
-            if idx == -1:
+        return self.search_many(query_vec[:1], top_k, filters)[0]
+
+    def _search_params(self, sel) -> faiss.SearchParameters:
+        """선택자 + 현재 검색 파라미터 (SearchParameters를 넘기면 인덱스의 nprobe/efSearch 대신 이 값이 쓰임)"""
+        if self.index_type in ("ivf", "ivfpq"):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = int(self.index_params.get("nprobe") or self._inner().nprobe)
+        elif self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = int(self.index_params.get("efSearch") or self._inner().hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters()
+        params.sel = sel
+        return params
+
+    def _files(self):
+        """(파일 목록, 행 → 파일 번호) — 첫 사용 때 로드/생성"""
+        if self._file_table is None:
+            self._file_table = (self.docs.file_table() if isinstance(self.docs, DocStore)
+                                else build_file_table(self.docs))
+        return self._file_table
+
+    def _selector(self, filters: Dict[str, Any] | None):
+        """
+        필터 → (SearchParameters 또는 None, 매칭 행 수)
+        - 파일 단위로 조건 평가 → fileidx로 행 마스크 (필터별 캐시)
+        - 청크 id 인덱스: 살아 있는 행의 id → IDSelectorBatch, 예전 인덱스: 행 비트맵 → IDSelectorBitmap
+        """
+        key = filter_key(filters)
+        if not key:
+            return None, self.index.ntotal
+        cached = self._selectors.get(key)
+        if cached is None:
+            files, rows = self._files()
+            file_ok = np.array([match_file(f, key) for f in files], dtype=bool)
+            mask = file_ok[np.asarray(rows)] if len(files) else np.zeros(0, dtype=bool)
+            if self.ids is not None:
+                keep = np.ascontiguousarray(self.ids[mask & (self.ids != -1)])
+                sel = faiss.IDSelectorBatch(len(keep), faiss.swig_ptr(keep))
+                n_match = len(keep)
+            else:
+                keep = np.packbits(mask, bitorder="little")
+                sel = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(keep))
+                n_match = int(mask.sum())
+            cached = (keep, sel, self._search_params(sel), n_match)  # keep/sel 참조 유지
+            if len(self._selectors) >= MAX_CACHED_MASKS:
+                self._selectors.pop(next(iter(self._selectors)))
+            self._selectors[key] = cached
+        return cached[2], cached[3]
+
+    def _search_ids(self, query_vecs: np.ndarray, top_k: int,
+                    params: faiss.SearchParameters | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(D, 행 번호) — rerank가 켜져 있으면 후보 top_k*rerank개를 원본 벡터 내적으로 재채점해 상위 top_k"""
+        if not self.rerank or self.vectors is None:
+            D, labels = self.index.search(query_vecs, top_k, params=params)
+            return D, self._rows(labels)
+        _, labels = self.index.search(query_vecs, top_k * self.rerank, params=params)
+        cand = self._rows(labels)
+        D = np.full((len(query_vecs), top_k), -np.inf, dtype="float32")
+        I = np.full((len(query_vecs), top_k), -1, dtype="int64")
+        for q, ids in enumerate(cand):
+            ids = ids[ids != -1]
+            if len(ids) == 0:
                 continue
-            doc = self.docs[idx]
-            out.append({
-                "doc_id": doc["id"],
-                "chunk": doc["text"],
-                "score": float(score),  # 내적값(정규화 가정 → 코사인)
-                "meta": doc.get("meta", {})
-            })
-        return out
+            order = np.sort(ids)  # memmap은 정렬된 행 접근이 빠름
+            exact = np.asarray(self.vectors[order], dtype="float32") @ query_vecs[q]
+            top = np.argsort(-exact, kind="stable")[:top_k]
+            D[q, :len(top)], I[q, :len(top)] = exact[top], order[top]
+        return D, I
+
+    def search_many(self, query_vecs: np.ndarray, top_k: int = 5,
+                    filters: Dict[str, Any] | None = None) -> List[List[Dict[str, Any]]]:
+        """
+        여러 질의를 index.search 1회(행렬 검색)로 처리
+        - query_vecs: (Q, D) → 질의별 결과 리스트 Q개 (각각 search와 같은 형식)
+        - filters: 모든 질의에 같은 메타 필터 적용
+        """
+        query_vecs = np.ascontiguousarray(query_vecs, dtype="float32")
+        if len(query_vecs) == 0:
+            return []
+        params, n_match = self._selector(filters)
+        if n_match == 0:
+            return [[] for _ in range(len(query_vecs))]
+        D, I = self._search_ids(query_vecs, top_k, params)
+        return [[self._hit(score, idx) for score, idx in zip(d, i) if idx != -1] for d, i in zip(D, I)]
+
+    def recall_vs_flat(self, vecs: np.ndarray, top_k: int = 10, n_queries: int = RECALL_QUERIES) -> float:
+        """
+        정확 검색(IndexFlatIP) 대비 recall@top_k
+        - vecs: 인덱스에 넣은 원본 벡터, 질의는 그중 무작위 n_queries개
+        """
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        k = min(top_k, len(vecs))
+        rng = np.random.default_rng(SEED)
+        queries = vecs[rng.choice(len(vecs), min(n_queries, len(vecs)), replace=False)]
+        flat = faiss.IndexFlatIP(vecs.shape[1])
+        flat.add(vecs)
+        _, truth = flat.search(queries, k)
+        _, got = self._search_ids(queries, k)
+        hits = sum(len(set(t) & set(g[g != -1])) for t, g in zip(truth, got))
+        return hits / float(truth.size)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+버전별 인덱스 스냅샷 + 원자적 교체
+- index_dir/versions/<버전>/ : 빌드 1회분 (faiss.index / 문서 스토어 / vectors.npy / manifest.json, 또는 shards.json + shards/)
+- index_dir/CURRENT         : 서빙할 버전 이름 한 줄 → 임시 파일에 쓴 뒤 os.replace (Windows에서도 원자적)
+    빌드가 끝난 뒤에만 CURRENT를 바꾸므로 서빙 쪽은 반쯤 쓰인 파일 쌍을 볼 수 없음
+    서빙(rag.get_store)은 요청마다 CURRENT를 읽어 다음 요청부터 새 버전 사용
+- 이전 버전은 keep개까지 남김 → rollback으로 즉시 되돌리기
+- CURRENT가 없으면 index_dir 자체를 인덱스로 사용 (버전 도입 전 레이아웃)
+    반대로 CURRENT가 있는 index_dir에 버전 없이(--no_versions) 쓰면 서빙되지 않으므로 거부 (check_unversioned)
+
+실행:
+  python -m student.day2.impl.versions --index_dir indices/day2 --list
+  python -m student.day2.impl.versions --index_dir indices/day2 --rollback            # 직전 버전으로
+  python -m student.day2.impl.versions --index_dir indices/day2 --rollback 20251112-120000-0001
+"""
+
+from __future__ import annotations
+import os, time, shutil, argparse
+from typing import List, Optional, Tuple
+
+CURRENT_NAME = "CURRENT"
+VERSIONS_DIR = "versions"
+KEEP_VERSIONS = 3  # CURRENT 외에 남길 이전 버전 수
+
+
+def versions_root(index_dir: str) -> str:
+    return os.path.join(index_dir, VERSIONS_DIR)
+
+
+def current_version(index_dir: str) -> Optional[str]:
+    """CURRENT가 가리키는 버전 이름 (없으면 None)"""
+    p = os.path.join(index_dir, CURRENT_NAME)
+    try:
+        with open(p, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def resolve(index_dir: str) -> str:
+    """서빙할 실제 디렉토리: CURRENT가 있으면 versions/<버전>, 없으면 index_dir"""
+    name = current_version(index_dir)
+    return os.path.join(versions_root(index_dir), name) if name else index_dir
+
+
+def check_unversioned(index_dir: str):
+    """버전 없이 index_dir에 바로 쓰기 전 확인: CURRENT가 있으면 서빙은 계속 그 버전을 따르므로 RuntimeError"""
+    name = current_version(index_dir)
+    if name:
+        raise RuntimeError(f"{index_dir}에 CURRENT({name})가 있어 버전 없이 쓴 인덱스는 서빙되지 않습니다 "
+                           f"(계속 {name} 사용) → --no_versions 없이 빌드하거나 {os.path.join(index_dir, CURRENT_NAME)}를 "
+                           f"지운 뒤 다시 실행하세요")
+
+
+def list_versions(index_dir: str) -> List[str]:
+    """버전 이름 목록 (오래된 순, 이름이 생성 시각 순으로 정렬됨)"""
+    root = versions_root(index_dir)
+    if not os.path.isdir(root):
+        return []
+    return sorted(n for n in os.listdir(root) if os.path.isdir(os.path.join(root, n)) and not n.endswith(".tmp"))
+
+
+def new_version(index_dir: str) -> Tuple[str, str]:
+    """새 버전 (이름, 경로) — 이름은 생성 시각 + 일련번호 (같은 초에 여러 번 빌드해도 겹치지 않음)"""
+    root = versions_root(index_dir)
+    os.makedirs(root, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for seq in range(10_000):
+        name = f"{stamp}-{seq:04d}"
+        path = os.path.join(root, name)
+        try:
+            os.makedirs(path)
+            return name, path
+        except FileExistsError:
+            continue
+    raise RuntimeError(f"새 버전 디렉토리를 만들 수 없습니다: {root}")
+
+
+def link_tree(src: str, dst: str):
+    """
+    src 디렉토리를 dst에 하드링크로 복제 (파일 내용/inode 공유, 링크 불가하면 복사)
+    - src 최상위의 versions/ 와 CURRENT는 제외 (버전 도입 전 index_dir → 첫 버전: dst가 src/versions 아래)
+    """
+    for base, dirs, files in os.walk(src):
+        if base == src:
+            dirs[:] = [d for d in dirs if d != VERSIONS_DIR]
+            files = [f for f in files if f not in (CURRENT_NAME, CURRENT_NAME + ".tmp")]
+        out = os.path.join(dst, os.path.relpath(base, src))
+        os.makedirs(out, exist_ok=True)
+        for fn in files:
+            s, d = os.path.join(base, fn), os.path.join(out, fn)
+            try:
+                os.link(s, d)
+            except OSError:
+                shutil.copy2(s, d)
+
+
+def _set_current(index_dir: str, name: str):
+    p = os.path.join(index_dir, CURRENT_NAME)
+    with open(p + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+    os.replace(p + ".tmp", p)
+
+
+def prune(index_dir: str, keep: int = KEEP_VERSIONS) -> List[str]:
+    """CURRENT와 그 외 최신 keep개를 남기고 삭제 (삭제된 이름 반환, 사용 중이라 못 지우면 다음에 다시 시도)"""
+    cur = current_version(index_dir)
+    others = [n for n in list_versions(index_dir) if n != cur]
+    removed = others[:max(0, len(others) - keep)]
+    for name in removed:
+        shutil.rmtree(os.path.join(versions_root(index_dir), name), ignore_errors=True)
+    return removed
+
+
+def publish(index_dir: str, name: str, keep: int = KEEP_VERSIONS):
+    """빌드가 끝난 버전을 CURRENT로 교체 후 오래된 버전 정리"""
+    if not os.path.isdir(os.path.join(versions_root(index_dir), name)):
+        raise FileNotFoundError(f"버전이 없습니다: {name}")
+    _set_current(index_dir, name)
+    removed = prune(index_dir, keep)
+    print(f"[VERSION] CURRENT → {name}" + (f" (정리: {', '.join(removed)})" if removed else ""))
+
+
+def rollback(index_dir: str, name: str | None = None) -> str:
+    """name(없으면 CURRENT 직전 버전)으로 CURRENT 되돌리기 (버전은 삭제하지 않음)"""
+    versions = list_versions(index_dir)
+    if name is None:
+        cur = current_version(index_dir)
+        older = [n for n in versions if cur is None or n < cur]
+        if not older:
+            raise FileNotFoundError(f"되돌릴 이전 버전이 없습니다: {index_dir}")
+        name = older[-1]
+    if name not in versions:
+        raise FileNotFoundError(f"버전이 없습니다: {name} (가능: {', '.join(versions)})")
+    _set_current(index_dir, name)
+    print(f"[VERSION] rollback → {name}")
+    return name
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="인덱스 버전 목록 / 되돌리기")
+    ap.add_argument("--index_dir", default="indices/day2")
+    ap.add_argument("--list", action="store_true")
+    ap.add_argument("--rollback", nargs="?", const="", default=None, help="버전 이름 (생략 시 직전 버전)")
+    args = ap.parse_args()
+    if args.rollback is not None:
+        rollback(args.index_dir, args.rollback or None)
+    cur = current_version(args.index_dir)
+    for n in list_versions(args.index_dir):
+        print(("* " if n == cur else "  ") + n)
@@ -48,7 +48,8 @@ Day2Agent, Day2Plan, FaissStore, Embeddings, build_index = _import_all()
 
 # ───────── 2) 유틸 ─────────
 def _idx_paths(index_dir: str):
-    d = Path(index_dir)
+    from student.day2.impl.versions import resolve
+    d = Path(resolve(index_dir))  # CURRENT가 가리키는 버전 디렉토리
     return d / "faiss.index", d / "docs.jsonl"
 
 def _file_info(p: Path) -> str:
@@ -182,7 +183,8 @@ def _run_search_and_agent(query: str, index_dir: str, model: str, top_k: int):
     # 임베딩/스토어 준비
     emb = Embeddings(model=model, batch_size=4)
     qv = emb.encode([query])[0]
-    store = FaissStore.load(str(Path(index_dir)/"faiss.index"), str(Path(index_dir)/"docs.jsonl"))
+    idx_path, docs_path = _idx_paths(index_dir)
+    store = FaissStore.load(str(idx_path), str(docs_path))
 
     # 로우 검색
     try:
@@ -3,14 +3,22 @@
 CSV/HWPX → 텍스트로 변환해서 RAG에 넣기 쉽게 만드는 스크립트
 - CSV  : 인코딩 자동판별 → UTF-8 CSV와 요약 MD 동시 생성
 - HWPX : XML에서 본문 추출 → .txt 생성
+         (추출은 Day2 로더 load_text와 공유 → 추출 텍스트 캐시 사용)
 출력: data/processed/
+(참고) Day2 인덱싱은 data/raw의 csv/hwpx/pdf/html을 직접 읽음 (student/day2/impl/ingest.py LOADERS)
+       → 인덱스만 만들 때는 이 스크립트 없이 build_index --paths data/raw
 """
 
 from __future__ import annotations
 from pathlib import Path
-import csv, io, zipfile, sys
+import csv, io, zipfile, sys, os
 import pandas as pd
 
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from student.day2.impl.ingest import load_text
+
 RAW = Path("data/raw")
 OUT = Path("data/processed"); OUT.mkdir(parents=True, exist_ok=True)
 
@@ -59,26 +67,7 @@ def save_csv_variants(p: Path):
 
 # ---------- HWPX ----------
 def hwpx_to_text(path: str) -> str:
-    # HWPX는 zip(XML) 구조: word/section*.xml 또는 Contents/section*.xml 등
-    text_parts: list[str] = []
-    with zipfile.ZipFile(path, "r") as zf:
-        names = [n for n in zf.namelist() if n.lower().endswith(".xml")]
-        # 본문에 해당하는 섹션 추정
-        target = [n for n in names if "section" in n.lower()] or names
-        for name in target:
-            try:
-                data = zf.read(name).decode("utf-8", errors="ignore")
-                # 매우 단순한 태그 제거(빠른용) – 필요시 정교화 가능
-                data = data.replace("</w:t>", "").replace("<w:t>", "")
-                data = data.replace("<hp:t>", "").replace("</hp:t>", "")
-                # 태그 전체 제거(라이트)
-                import re
-                s = re.sub(r"<[^>]+>", "", data)
-                s = re.sub(r"[ \t]+", " ", s)
-                text_parts.append(s.strip())
-            except Exception:
-                continue
-    return "\n\n".join([t for t in text_parts if t])
+    return load_text(path)
 
 def save_hwpx_text(p: Path):
     txt = hwpx_to_text(str(p))
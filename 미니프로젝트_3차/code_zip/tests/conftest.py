@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""pytest 공통: 프로젝트 루트(pyproject.toml 위치)를 sys.path에 추가 → student.* 임포트"""
+
+import os, sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
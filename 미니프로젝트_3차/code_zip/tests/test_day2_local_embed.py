@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Day2 로컬 임베딩 백엔드 (네트워크 없이 실행)
+- Embeddings(model="local-hash"): shape / L2 정규화 / 결정성
+- Day2Plan.embedding_model="local-hash" → 로컬 백엔드 선택, 빌드·검색까지 OpenAI 호출 없음
+"""
+
+import numpy as np
+import pytest
+
+from student.common.schemas import Day2Plan
+from student.day2.impl.embeddings import Embeddings, OpenAIBackend
+from student.day2.impl.local_embed import DEFAULT_LOCAL_DIM, LocalHashBackend
+
+
+@pytest.fixture(autouse=True)
+def _offline(monkeypatch):
+    """OpenAI 백엔드가 만들어지면 실패 (API 키도 제거)"""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("DAY2_EMBED_CACHE_DIR", raising=False)
+
+    def _no_openai(*args, **kwargs):
+        raise AssertionError("로컬 모델인데 OpenAI 백엔드를 만들려고 했습니다")
+    monkeypatch.setattr(OpenAIBackend, "__init__", _no_openai)
+
+
+def test_local_embeddings_shape_and_determinism():
+    texts = ["재직자 AI 집중과정 사업 공고", "K-MOOC 선정 공고문", "hello world", ""]
+    emb = Embeddings(model="local-hash")
+    assert isinstance(emb.backend, LocalHashBackend)
+    assert emb.dim == DEFAULT_LOCAL_DIM
+
+    a = emb.encode(texts)
+    assert a.shape == (len(texts), DEFAULT_LOCAL_DIM)
+    assert a.dtype == np.float32
+    assert np.allclose(np.linalg.norm(a[:3], axis=1), 1.0, atol=1e-5)
+
+    b = Embeddings(model="local-hash").encode(texts)  # 새 인스턴스에서도 같은 벡터
+    assert np.array_equal(a, b)
+    assert Embeddings(model="local-hash-64").encode(texts[:1]).shape == (1, 64)
+    assert emb.encode([]).shape == (0, DEFAULT_LOCAL_DIM)
+
+
+def test_day2plan_selects_local_backend(tmp_path):
+    from student.day2.impl.build_index import build_index
+    from student.day2.impl.rag import Day2Agent, get_embedder
+
+    src = tmp_path / "raw"
+    src.mkdir()
+    (src / "a.txt").write_text("재직자 AI 집중과정 사업 공고문입니다. 신청 기간과 지원 대상을 안내합니다.", encoding="utf-8")
+    (src / "b.txt").write_text("한국형 온라인 공개강좌 K-MOOC 강좌 선정 결과를 알립니다.", encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+    build_index([str(src)], index_dir, model="local-hash", cache_dir=None)
+
+    plan = Day2Plan(index_dir=index_dir, embedding_model="local-hash", top_k=2)
+    assert isinstance(get_embedder(plan.embedding_model).backend, LocalHashBackend)
+    out = Day2Agent(index_dir, plan).handle("K-MOOC 강좌 선정", plan)
+    assert out["type"] == "rag_answer"
+    assert out["contexts"][0]["meta"]["path"].endswith("b.txt")